@@ -0,0 +1,90 @@
+"""Compare the Markdown→Notion converter backends on large synthetic documents.
+
+Usage::
+
+    python benchmarks/bench_converters.py [--sections 400] [--repeat 5]
+
+Prints the best-of-N wall time, MB/s and blocks/s for each backend in
+``CONVERTER_BACKENDS``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from notion_formatter.markdown_converter import CONVERTER_BACKENDS, convert_markdown  # noqa: E402
+
+REVIEW_HEADING = "AIレビュー結果"
+_WORDS = "要件 背景 目的 対象 ユーザー 画面 入力 出力 API 通知 権限 ログ 期限 metrics latency".split()
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(6, 18))]
+    if rng.random() < 0.3:
+        words[rng.randrange(len(words))] = f"**{rng.choice(_WORDS)}**"
+    if rng.random() < 0.2:
+        words[rng.randrange(len(words))] = "[参考](https://example.com/doc)"
+    return " ".join(words)
+
+
+def synthetic_document(sections: int, *, seed: int = 0) -> str:
+    """A draft-like document mixing every construct both backends handle."""
+
+    rng = random.Random(seed)
+    lines = ["# 要件定義書", "", "💡 このページはサンプルです", ""]
+    for index in range(sections):
+        lines += [f"## セクション {index}", "", _sentence(rng), _sentence(rng), ""]
+        lines += [f"### 詳細 {index}", ""]
+        lines += [f"- {_sentence(rng)}" for _ in range(rng.randint(2, 6))]
+        lines += ["  - ネストした項目", ""]
+        lines += [f"1. {_sentence(rng)}" for _ in range(rng.randint(1, 4))]
+        lines += ["", "- [ ] 未対応のタスク", "- [x] 対応済みのタスク", ""]
+        lines += [f"> {_sentence(rng)}", ""]
+        if index % 5 == 0:
+            lines += ["```python", "def handler(event):", "    return event", "```", ""]
+        if index % 7 == 0:
+            lines += ["| 項目 | 値 |", "|---|---|", "| 期限 | 3日 |", ""]
+        lines += ["---", ""]
+    lines += [
+        f"## {REVIEW_HEADING}",
+        "### ❌ 不足している項目",
+        "- 🔴 非機能要件が未記載",
+        "### ⚠️ 改善が必要な項目",
+        "- 🔴 受け入れ条件が曖昧",
+        "### ✅ 十分な項目",
+        "- 背景",
+    ]
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sections", type=int, default=400, help="## sections per document")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per backend (best is reported)")
+    args = parser.parse_args()
+
+    markdown = synthetic_document(args.sections)
+    size_mb = len(markdown.encode("utf-8")) / 1_000_000
+    print(f"document: {size_mb:.2f} MB, {markdown.count(chr(10)) + 1} lines")
+
+    for backend in sorted(CONVERTER_BACKENDS):
+        best = float("inf")
+        blocks = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            blocks = convert_markdown(markdown, backend=backend, review_heading=REVIEW_HEADING)
+            best = min(best, time.perf_counter() - started)
+        print(
+            f"{backend:>12}: {best * 1000:8.1f} ms  "
+            f"{size_mb / best:6.2f} MB/s  {len(blocks) / best:9.0f} blocks/s  ({len(blocks)} blocks)"
+        )
+
+
+if __name__ == "__main__":
+    main()
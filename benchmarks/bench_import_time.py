@@ -0,0 +1,103 @@
+"""Guard the CLI start-up cost with ``python -X importtime``.
+
+Usage::
+
+    python benchmarks/bench_import_time.py [--repeat 5] [--budget-ms 250]
+
+Imports ``notion_formatter.cli`` in fresh interpreters and reports the best
+cumulative import time of the package, the slowest modules it pulls in and
+the wall time of ``notion-formatter --help``. Exits with status 1 when an
+SDK that should only load once a client is created (openai, notion-client,
+httpx, tenacity, python-dotenv, markdown-it-py) is imported at start-up, or
+when the import time exceeds ``--budget-ms``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+ENTRY_MODULE = "notion_formatter.cli"
+DEFERRED_MODULES = ("openai", "notion_client", "httpx", "tenacity", "dotenv", "markdown_it")
+
+
+def _environment() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC), env.get("PYTHONPATH")]))
+    return env
+
+
+def measure_imports(statement: str = f"import {ENTRY_MODULE}") -> Dict[str, Tuple[int, int]]:
+    """Self and cumulative microseconds per module imported by ``statement``."""
+
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        env=_environment(),
+        check=True,
+    )
+    modules: Dict[str, Tuple[int, int]] = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def measure_help() -> float:
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", f"from {ENTRY_MODULE} import main; main(['--help'])"],
+        capture_output=True,
+        env=_environment(),
+        check=False,
+    )
+    return time.perf_counter() - started
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=250.0, help="maximum import time of the CLI")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest modules to list")
+    args = parser.parse_args()
+
+    runs = [measure_imports() for _ in range(max(1, args.repeat))]
+    best = min(runs, key=lambda modules: modules[ENTRY_MODULE][1])
+    cli_ms = best[ENTRY_MODULE][1] / 1000
+    help_seconds = min(measure_help() for _ in range(max(1, args.repeat)))
+
+    print(f"import {ENTRY_MODULE}: {cli_ms:.1f} ms (best of {len(runs)})")
+    print(f"notion-formatter --help: {help_seconds * 1000:.1f} ms wall")
+    # Modules loaded by interpreter start-up (site, .pth hooks) are not ours.
+    startup = set(measure_imports("pass"))
+    print("slowest modules (cumulative):")
+    slowest = sorted(
+        ((name, times) for name, times in best.items() if name not in startup),
+        key=lambda item: item[1][1],
+        reverse=True,
+    )
+    for name, (_, cumulative_us) in slowest[: args.top]:
+        print(f"  {cumulative_us / 1000:>8.1f} ms  {name}")
+
+    failures: List[str] = []
+    eager = sorted({name.split(".")[0] for name in best} & set(DEFERRED_MODULES))
+    if eager:
+        failures.append(f"imported at start-up: {', '.join(eager)}")
+    if cli_ms > args.budget_ms:
+        failures.append(f"import time {cli_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
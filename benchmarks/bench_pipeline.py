@@ -0,0 +1,182 @@
+"""Run ``run_pipeline`` end to end against local Notion and OpenAI stand-ins.
+
+Usage::
+
+    python benchmarks/bench_pipeline.py [--sizes 10 100 1000 5000]
+        [--notion-latency-ms 0] [--openai-latency-ms 0] [--throttle-rate 0]
+
+For each page size a fresh draft page is generated on the stand-in Notion
+server and formatted once. The report lists wall time per stage (source
+fetch, AI, conversion, archive, append, status update), Notion requests by
+endpoint, OpenAI calls and how many requests were answered with 429.
+No network access or API keys are needed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import random
+import sys
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from stand_in_servers import (  # noqa: E402
+    REVIEW_HEADING,
+    NotionStandIn,
+    OpenAIStandIn,
+    StandInConfig,
+)
+
+from notion_formatter.config import Settings  # noqa: E402
+from notion_formatter.runner import PipelineContext, run_pipeline  # noqa: E402
+
+_WORDS = "要件 背景 目的 対象 ユーザー 画面 入力 出力 API 通知 権限 ログ 期限".split()
+
+
+def benchmark_settings(notion_url: str, openai_url: str, **overrides: Any) -> Settings:
+    settings = Settings(
+        notion_api_key="secret_benchmark",
+        notion_template_page_id="",
+        notion_review_page_id=None,
+        openai_api_key="sk-benchmark",
+        openai_model="gpt-4o-mini",
+        review_section_heading=REVIEW_HEADING,
+        completion_success_phrase="🎉 完璧です",
+        retry_limit=5,
+        review_status_property_name="レビュー状況",
+        review_status_complete_value="完了",
+        review_status_rejected_value="差し戻し",
+        cache_dir=None,
+        notion_base_url=notion_url,
+        openai_base_url=f"{openai_url}/v1",
+    )
+    return replace(settings, **overrides)
+
+
+def generate_page(block_count: int, *, seed: int = 0) -> List[Dict[str, Any]]:
+    """A draft of ``block_count`` top-level blocks with some nested list items."""
+
+    rng = random.Random(seed)
+
+    def text(kind: str, content: str, **extra: Any) -> Dict[str, Any]:
+        data = {"rich_text": [{"type": "text", "text": {"content": content}}], **extra}
+        return {"type": kind, kind: data}
+
+    def sentence() -> str:
+        return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(5, 16)))
+
+    blocks = [text("callout", "このページはベンチマーク用です", icon={"type": "emoji", "emoji": "📝"})]
+    while len(blocks) < block_count:
+        index = len(blocks)
+        if index % 25 == 1:
+            blocks.append(text("heading_2", f"セクション {index // 25}"))
+        elif index % 5 == 0:
+            item = text("bulleted_list_item", sentence())
+            item["bulleted_list_item"]["children"] = [
+                text("bulleted_list_item", sentence()) for _ in range(2)
+            ]
+            blocks.append(item)
+        elif index % 7 == 0:
+            blocks.append(text("to_do", sentence(), checked=rng.random() < 0.5))
+        else:
+            blocks.append(text("paragraph", sentence()))
+    return blocks[:block_count]
+
+
+def generate_template() -> List[Dict[str, Any]]:
+    headings = [f"セクション {index}" for index in range(4)]
+    return [
+        block
+        for heading in headings
+        for block in (
+            {"type": "heading_2", "heading_2": {"rich_text": [{"type": "text", "text": {"content": heading}}]}},
+            {"type": "paragraph", "paragraph": {"rich_text": [{"type": "text", "text": {"content": "（記入）"}}]}},
+        )
+    ]
+
+
+def run_case(
+    block_count: int,
+    notion: NotionStandIn,
+    openai: OpenAIStandIn,
+    settings: Settings,
+) -> Dict[str, Any]:
+    template_id = notion.add_page(generate_template())
+    page_id = notion.add_page(generate_page(block_count))
+    notion.reset_counters()
+    openai.reset_counters()
+
+    context = PipelineContext(replace(settings, notion_template_page_id=template_id))
+    started = time.perf_counter()
+    result = run_pipeline(page_id, context=context)
+    wall = time.perf_counter() - started
+
+    stages = dict(result.stage_seconds)
+    stages["other"] = round(max(0.0, wall - sum(stages.values())), 4)
+    return {
+        "blocks": block_count,
+        "written_blocks": result.block_count,
+        "wall_seconds": round(wall, 4),
+        "stages": stages,
+        "notion_client": result.notion_requests,
+        "notion_server": notion.counters.snapshot(),
+        "openai_server": openai.counters.snapshot(),
+    }
+
+
+def _print_case(case: Dict[str, Any]) -> None:
+    stages = "  ".join(f"{stage}={seconds:.3f}s" for stage, seconds in case["stages"].items())
+    client = case["notion_client"]
+    print(f"{case['blocks']:>6} blocks  wall={case['wall_seconds']:.3f}s  {stages}")
+    print(
+        f"        notion requests={client['requests']} retried={client['retried']} "
+        f"throttled={case['notion_server']['throttled']}  "
+        f"openai calls={case['openai_server']['requests']} "
+        f"throttled={case['openai_server']['throttled']}"
+    )
+    for endpoint, count in sorted(client["by_endpoint"].items()):
+        print(f"          {endpoint:<28} {count}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--notion-latency-ms", type=float, default=0.0)
+    parser.add_argument("--openai-latency-ms", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After seconds sent with 429")
+    parser.add_argument("--requests-per-second", type=float, default=1000.0, help="client-side Notion rate limit")
+    parser.add_argument("--update-mode", choices=("replace", "diff"), default="replace")
+    parser.add_argument("--streaming", action="store_true", help="use AI_STREAMING writes")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per case")
+    args = parser.parse_args()
+    # Injected 429s are expected and counted below; the client resets its
+    # logger level on construction, so disable it instead.
+    logging.getLogger("notion_client").disabled = True
+
+    notion_config = StandInConfig(args.notion_latency_ms, args.throttle_rate, args.retry_after)
+    openai_config = StandInConfig(args.openai_latency_ms, args.throttle_rate, args.retry_after, seed=1)
+    with NotionStandIn(notion_config) as notion, OpenAIStandIn(openai_config) as openai:
+        settings = benchmark_settings(
+            notion.base_url,
+            openai.base_url,
+            notion_requests_per_second=args.requests_per_second,
+            notion_update_mode=args.update_mode,
+            ai_streaming=args.streaming,
+        )
+        for size in args.sizes:
+            case = run_case(size, notion, openai, settings)
+            if args.json:
+                print(json.dumps(case, ensure_ascii=False))
+            else:
+                _print_case(case)
+
+
+if __name__ == "__main__":
+    main()
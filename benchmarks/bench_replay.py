@@ -0,0 +1,115 @@
+"""Replay a recorded cassette through ``run_pipeline`` and time it.
+
+Usage::
+
+    python benchmarks/bench_replay.py [--cassette run.json] [--repeat 5]
+        [--blocks 1000] [--openai-latency-ms 0] [--save run.json]
+
+With ``--cassette`` the given recording (for example one made with
+``notion-formatter --record-cassette``) is replayed ``--repeat`` times.
+Without it, a run over a generated page of ``--blocks`` blocks is first
+recorded against the local stand-ins (optionally kept with ``--save``) and
+then replayed. The report compares the recorded wall time with the best
+replay, lists stage timings and how many requests were matched exactly, by
+endpoint only, or not at all. Exits with status 1 when a request was not
+in the cassette. No network access or API keys are needed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from bench_pipeline import benchmark_settings, generate_page, generate_template  # noqa: E402
+from stand_in_servers import NotionStandIn, OpenAIStandIn, StandInConfig  # noqa: E402
+
+from notion_formatter.cassette import Cassette  # noqa: E402
+from notion_formatter.config import Settings  # noqa: E402
+from notion_formatter.runner import PipelineContext, PipelineResult, run_pipeline  # noqa: E402
+
+# Replayed requests never leave the process; the host only has to parse.
+REPLAY_BASE_URL = "http://cassette.invalid"
+
+
+def record_stand_in_run(path: Path, block_count: int, openai_latency_ms: float) -> float:
+    """Record one run over a generated page; return its wall time."""
+
+    openai_config = StandInConfig(openai_latency_ms, 0.0, 0.0, seed=1)
+    with NotionStandIn() as notion, OpenAIStandIn(openai_config) as openai:
+        template_id = notion.add_page(generate_template())
+        page_id = notion.add_page(generate_page(block_count))
+        settings = benchmark_settings(
+            notion.base_url,
+            openai.base_url,
+            notion_template_page_id=template_id,
+            notion_requests_per_second=1000.0,
+        )
+        cassette = Cassette.record(path)
+        cassette.metadata.update(page_id=page_id, template_page_id=template_id)
+        context = PipelineContext(settings, cassette=cassette)
+        started = time.perf_counter()
+        run_pipeline(page_id, context=context)
+        wall = time.perf_counter() - started
+        cassette.save()
+    return wall
+
+
+def replay_once(path: Path) -> Tuple[float, Optional[PipelineResult], Cassette]:
+    cassette = Cassette.replay(path)
+    metadata = cassette.metadata
+    settings: Settings = benchmark_settings(
+        REPLAY_BASE_URL,
+        REPLAY_BASE_URL,
+        notion_template_page_id=metadata.get("template_page_id") or "",
+        notion_review_page_id=metadata.get("review_page_id"),
+    )
+    context = PipelineContext(settings, cassette=cassette)
+    started = time.perf_counter()
+    try:
+        result: Optional[PipelineResult] = run_pipeline(metadata["page_id"], context=context)
+    except Exception as exc:  # a miss surfaces as whatever the SDK wraps it in
+        print(f"replay failed: {exc}")
+        result = None
+    return time.perf_counter() - started, result, cassette
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cassette", type=Path, help="recorded cassette to replay")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--blocks", type=int, default=1000, help="page size when recording a stand-in run")
+    parser.add_argument("--openai-latency-ms", type=float, default=0.0)
+    parser.add_argument("--save", type=Path, help="keep the stand-in recording at this path")
+    args = parser.parse_args()
+    logging.getLogger("notion_client").disabled = True
+
+    path = args.cassette
+    if path is None:
+        path = args.save or Path(tempfile.mkdtemp()) / "stand-in.json"
+        recorded = record_stand_in_run(path, args.blocks, args.openai_latency_ms)
+        print(f"recorded {args.blocks} blocks in {recorded:.3f}s -> {path}")
+
+    runs = [replay_once(path) for _ in range(max(1, args.repeat))]
+    wall, result, cassette = min(runs, key=lambda run: run[0])
+    print(
+        f"replay: best {wall * 1000:.1f} ms of {len(runs)}  "
+        f"replayed={cassette.replayed}/{cassette.interaction_count}  "
+        f"by endpoint only={cassette.loose_matches}  not recorded={len(cassette.misses)}"
+    )
+    if result is not None:
+        stages = "  ".join(f"{stage}={seconds:.3f}s" for stage, seconds in result.stage_seconds.items())
+        print(f"  blocks={result.block_count}  {stages}")
+    for miss in sorted(set(cassette.misses)):
+        print(f"  not recorded: {miss}")
+    return 1 if result is None or cassette.misses else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
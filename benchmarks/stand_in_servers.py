@@ -0,0 +1,426 @@
+"""Local HTTP stand-ins for the Notion and OpenAI APIs used by the benchmarks.
+
+Only the endpoints the pipeline calls are implemented:
+
+* Notion: ``GET pages/{id}``, ``PATCH pages/{id}``, ``GET blocks/{id}/children``
+  (paginated), ``PATCH blocks/{id}/children`` (append, with ``after`` and
+  nested children) and ``PATCH blocks/{id}`` (update / archive).
+* OpenAI: ``POST chat/completions``, streamed or not. The "model" echoes the
+  draft from the prompt back as the formatted document and adds a review
+  section, so the pipeline writes roughly what it read.
+
+Each server adds a fixed latency per request and answers a configurable
+fraction of requests with 429 so retry and throttling paths are exercised.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+REVIEW_HEADING = "AIレビュー結果"
+_STREAM_PIECE_CHARS = 400
+
+
+@dataclass
+class StandInConfig:
+    latency_ms: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after_seconds: float = 0.1
+    seed: int = 0
+
+
+@dataclass
+class _Counters:
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    requests: Counter = field(default_factory=Counter)
+    throttled: int = 0
+
+    def record(self, endpoint: str) -> None:
+        with self.lock:
+            self.requests[endpoint] += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        with self.lock:
+            return {
+                "requests": sum(self.requests.values()),
+                "by_endpoint": dict(self.requests),
+                "throttled": self.throttled,
+            }
+
+
+class _StandInServer:
+    """Threaded HTTP server on 127.0.0.1 with latency and 429 injection."""
+
+    def __init__(self, config: Optional[StandInConfig] = None) -> None:
+        self.config = config = config or StandInConfig()
+        self.counters = _Counters()
+        self._random = random.Random(config.seed)
+        self._random_lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without this every
+            # keep-alive response waits for the peer's delayed ACK.
+            disable_nagle_algorithm = True
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+                pass
+
+            def do_GET(self) -> None:
+                server._dispatch(self, "GET")
+
+            def do_POST(self) -> None:
+                server._dispatch(self, "POST")
+
+            def do_PATCH(self) -> None:
+                server._dispatch(self, "PATCH")
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "_StandInServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def reset_counters(self) -> None:
+        self.counters = _Counters()
+
+    def handle(
+        self, method: str, path: str, query: Dict[str, List[str]], body: Any
+    ) -> Tuple[int, Any]:
+        raise NotImplementedError
+
+    def endpoint(self, method: str, path: str) -> str:
+        return f"{method} {path}"
+
+    def throttled_response(self) -> Tuple[int, Any]:
+        raise NotImplementedError
+
+    def _dispatch(self, handler: BaseHTTPRequestHandler, method: str) -> None:
+        url = urlparse(handler.path)
+        length = int(handler.headers.get("Content-Length") or 0)
+        raw_body = handler.rfile.read(length) if length else b""
+        self.counters.record(self.endpoint(method, url.path))
+        if self.config.latency_ms:
+            time.sleep(self.config.latency_ms / 1000)
+
+        with self._random_lock:
+            throttle = self._random.random() < self.config.throttle_rate
+        if throttle:
+            with self.counters.lock:
+                self.counters.throttled += 1
+            status, payload = self.throttled_response()
+            self._send_json(handler, status, payload, retry_after=self.config.retry_after_seconds)
+            return
+
+        body = json.loads(raw_body) if raw_body else {}
+        status, payload = self.handle(method, url.path, parse_qs(url.query), body)
+        if isinstance(payload, list):  # server-sent events
+            self._send_events(handler, payload)
+        else:
+            self._send_json(handler, status, payload)
+
+    @staticmethod
+    def _send_json(
+        handler: BaseHTTPRequestHandler,
+        status: int,
+        payload: Any,
+        *,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        if retry_after is not None:
+            handler.send_header("Retry-After", f"{retry_after:g}")
+            handler.send_header("retry-after-ms", str(int(retry_after * 1000)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    @staticmethod
+    def _send_events(handler: BaseHTTPRequestHandler, events: List[Any]) -> None:
+        data = b"".join(
+            f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8") for event in events
+        ) + b"data: [DONE]\n\n"
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+
+class NotionStandIn(_StandInServer):
+    """In-memory Notion workspace served over HTTP."""
+
+    def __init__(self, config: Optional[StandInConfig] = None) -> None:
+        super().__init__(config)
+        self._lock = threading.Lock()
+        self._pages: Dict[str, Dict[str, Any]] = {}
+        self._blocks: Dict[str, Dict[str, Any]] = {}
+        self._children: Dict[str, List[str]] = {}
+
+    def add_page(self, blocks: List[Dict[str, Any]]) -> str:
+        """Create a page holding ``blocks`` (with inline ``children``) and return its ID."""
+
+        page_id = str(uuid.uuid4())
+        with self._lock:
+            self._pages[page_id] = {
+                "object": "page",
+                "id": page_id,
+                "last_edited_time": _timestamp(),
+                "properties": {},
+            }
+            self._children[page_id] = []
+            self._insert(page_id, blocks, after=None)
+        return page_id
+
+    def block_count(self, parent_id: str) -> int:
+        """Number of live blocks under ``parent_id``, nested ones included."""
+
+        with self._lock:
+            return self._count(parent_id)
+
+    def endpoint(self, method: str, path: str) -> str:
+        parts = path.strip("/").split("/")[1:]  # drop "v1"
+        return f"{method} " + "/".join(
+            "{id}" if index == 1 else part for index, part in enumerate(parts)
+        )
+
+    def throttled_response(self) -> Tuple[int, Any]:
+        return 429, _notion_error(429, "rate_limited", "Rate limited by the stand-in server.")
+
+    def handle(
+        self, method: str, path: str, query: Dict[str, List[str]], body: Any
+    ) -> Tuple[int, Any]:
+        match = re.fullmatch(r"/v1/(pages|blocks)/([^/]+)(/children)?", path)
+        if match is None:
+            return 404, _notion_error(404, "object_not_found", f"No route for {path}.")
+        kind, object_id, children = match.groups()
+        with self._lock:
+            if kind == "pages" and not children:
+                page = self._pages.get(object_id)
+                if page is None:
+                    return 404, _notion_error(404, "object_not_found", "Page not found.")
+                if method == "PATCH":
+                    page["properties"].update(body.get("properties", {}))
+                    page["last_edited_time"] = _timestamp()
+                return 200, page
+            if kind == "blocks" and children:
+                if object_id not in self._children:
+                    return 404, _notion_error(404, "object_not_found", "Block not found.")
+                if method == "GET":
+                    return 200, self._list_children(object_id, query)
+                created = self._insert(object_id, body.get("children", []), after=body.get("after"))
+                self._touch(object_id)
+                return 200, {"object": "list", "results": created, "has_more": False}
+            if kind == "blocks" and method == "PATCH":
+                block = self._blocks.get(object_id)
+                if block is None:
+                    return 404, _notion_error(404, "object_not_found", "Block not found.")
+                if "archived" in body:
+                    block["archived"] = bool(body["archived"])
+                block_type = block["type"]
+                if isinstance(body.get(block_type), dict):
+                    block[block_type] = _with_plain_text({**block[block_type], **body[block_type]})
+                self._touch(block["parent_id"])
+                return 200, self._public(block)
+        return 405, _notion_error(405, "invalid_request", f"{method} {path} is not supported.")
+
+    def _list_children(self, parent_id: str, query: Dict[str, List[str]]) -> Dict[str, Any]:
+        page_size = min(100, int(query.get("page_size", ["100"])[0]))
+        ids = [child for child in self._children[parent_id] if not self._blocks[child]["archived"]]
+        start = 0
+        cursor = query.get("start_cursor", [""])[0]
+        if cursor:
+            start = ids.index(cursor)
+        batch = ids[start : start + page_size]
+        has_more = start + page_size < len(ids)
+        return {
+            "object": "list",
+            "results": [self._public(self._blocks[child]) for child in batch],
+            "has_more": has_more,
+            "next_cursor": ids[start + page_size] if has_more else None,
+        }
+
+    def _insert(
+        self, parent_id: str, blocks: List[Dict[str, Any]], *, after: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        siblings = self._children[parent_id]
+        position = siblings.index(after) + 1 if after in siblings else len(siblings)
+        created: List[Dict[str, Any]] = []
+        for block in blocks:
+            block_type = block["type"]
+            data = dict(block.get(block_type, {}))
+            nested = data.pop("children", [])
+            block_id = str(uuid.uuid4())
+            stored = {
+                "object": "block",
+                "id": block_id,
+                "type": block_type,
+                block_type: _with_plain_text(data),
+                "archived": False,
+                "parent_id": parent_id,
+            }
+            self._blocks[block_id] = stored
+            self._children[block_id] = []
+            siblings.insert(position, block_id)
+            position += 1
+            if nested:
+                self._insert(block_id, nested, after=None)
+            created.append(self._public(stored))
+        return created
+
+    def _public(self, block: Dict[str, Any]) -> Dict[str, Any]:
+        public = {key: value for key, value in block.items() if key != "parent_id"}
+        public["has_children"] = any(
+            not self._blocks[child]["archived"] for child in self._children[block["id"]]
+        )
+        return public
+
+    def _count(self, parent_id: str) -> int:
+        return sum(
+            1 + self._count(child)
+            for child in self._children.get(parent_id, [])
+            if not self._blocks[child]["archived"]
+        )
+
+    def _touch(self, object_id: str) -> None:
+        while object_id in self._blocks:
+            object_id = self._blocks[object_id]["parent_id"]
+        if object_id in self._pages:
+            self._pages[object_id]["last_edited_time"] = _timestamp()
+
+
+class OpenAIStandIn(_StandInServer):
+    """Chat completions endpoint that echoes the draft from the prompt."""
+
+    def endpoint(self, method: str, path: str) -> str:
+        return f"{method} {path.removeprefix('/v1/')}"
+
+    def throttled_response(self) -> Tuple[int, Any]:
+        return 429, {
+            "error": {
+                "message": "Rate limited by the stand-in server.",
+                "type": "requests",
+                "code": "rate_limit_exceeded",
+            }
+        }
+
+    def handle(
+        self, method: str, path: str, query: Dict[str, List[str]], body: Any
+    ) -> Tuple[int, Any]:
+        if method != "POST" or path.rstrip("/") != "/v1/chat/completions":
+            return 404, {"error": {"message": f"No route for {path}.", "type": "invalid_request_error"}}
+        prompt = "".join(str(message.get("content", "")) for message in body.get("messages", []))
+        content = json.dumps(_completion(prompt), ensure_ascii=False)
+        usage = {
+            "prompt_tokens": len(prompt) // 2,
+            "completion_tokens": len(content) // 2,
+            "total_tokens": (len(prompt) + len(content)) // 2,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        base = {"id": completion_id, "created": int(time.time()), "model": body.get("model", "")}
+        if not body.get("stream"):
+            return 200, {
+                **base,
+                "object": "chat.completion",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+
+        events: List[Any] = [
+            {
+                **base,
+                "object": "chat.completion.chunk",
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": content[start : start + _STREAM_PIECE_CHARS]},
+                        "finish_reason": None,
+                    }
+                ],
+            }
+            for start in range(0, len(content), _STREAM_PIECE_CHARS)
+        ]
+        events.append(
+            {
+                **base,
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+        )
+        if (body.get("stream_options") or {}).get("include_usage"):
+            events.append({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+        return 200, events
+
+
+def _completion(prompt: str) -> Dict[str, Any]:
+    review = (
+        f"## {REVIEW_HEADING}\n"
+        "### ⚠️ 改善が必要な項目\n"
+        "- 🔴 受け入れ条件を具体的に記載してください\n"
+        "### ✅ 十分な項目\n"
+        "- 背景と目的"
+    )
+    summary = {"is_complete": False, "status_message": "差し戻し"}
+    if "## セクションごとの所見（JSON）" in prompt:
+        return {"formatted_markdown": review, "completion_summary": summary}
+    if "## 整形対象のドラフト\n" in prompt:
+        draft = prompt.split("## 整形対象のドラフト\n", 1)[1]
+        return {
+            "formatted_markdown": draft.strip(),
+            "findings": {"missing": [], "needs_improvement": ["受け入れ条件"], "adequate": []},
+        }
+    draft = prompt.split("## 現在のドラフト\n", 1)[-1]
+    return {
+        "formatted_markdown": f"{draft.strip()}\n\n{review}",
+        "completion_summary": summary,
+    }
+
+
+def _with_plain_text(data: Dict[str, Any]) -> Dict[str, Any]:
+    for key in ("rich_text", "caption"):
+        fragments = data.get(key)
+        if isinstance(fragments, list):
+            data[key] = [
+                {**fragment, "plain_text": fragment.get("text", {}).get("content", "")}
+                for fragment in fragments
+            ]
+    return data
+
+
+def _notion_error(status: int, code: str, message: str) -> Dict[str, Any]:
+    return {"object": "error", "status": status, "code": code, "message": message}
+
+
+def _timestamp() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()) + f".{time.time_ns() % 10**9:09d}Z"
@@ -1,83 +1,615 @@
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass
-from typing import Any, Dict
-
-from openai import OpenAI
-from tenacity import RetryError, retry, stop_after_attempt, wait_exponential
+import re
+from dataclasses import dataclass, replace
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
 
 from .config import Settings
+from .model_router import ModelRoute, ModelRouter
 from .prompt_builder import PromptPayload
 
+if TYPE_CHECKING:  # pragma: no cover - result_cache imports AIResult from here
+    import httpx
+
+    from .result_cache import AIResultCache
+
+_T = TypeVar("_T")
+
 
 class AIServiceError(RuntimeError):
     """Raised when the AI service fails to return a valid response."""
 
 
+class MalformedResponseError(AIServiceError):
+    """Raised when the model's answer is not the JSON object the prompt asked for."""
+
+
+@dataclass(frozen=True)
+class TokenUsage:
+    """Token counts reported by OpenAI for one completion."""
+
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    cached_tokens: int = 0
+
+    @property
+    def cached_ratio(self) -> float:
+        """Share of the prompt tokens served from OpenAI's prompt cache."""
+
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+
 @dataclass(frozen=True)
 class AIResult:
     formatted_markdown: str
     is_complete: bool
     completion_message: str
+    from_cache: bool = False
+    usage: Optional[TokenUsage] = None
+    model_routes: Tuple[ModelRoute, ...] = ()
+
+
+def sum_token_usage(usages: Iterable[Optional[TokenUsage]]) -> Optional[TokenUsage]:
+    """Add up the usage of several completions; ``None`` if none reported any."""
+
+    reported = [usage for usage in usages if usage is not None]
+    if not reported:
+        return None
+    return TokenUsage(
+        prompt_tokens=sum(usage.prompt_tokens for usage in reported),
+        completion_tokens=sum(usage.completion_tokens for usage in reported),
+        total_tokens=sum(usage.total_tokens for usage in reported),
+        cached_tokens=sum(usage.cached_tokens for usage in reported),
+    )
 
 
 class AIFormatter:
     """Handles interactions with the OpenAI API and enforces response structure."""
 
-    def __init__(self, settings: Settings) -> None:
-        self._client = OpenAI(api_key=settings.openai_api_key)
-        self._model = settings.openai_model
+    def __init__(
+        self,
+        settings: Settings,
+        *,
+        result_cache: Optional["AIResultCache"] = None,
+        transport: Optional["httpx.BaseTransport"] = None,
+    ) -> None:
+        from openai import OpenAI
+
+        http_client = None
+        if transport is not None:
+            import httpx
+
+            http_client = httpx.Client(transport=transport)
+        # Retries are handled here, so a timeout can fail over to the
+        # fallback model instead of being retried inside the SDK.
+        self._client = OpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            max_retries=0,
+            http_client=http_client,
+        )
+        self._router = ModelRouter(settings)
         self._retry_limit = settings.retry_limit
+        self._result_cache = result_cache
 
     def generate(self, prompts: PromptPayload) -> AIResult:
+        route = self._router.route(prompts)
+        cached = _cached_result(self._result_cache, route.model, prompts)
+        if cached is not None:
+            return cached
+
+        result, usage, route = self._invoke_model(route, prompts, _parse_response)
+
+        result = replace(result, usage=usage, model_routes=(route,))
+        self.remember(prompts, result)
+        return result
+
+    def generate_json(
+        self, prompts: PromptPayload
+    ) -> Tuple[Dict[str, Any], Optional[TokenUsage], ModelRoute]:
+        """Return the raw JSON object for prompts with their own response schema."""
+
+        return self._invoke_model(self._router.route(prompts), prompts, _as_object)
+
+    def cached(self, prompts: PromptPayload) -> Optional[AIResult]:
+        """Return the cached result for ``prompts`` without calling the model."""
+
+        return _cached_result(self._result_cache, self._router.route(prompts).model, prompts)
+
+    def generate_streaming(
+        self,
+        prompts: PromptPayload,
+        on_markdown: Callable[[str], None],
+    ) -> AIResult:
+        """Like :meth:`generate`, but with a streaming completion.
+
+        ``on_markdown`` receives the ``formatted_markdown`` text piece by piece
+        while the model is still generating. A cached result is returned
+        without calling ``on_markdown``; check ``AIResult.from_cache``.
+        """
+
+        route = self._router.route(prompts)
+        cached = _cached_result(self._result_cache, route.model, prompts)
+        if cached is not None:
+            return cached
+
+        stream, route = self._open_stream(route, prompts)
+
+        decoder = _MarkdownFieldDecoder()
+        content: List[str] = []
+        usage: Optional[TokenUsage] = None
         try:
-            response_json = self._invoke_model(prompts)
-        except RetryError as exc:
-            raise AIServiceError("OpenAI API retry attempts exhausted.") from exc
-
-        if "formatted_markdown" not in response_json:
-            raise AIServiceError("Missing 'formatted_markdown' in AI response.")
-        if "completion_summary" not in response_json:
-            raise AIServiceError("Missing 'completion_summary' in AI response.")
-
-        summary = response_json["completion_summary"]
-        if not isinstance(summary, dict):
-            raise AIServiceError("'completion_summary' must be an object.")
-
-        formatted_markdown = str(response_json["formatted_markdown"]).strip()
-        is_complete = bool(summary.get("is_complete"))
-        completion_message = str(summary.get("status_message", "")).strip()
-
-        return AIResult(
-            formatted_markdown=formatted_markdown,
-            is_complete=is_complete,
-            completion_message=completion_message,
+            chunks = iter(stream)
+            while True:
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    break
+                except Exception as exc:
+                    raise AIServiceError("OpenAI response stream was interrupted.") from exc
+                usage = _token_usage(chunk) or usage
+                delta = _chunk_content(chunk)
+                if delta:
+                    content.append(delta)
+                    markdown = decoder.feed(delta)
+                    if markdown:
+                        on_markdown(markdown)
+        finally:
+            stream.close()
+
+        result = replace(
+            _parse_response(_decode_content("".join(content))),
+            usage=usage,
+            model_routes=(route,),
+        )
+        self.remember(prompts, result)
+        return result
+
+    def remember(self, prompts: PromptPayload, result: AIResult) -> None:
+        """Store ``result`` as the answer for ``prompts`` in the result cache.
+
+        Results that needed the fallback model are not stored.
+        """
+
+        _store_result(self._result_cache, self._router.route(prompts).model, prompts, result)
+
+    def _invoke_model(
+        self,
+        route: ModelRoute,
+        prompts: PromptPayload,
+        parse: Callable[[Dict[str, Any]], _T],
+    ) -> Tuple[_T, Optional[TokenUsage], ModelRoute]:
+        def call_api(route: ModelRoute) -> Tuple[_T, Optional[TokenUsage], ModelRoute]:
+            completion = self._client.chat.completions.create(**_completion_kwargs(route, prompts))
+            return parse(_decode_completion(completion)), _token_usage(completion), route
+
+        return _call_with_fallback(self._router, route, self._retry_limit, call_api)
+
+    def _open_stream(self, route: ModelRoute, prompts: PromptPayload) -> Tuple[Any, ModelRoute]:
+        # Only opening the stream is retried; once text has been handed to the
+        # caller, a failure has to surface instead of starting over.
+        def open_stream(route: ModelRoute) -> Tuple[Any, ModelRoute]:
+            stream = self._client.chat.completions.create(
+                **_completion_kwargs(route, prompts),
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            return stream, route
+
+        return _call_with_fallback(self._router, route, self._retry_limit, open_stream)
+
+
+class AsyncAIFormatter:
+    """Asyncio variant of :class:`AIFormatter` built on ``AsyncOpenAI``."""
+
+    def __init__(
+        self,
+        settings: Settings,
+        *,
+        result_cache: Optional["AIResultCache"] = None,
+        transport: Optional["httpx.AsyncBaseTransport"] = None,
+    ) -> None:
+        from openai import AsyncOpenAI
+
+        http_client = None
+        if transport is not None:
+            import httpx
+
+            http_client = httpx.AsyncClient(transport=transport)
+        self._client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            max_retries=0,
+            http_client=http_client,
         )
+        self._router = ModelRouter(settings)
+        self._retry_limit = settings.retry_limit
+        self._result_cache = result_cache
+
+    async def generate(self, prompts: PromptPayload) -> AIResult:
+        route = self._router.route(prompts)
+        cached = _cached_result(self._result_cache, route.model, prompts)
+        if cached is not None:
+            return cached
+
+        result, usage, route = await self._invoke_model(route, prompts, _parse_response)
+
+        result = replace(result, usage=usage, model_routes=(route,))
+        self.remember(prompts, result)
+        return result
+
+    async def generate_json(
+        self, prompts: PromptPayload
+    ) -> Tuple[Dict[str, Any], Optional[TokenUsage], ModelRoute]:
+        return await self._invoke_model(self._router.route(prompts), prompts, _as_object)
+
+    def cached(self, prompts: PromptPayload) -> Optional[AIResult]:
+        return _cached_result(self._result_cache, self._router.route(prompts).model, prompts)
 
-    def _invoke_model(self, prompts: PromptPayload) -> Dict[str, Any]:
-        @retry(
-            stop=stop_after_attempt(self._retry_limit),
-            wait=wait_exponential(multiplier=1, min=1, max=30),
-            reraise=True,
+    async def generate_streaming(
+        self,
+        prompts: PromptPayload,
+        on_markdown: Callable[[str], None],
+    ) -> AIResult:
+        route = self._router.route(prompts)
+        cached = _cached_result(self._result_cache, route.model, prompts)
+        if cached is not None:
+            return cached
+
+        stream, route = await self._open_stream(route, prompts)
+
+        decoder = _MarkdownFieldDecoder()
+        content: List[str] = []
+        usage: Optional[TokenUsage] = None
+        try:
+            chunks = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    break
+                except Exception as exc:
+                    raise AIServiceError("OpenAI response stream was interrupted.") from exc
+                usage = _token_usage(chunk) or usage
+                delta = _chunk_content(chunk)
+                if delta:
+                    content.append(delta)
+                    markdown = decoder.feed(delta)
+                    if markdown:
+                        on_markdown(markdown)
+        finally:
+            await stream.close()
+
+        result = replace(
+            _parse_response(_decode_content("".join(content))),
+            usage=usage,
+            model_routes=(route,),
         )
-        def call_api() -> Dict[str, Any]:
-            completion = self._client.chat.completions.create(
-                model=self._model,
-                response_format={"type": "json_object"},
-                messages=[
-                    {"role": "system", "content": prompts.system_prompt},
-                    {"role": "user", "content": prompts.user_prompt},
-                ],
+        self.remember(prompts, result)
+        return result
+
+    def remember(self, prompts: PromptPayload, result: AIResult) -> None:
+        _store_result(self._result_cache, self._router.route(prompts).model, prompts, result)
+
+    async def aclose(self) -> None:
+        await self._client.close()
+
+    async def _invoke_model(
+        self,
+        route: ModelRoute,
+        prompts: PromptPayload,
+        parse: Callable[[Dict[str, Any]], _T],
+    ) -> Tuple[_T, Optional[TokenUsage], ModelRoute]:
+        async def call_api(route: ModelRoute) -> Tuple[_T, Optional[TokenUsage], ModelRoute]:
+            completion = await self._client.chat.completions.create(
+                **_completion_kwargs(route, prompts)
             )
+            return parse(_decode_completion(completion)), _token_usage(completion), route
+
+        return await _acall_with_fallback(self._router, route, self._retry_limit, call_api)
+
+    async def _open_stream(
+        self, route: ModelRoute, prompts: PromptPayload
+    ) -> Tuple[Any, ModelRoute]:
+        async def open_stream(route: ModelRoute) -> Tuple[Any, ModelRoute]:
+            stream = await self._client.chat.completions.create(
+                **_completion_kwargs(route, prompts),
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            return stream, route
+
+        return await _acall_with_fallback(self._router, route, self._retry_limit, open_stream)
+
+
+def _retrying(retry_limit: int, *, fails_over: bool) -> Any:
+    # tenacity is imported on the first API call rather than at start-up.
+    from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+
+    return retry(
+        stop=stop_after_attempt(retry_limit),
+        wait=wait_exponential(multiplier=1, min=1, max=30),
+        # With a fallback model a timeout moves on to it instead of waiting
+        # out the same timeout again.
+        retry=retry_if_exception(lambda exc: not (fails_over and _is_timeout(exc))),
+        reraise=True,
+    )
+
+
+def _call_with_retries(retry_limit: int, call: Callable[[], _T], *, fails_over: bool) -> _T:
+    from tenacity import RetryError
+
+    try:
+        return _retrying(retry_limit, fails_over=fails_over)(call)()
+    except RetryError as exc:
+        raise AIServiceError("OpenAI API retry attempts exhausted.") from exc
+
+
+async def _acall_with_retries(
+    retry_limit: int, call: Callable[[], Awaitable[_T]], *, fails_over: bool
+) -> _T:
+    from tenacity import RetryError
+
+    # tenacity only retries asynchronously when it wraps a coroutine function.
+    @_retrying(retry_limit, fails_over=fails_over)
+    async def attempt() -> _T:
+        return await call()
+
+    try:
+        return await attempt()
+    except RetryError as exc:
+        raise AIServiceError("OpenAI API retry attempts exhausted.") from exc
+
+
+def _call_with_fallback(
+    router: ModelRouter,
+    route: ModelRoute,
+    retry_limit: int,
+    call: Callable[[ModelRoute], _T],
+) -> _T:
+    """Call ``call(route)`` with retries, then on the fallback model after a
+    timeout or malformed JSON."""
+
+    fails_over = router.has_fallback(route)
+    try:
+        return _call_with_retries(retry_limit, lambda: call(route), fails_over=fails_over)
+    except Exception as exc:
+        fallback = _fallback_route(router, route, exc)
+        if fallback is None:
+            raise
+        return _call_with_retries(retry_limit, lambda: call(fallback), fails_over=False)
+
+
+async def _acall_with_fallback(
+    router: ModelRouter,
+    route: ModelRoute,
+    retry_limit: int,
+    call: Callable[[ModelRoute], Awaitable[_T]],
+) -> _T:
+    fails_over = router.has_fallback(route)
+    try:
+        return await _acall_with_retries(retry_limit, lambda: call(route), fails_over=fails_over)
+    except Exception as exc:
+        fallback = _fallback_route(router, route, exc)
+        if fallback is None:
+            raise
+        return await _acall_with_retries(retry_limit, lambda: call(fallback), fails_over=False)
+
+
+def _fallback_route(router: ModelRouter, route: ModelRoute, exc: Exception) -> Optional[ModelRoute]:
+    if _is_timeout(exc):
+        return router.fallback(route, f"timed out after {route.timeout_seconds:.1f}s")
+    if isinstance(exc, MalformedResponseError):
+        return router.fallback(route, f"malformed JSON ({exc})")
+    return None
+
+
+def _is_timeout(exc: BaseException) -> bool:
+    from openai import APITimeoutError
+
+    return isinstance(exc, APITimeoutError)
+
+
+def _cached_result(
+    cache: Optional["AIResultCache"], model: str, prompts: PromptPayload
+) -> Optional[AIResult]:
+    if cache is None:
+        return None
+    cached = cache.get(model, prompts)
+    return replace(cached, from_cache=True) if cached is not None else None
+
+
+def _store_result(
+    cache: Optional["AIResultCache"],
+    model: str,
+    prompts: PromptPayload,
+    result: AIResult,
+) -> None:
+    if cache is None or any(route.fallback_from for route in result.model_routes):
+        # The key names the routed model; a fallback model's output stored
+        # under it would later be served as that model's answer.
+        return
+    try:
+        cache.put(model, prompts, result)
+    except OSError:
+        # A read-only or full cache directory must not fail the run.
+        pass
+
+
+def _completion_kwargs(route: ModelRoute, prompts: PromptPayload) -> Dict[str, Any]:
+    return {
+        "model": route.model,
+        "timeout": route.timeout_seconds,
+        "response_format": {"type": "json_object"},
+        "messages": _build_messages(prompts),
+        # Routes requests that share the static prompt prefix to the same
+        # prompt cache; sent as extra_body so older SDKs accept it too.
+        "extra_body": {"prompt_cache_key": prompts.prefix_fingerprint},
+    }
+
+
+def _token_usage(response: Any) -> Optional[TokenUsage]:
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return TokenUsage(
+        prompt_tokens=int(getattr(usage, "prompt_tokens", 0) or 0),
+        completion_tokens=int(getattr(usage, "completion_tokens", 0) or 0),
+        total_tokens=int(getattr(usage, "total_tokens", 0) or 0),
+        cached_tokens=int(getattr(details, "cached_tokens", 0) or 0),
+    )
+
+
+def _build_messages(prompts: PromptPayload) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": prompts.system_prompt},
+        {"role": "user", "content": prompts.user_prompt},
+    ]
+
+
+def _decode_completion(completion: Any) -> Dict[str, Any]:
+    return _decode_content(completion.choices[0].message.content)
+
+
+def _chunk_content(chunk: Any) -> str:
+    if not chunk.choices:
+        return ""
+    return chunk.choices[0].delta.content or ""
+
+
+def _decode_content(content: Optional[str]) -> Dict[str, Any]:
+    if not content:
+        raise MalformedResponseError("Received empty response from OpenAI.")
+
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError as exc:
+        raise MalformedResponseError("Failed to parse JSON from OpenAI response.") from exc
+
+
+def _as_object(response_json: Dict[str, Any]) -> Dict[str, Any]:
+    if not isinstance(response_json, dict):
+        raise MalformedResponseError("OpenAI response is not a JSON object.")
+    return response_json
+
+
+_JSON_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+class _MarkdownFieldDecoder:
+    """Decodes the ``formatted_markdown`` string out of a partial JSON response.
+
+    ``feed`` takes the next piece of the raw completion and returns the
+    newly decoded part of the string value; escapes split across pieces are
+    kept until they are complete.
+    """
+
+    _FIELD_START = re.compile(r'"formatted_markdown"\s*:\s*"')
+
+    def __init__(self) -> None:
+        self._pending = ""
+        self._started = False
+        self._finished = False
+
+    def feed(self, chunk: str) -> str:
+        if self._finished:
+            return ""
+        self._pending += chunk
+        if not self._started:
+            match = self._FIELD_START.search(self._pending)
+            if match is None:
+                return ""
+            self._started = True
+            self._pending = self._pending[match.end() :]
+
+        text = self._pending
+        decoded: List[str] = []
+        index = 0
+        while index < len(text):
+            char = text[index]
+            if char == '"':
+                self._finished = True
+                index += 1
+                break
+            if char != "\\":
+                decoded.append(char)
+                index += 1
+                continue
+            if index + 1 >= len(text):
+                break
+            escape = text[index + 1]
+            if escape != "u":
+                decoded.append(_JSON_ESCAPES.get(escape, escape))
+                index += 2
+                continue
+            if index + 6 > len(text):
+                break
+            code = _hex_code(text[index + 2 : index + 6])
+            if 0xD800 <= code < 0xDC00:
+                # A high surrogate is only decodable together with its pair.
+                if index + 12 > len(text):
+                    break
+                if text[index + 6 : index + 8] == "\\u":
+                    low = _hex_code(text[index + 8 : index + 12])
+                    if 0xDC00 <= low < 0xE000:
+                        decoded.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                        index += 12
+                        continue
+            decoded.append(chr(code))
+            index += 6
+
+        self._pending = text[index:]
+        return "".join(decoded)
+
+
+def _hex_code(digits: str) -> int:
+    try:
+        return int(digits, 16)
+    except ValueError as exc:
+        raise AIServiceError("Malformed escape in streamed OpenAI response.") from exc
+
+
+def _parse_response(response_json: Dict[str, Any]) -> AIResult:
+    if not isinstance(response_json, dict):
+        raise MalformedResponseError("OpenAI response is not a JSON object.")
+    if "formatted_markdown" not in response_json:
+        raise MalformedResponseError("Missing 'formatted_markdown' in AI response.")
+    if "completion_summary" not in response_json:
+        raise MalformedResponseError("Missing 'completion_summary' in AI response.")
 
-            content = completion.choices[0].message.content
-            if not content:
-                raise AIServiceError("Received empty response from OpenAI.")
+    summary = response_json["completion_summary"]
+    if not isinstance(summary, dict):
+        raise MalformedResponseError("'completion_summary' must be an object.")
 
-            try:
-                return json.loads(content)
-            except json.JSONDecodeError as exc:
-                raise AIServiceError("Failed to parse JSON from OpenAI response.") from exc
+    formatted_markdown = str(response_json["formatted_markdown"]).strip()
+    is_complete = bool(summary.get("is_complete"))
+    completion_message = str(summary.get("status_message", "")).strip()
 
-        return call_api()
+    return AIResult(
+        formatted_markdown=formatted_markdown,
+        is_complete=is_complete,
+        completion_message=completion_message,
+    )
@@ -0,0 +1,306 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from .page_snapshot import Block, RichText
+
+# Limits of a single ``blocks.children.append`` request
+# (https://developers.notion.com/reference/request-limits).
+MAX_CHILDREN_PER_REQUEST = 100
+MAX_BLOCK_ELEMENTS_PER_REQUEST = 1000
+MAX_NESTING_DEPTH = 2
+MAX_RICH_TEXT_LENGTH = 2000
+MAX_RICH_TEXT_ELEMENTS = 100
+# Notion rejects bodies over 500KB; keep headroom for the request envelope.
+MAX_REQUEST_BYTES = 450_000
+
+_RICH_TEXT_KEYS = ("rich_text", "caption")
+# Text past MAX_RICH_TEXT_ELEMENTS continues in blocks of the same type right
+# after these; blocks that hold their own nested content continue in
+# paragraphs nested first under them, and anything else (headings) in
+# paragraphs after them.
+_SIBLING_CONTINUATION_TYPES = {"paragraph", "quote", "code"}
+_NESTED_CONTINUATION_TYPES = {
+    "bulleted_list_item",
+    "numbered_list_item",
+    "to_do",
+    "toggle",
+    "callout",
+}
+
+
+@dataclass(frozen=True)
+class AppendRequest:
+    """One ``blocks.children.append`` call.
+
+    ``deferred`` maps an index in ``children`` to nested blocks that could
+    not be sent inline (too deep or too many); they are appended under the
+    block created at that index once its ID is known. ``source_blocks`` is
+    how many of the planned blocks the request completes; it differs from
+    ``len(children)`` when a block was split by :func:`fit_block`.
+    """
+
+    children: List[Block]
+    deferred: Dict[int, List[Block]] = field(default_factory=dict)
+    source_blocks: int = 0
+
+
+def plan_append_requests(blocks: List[Block]) -> List[AppendRequest]:
+    """Pack ``blocks`` into as few append requests as the API limits allow.
+
+    Each block keeps up to ``MAX_NESTING_DEPTH`` levels of nested children
+    inline. A block whose subtree is deeper, has a children list over
+    ``MAX_CHILDREN_PER_REQUEST`` or would not fit in one request on its own
+    is sent without its children, which are deferred to follow-up requests
+    under the created block. Requests are cut by block count, total block
+    elements (nested ones included) and serialized size. Blocks are first
+    passed through :func:`fit_block`; the pieces of one block start a new
+    request unless they all fit in the current one.
+    """
+
+    requests: List[AppendRequest] = []
+    children: List[Block] = []
+    deferred: Dict[int, List[Block]] = {}
+    elements = 0
+    size = 0
+    completed = 0
+
+    def fits(count: int, more_elements: int, more_size: int) -> bool:
+        return (
+            len(children) + count <= MAX_CHILDREN_PER_REQUEST
+            and elements + more_elements <= MAX_BLOCK_ELEMENTS_PER_REQUEST
+            and size + more_size <= MAX_REQUEST_BYTES
+        )
+
+    def flush() -> None:
+        nonlocal children, deferred, elements, size, completed
+        requests.append(AppendRequest(children, deferred, completed))
+        children, deferred, elements, size, completed = [], {}, 0, 0, 0
+
+    for block in blocks:
+        pieces = [_inline_block(piece) for piece in fit_block(block)]
+        measured = [
+            (payload, nested, _count_elements(payload), _payload_size(payload))
+            for payload, nested in pieces
+        ]
+        if children and not fits(
+            len(measured),
+            sum(piece[2] for piece in measured),
+            sum(piece[3] for piece in measured),
+        ):
+            flush()
+        for payload, nested, block_elements, block_size in measured:
+            if children and not fits(1, block_elements, block_size):
+                flush()
+            if nested:
+                deferred[len(children)] = nested
+            children.append(payload)
+            elements += block_elements
+            size += block_size
+        completed += 1
+    if children:
+        flush()
+    return requests
+
+
+def fit_block(block: Block) -> List[Block]:
+    """Return ``block`` as one or more blocks within the rich text limits.
+
+    Fragments are split at ``MAX_RICH_TEXT_LENGTH`` (:func:`fit_rich_text`)
+    and a ``rich_text`` list longer than ``MAX_RICH_TEXT_ELEMENTS`` overflows
+    into continuation blocks, in nested children too. A block within the
+    limits comes back unchanged as the only item.
+    """
+
+    return _split_overflow(fit_rich_text(block))
+
+
+def fit_rich_text(block: Block) -> Block:
+    """Return ``block`` with every over-long rich text fragment split.
+
+    Applies to the block's own ``rich_text`` / ``caption``, table cells
+    and, recursively, nested ``children``. The block is copied only where
+    something changes.
+    """
+
+    block_type = block.get("type")
+    data = block.get(block_type) if isinstance(block_type, str) else None
+    if not isinstance(data, dict):
+        return block
+
+    updated = dict(data)
+    changed = False
+    for key in _RICH_TEXT_KEYS:
+        value = data.get(key)
+        if isinstance(value, list):
+            split = split_rich_text(value)
+            if split is not value:
+                updated[key] = split
+                changed = True
+    cells = data.get("cells")
+    if isinstance(cells, list):
+        split_cells = [split_rich_text(cell) if isinstance(cell, list) else cell for cell in cells]
+        if any(new is not old for new, old in zip(split_cells, cells)):
+            updated["cells"] = split_cells
+            changed = True
+    nested = data.get("children")
+    if isinstance(nested, list):
+        fitted = [fit_rich_text(child) if isinstance(child, dict) else child for child in nested]
+        if any(new is not old for new, old in zip(fitted, nested)):
+            updated["children"] = fitted
+            changed = True
+
+    if not changed:
+        return block
+    return {**block, block_type: updated}
+
+
+def split_rich_text(rich_text: RichText) -> RichText:
+    """Split text fragments over ``MAX_RICH_TEXT_LENGTH`` keeping their annotations.
+
+    Returns ``rich_text`` itself when nothing needs splitting.
+    """
+
+    if not any(_needs_split(fragment) for fragment in rich_text):
+        return rich_text
+    result: RichText = []
+    for fragment in rich_text:
+        if not _needs_split(fragment):
+            result.append(fragment)
+            continue
+        text = fragment["text"]
+        for piece in _split_text(str(text["content"]), MAX_RICH_TEXT_LENGTH):
+            result.append({**fragment, "text": {**text, "content": piece}})
+    return result
+
+
+def _needs_split(fragment: object) -> bool:
+    if not isinstance(fragment, dict) or fragment.get("type", "text") != "text":
+        return False
+    text = fragment.get("text")
+    if not isinstance(text, dict):
+        return False
+    content = text.get("content")
+    return isinstance(content, str) and _text_length(content) > MAX_RICH_TEXT_LENGTH
+
+
+def _text_length(text: str) -> int:
+    # Notion counts characters as UTF-16 code units.
+    return len(text) + sum(1 for char in text if ord(char) > 0xFFFF)
+
+
+def _split_text(text: str, limit: int) -> List[str]:
+    pieces: List[str] = []
+    start = 0
+    length = 0
+    for index, char in enumerate(text):
+        width = 2 if ord(char) > 0xFFFF else 1
+        if length + width > limit:
+            pieces.append(text[start:index])
+            start, length = index, 0
+        length += width
+    pieces.append(text[start:])
+    return pieces
+
+
+def _inline_block(block: Block) -> Tuple[Block, List[Block]]:
+    """Return the block to send and the nested children to append later (if any)."""
+
+    block_type = str(block.get("type"))
+    data = block.get(block_type)
+    if not isinstance(data, dict) or not data.get("children"):
+        return block, []
+    if (
+        _depth(block) <= MAX_NESTING_DEPTH
+        and _children_fit(block)
+        and _count_elements(block) <= MAX_BLOCK_ELEMENTS_PER_REQUEST
+        and _payload_size(block) <= MAX_REQUEST_BYTES
+    ):
+        return block, []
+
+    nested = list(data["children"])
+    stripped = {key: value for key, value in data.items() if key != "children"}
+    if block_type == "table":
+        # A table must be created with its rows; the rest can follow.
+        stripped["children"] = nested[:MAX_CHILDREN_PER_REQUEST]
+        nested = nested[MAX_CHILDREN_PER_REQUEST:]
+    return {**block, block_type: stripped}, nested
+
+
+def _nested_children(block: Block) -> List[Block]:
+    data = block.get(str(block.get("type")))
+    children = data.get("children") if isinstance(data, dict) else None
+    return [child for child in children if isinstance(child, dict)] if children else []
+
+
+def _depth(block: Block) -> int:
+    children = _nested_children(block)
+    return 1 + max(_depth(child) for child in children) if children else 0
+
+
+def _children_fit(block: Block) -> bool:
+    children = _nested_children(block)
+    return len(children) <= MAX_CHILDREN_PER_REQUEST and all(
+        _children_fit(child) for child in children
+    )
+
+
+def _count_elements(block: Block) -> int:
+    return 1 + sum(_count_elements(child) for child in _nested_children(block))
+
+
+def _payload_size(block: Block) -> int:
+    return len(json.dumps(block, ensure_ascii=False).encode("utf-8"))
+
+
+def _split_overflow(block: Block) -> List[Block]:
+    block_type = block.get("type")
+    data = block.get(block_type) if isinstance(block_type, str) else None
+    if not isinstance(data, dict):
+        return [block]
+
+    children = data.get("children")
+    if isinstance(children, list):
+        expanded = [
+            piece
+            for child in children
+            for piece in (_split_overflow(child) if isinstance(child, dict) else [child])
+        ]
+        if len(expanded) != len(children):
+            data = {**data, "children": expanded}
+            block = {**block, block_type: data}
+
+    rich_text = data.get("rich_text")
+    if not isinstance(rich_text, list) or len(rich_text) <= MAX_RICH_TEXT_ELEMENTS:
+        return [block]
+    overflow = [
+        rich_text[start : start + MAX_RICH_TEXT_ELEMENTS]
+        for start in range(MAX_RICH_TEXT_ELEMENTS, len(rich_text), MAX_RICH_TEXT_ELEMENTS)
+    ]
+    head = {key: value for key, value in data.items() if key != "children"}
+    head["rich_text"] = rich_text[:MAX_RICH_TEXT_ELEMENTS]
+    nested = list(data.get("children") or [])
+
+    if block_type in _SIBLING_CONTINUATION_TYPES:
+        # Only the last piece keeps the caption and the nested children.
+        base = {key: value for key, value in head.items() if key != "caption"}
+        pieces = [{**block, block_type: {**base, "rich_text": head["rich_text"]}}]
+        pieces.extend(
+            {"type": block_type, block_type: {**base, "rich_text": text}} for text in overflow
+        )
+        last = {**pieces[-1][block_type]}
+        if "caption" in data:
+            last["caption"] = data["caption"]
+        if nested:
+            last["children"] = nested
+        pieces[-1] = {**pieces[-1], block_type: last}
+        return pieces
+
+    continuation = [{"type": "paragraph", "paragraph": {"rich_text": text}} for text in overflow]
+    if block_type in _NESTED_CONTINUATION_TYPES:
+        return [{**block, block_type: {**head, "children": continuation + nested}}]
+    if nested:
+        head["children"] = nested
+    return [{**block, block_type: head}, *continuation]
@@ -0,0 +1,373 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Dict, Iterable, List, Optional, TypeVar
+
+from .append_planner import AppendRequest, plan_append_requests
+from .notion_service import (
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    ArchiveReport,
+    BlockUpdates,
+    DiffReport,
+    PageWriterBase,
+    archive_failure,
+    collect_children_level,
+    created_block_ids,
+    diff_block_updates,
+    diff_failure,
+    insert_anchor,
+    plan_diff_update,
+    record_update_outcome,
+    restore_updates,
+    resume_archive_targets,
+    split_replaceable_blocks,
+)
+from .page_cache import PageMarkdownCache
+from .page_snapshot import Block, BlockTree, PageSnapshot
+from .rate_limiter import (
+    NOTION_REQUESTS_PER_SECOND,
+    RateLimiter,
+    RequestStats,
+    shared_rate_limiter,
+)
+from .write_journal import WriteJournal
+
+if TYPE_CHECKING:
+    import httpx
+
+T = TypeVar("T")
+
+
+class AsyncNotionService:
+    """Asyncio counterpart of :class:`~notion_formatter.notion_service.NotionService`.
+
+    Every Notion call is an awaitable task on the caller's event loop; the
+    per-service semaphore bounds in-flight requests and the shared rate
+    limiter keeps the whole process within Notion's request budget. Planning
+    and reconciliation are the module-level helpers of ``notion_service``,
+    so only the Notion calls differ between the two services.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        *,
+        max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+        page_cache: Optional[PageMarkdownCache] = None,
+        retry_limit: int = 3,
+        requests_per_second: float = NOTION_REQUESTS_PER_SECOND,
+        rate_limiter: Optional[RateLimiter] = None,
+        stats: Optional[RequestStats] = None,
+        base_url: Optional[str] = None,
+        transport: Optional["httpx.AsyncBaseTransport"] = None,
+    ) -> None:
+        self._stats = stats or RequestStats()
+        # notion-client and httpx are only imported once a service is built.
+        from .throttled_client import ThrottledAsyncClient
+
+        client_options: Dict[str, Any] = {"base_url": base_url} if base_url else {}
+        if transport is not None:
+            import httpx
+
+            client_options["client"] = httpx.AsyncClient(transport=transport)
+        self._client = ThrottledAsyncClient(
+            auth=api_key,
+            rate_limiter=rate_limiter or shared_rate_limiter(requests_per_second),
+            stats=self._stats,
+            retry_limit=retry_limit,
+            **client_options,
+        )
+        self._max_concurrent_requests = max(1, max_concurrent_requests)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._page_cache = page_cache
+
+    @property
+    def request_stats(self) -> RequestStats:
+        return self._stats
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def fetch_page_markdown(self, page_id: str, *, use_cache: bool = False) -> str:
+        if not use_cache or self._page_cache is None:
+            return (await self.fetch_page_snapshot(page_id)).to_markdown()
+
+        page = await self._bounded(self._client.pages.retrieve(page_id=page_id))
+        last_edited_time = str(page.get("last_edited_time", ""))
+        if last_edited_time:
+            cached = self._page_cache.get(page_id, last_edited_time)
+            if cached is not None:
+                return cached
+
+        markdown = (await self.fetch_page_snapshot(page_id)).to_markdown()
+        if last_edited_time:
+            self._page_cache.put(page_id, last_edited_time, markdown)
+        return markdown
+
+    async def fetch_page_snapshot(self, page_id: str) -> PageSnapshot:
+        tree: BlockTree = {}
+        level: List[str] = [page_id]
+        while level:
+            results = await asyncio.gather(
+                *(self._fetch_block_children(parent_id) for parent_id in level)
+            )
+            level = collect_children_level(tree, level, results)
+        return PageSnapshot.from_tree(page_id, tree)
+
+    async def replace_page_content(
+        self,
+        page_id: str,
+        blocks: List[Block],
+        *,
+        snapshot: Optional[PageSnapshot] = None,
+        journal: Optional[WriteJournal] = None,
+    ) -> ArchiveReport:
+        if snapshot is None:
+            snapshot = await self.fetch_page_snapshot(page_id)
+        report = await self._archive_existing_children(snapshot)
+        if not report.ok:
+            raise archive_failure(report)
+        started = time.perf_counter()
+        if journal is None:
+            await self._append_blocks(page_id, list(blocks))
+        else:
+            await self._append_journaled(page_id, journal.remaining_blocks, journal)
+        report.append_seconds = time.perf_counter() - started
+        return report
+
+    async def resume_page_content(self, journal: WriteJournal) -> ArchiveReport:
+        page_id = journal.page_id
+        leftovers = resume_archive_targets(journal, await self._fetch_block_children(page_id))
+        report = await self._archive_blocks(leftovers, preserved=journal.preserved)
+        if not report.ok:
+            raise archive_failure(report, resuming=True)
+        started = time.perf_counter()
+        await self._append_journaled(page_id, journal.remaining_blocks, journal)
+        report.append_seconds = time.perf_counter() - started
+        return report
+
+    async def restore_page_content(self, journal: WriteJournal) -> ArchiveReport:
+        report = ArchiveReport()
+        updates = restore_updates(journal, await self._fetch_block_children(journal.page_id))
+        await self._apply_block_updates(report, updates)
+        return report
+
+    def open_page_writer(
+        self,
+        page_id: str,
+        *,
+        snapshot: PageSnapshot,
+        journal: Optional[WriteJournal] = None,
+    ) -> "AsyncStreamingPageWriter":
+        return AsyncStreamingPageWriter(self, page_id, snapshot, journal)
+
+    async def update_page_content(
+        self,
+        page_id: str,
+        blocks: List[Block],
+        *,
+        snapshot: Optional[PageSnapshot] = None,
+    ) -> ArchiveReport:
+        if snapshot is None:
+            snapshot = await self.fetch_page_snapshot(page_id)
+
+        planned = plan_diff_update(snapshot, blocks)
+        if planned is None:
+            return await self.replace_page_content(page_id, blocks, snapshot=snapshot)
+        plan, preserved = planned
+        report = DiffReport(preserved=preserved)
+
+        started = time.perf_counter()
+        last_created: List[str] = []
+        for insert in plan.inserts:
+            after = insert_anchor(insert, last_created)
+            created = await self._append_blocks(page_id, insert.blocks, after=after)
+            report.inserted += len(created)
+            last_created.append(created[-1] if created else str(after))
+        report.append_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        await self._apply_block_updates(report, diff_block_updates(plan))
+        report.archive_seconds = time.perf_counter() - started
+        if not report.ok:
+            raise diff_failure(report)
+        return report
+
+    async def update_status_property(
+        self,
+        page_id: str,
+        property_name: str,
+        option_name: str,
+    ) -> None:
+        if not property_name:
+            raise ValueError("property_name must be a non-empty string")
+        if not option_name:
+            raise ValueError("option_name must be a non-empty string")
+
+        await self._bounded(
+            self._client.pages.update(
+                page_id=page_id,
+                properties={
+                    property_name: {"status": {"name": option_name}},
+                },
+            )
+        )
+
+    async def _archive_existing_children(self, snapshot: PageSnapshot) -> ArchiveReport:
+        replaceable, preserved, _ = split_replaceable_blocks(snapshot)
+        return await self._archive_blocks(
+            [str(block["id"]) for block in replaceable], preserved=preserved
+        )
+
+    async def _archive_blocks(self, targets: List[str], *, preserved: List[str]) -> ArchiveReport:
+        report = ArchiveReport(preserved=list(preserved))
+        started = time.perf_counter()
+        await self._apply_block_updates(report, [(target, {"archived": True}) for target in targets])
+        report.archive_seconds = time.perf_counter() - started
+        return report
+
+    async def _append_blocks(
+        self,
+        parent_id: str,
+        blocks: List[Block],
+        *,
+        after: Optional[str] = None,
+    ) -> List[str]:
+        created_ids: List[str] = []
+        for request in plan_append_requests(blocks):
+            ids = await self._append_request(parent_id, request, after=after)
+            if after:
+                after = ids[-1]
+            created_ids.extend(ids)
+        return created_ids
+
+    async def _append_journaled(
+        self, page_id: str, blocks: List[Block], journal: WriteJournal
+    ) -> List[str]:
+        created_ids: List[str] = []
+        for request in plan_append_requests(blocks):
+            ids = await self._append_request(page_id, request)
+            journal.record_request(ids, request.source_blocks)
+            created_ids.extend(ids)
+        return created_ids
+
+    async def _append_request(
+        self,
+        parent_id: str,
+        request: AppendRequest,
+        *,
+        after: Optional[str] = None,
+    ) -> List[str]:
+        kwargs: Dict[str, Any] = {"block_id": parent_id, "children": request.children}
+        if after:
+            kwargs["after"] = after
+        response = await self._bounded(self._client.blocks.children.append(**kwargs))
+        ids = created_block_ids(request, response, after=after)
+        for index, nested in request.deferred.items():
+            await self._append_blocks(ids[index], nested)
+        return ids
+
+    async def _apply_block_updates(self, report: ArchiveReport, updates: BlockUpdates) -> None:
+        results = await asyncio.gather(
+            *(
+                self._bounded(self._client.blocks.update(block_id=block_id, **payload))
+                for block_id, payload in updates
+            ),
+            return_exceptions=True,
+        )
+        for (block_id, payload), outcome in zip(updates, results):
+            error = outcome if isinstance(outcome, BaseException) else None
+            record_update_outcome(report, block_id, payload, error)
+
+    async def _fetch_block_children(self, block_id: str) -> List[Block]:
+        results: List[Block] = []
+        cursor: str | None = None
+        while True:
+            response = await self._bounded(
+                self._client.blocks.children.list(
+                    block_id=block_id,
+                    start_cursor=cursor,
+                    page_size=100,
+                )
+            )
+            results.extend(response.get("results", []))
+            if not response.get("has_more"):
+                break
+            cursor = response.get("next_cursor")
+        return results
+
+    async def _bounded(self, awaitable: Awaitable[T]) -> T:
+        # Created lazily so the semaphore binds to the loop that uses it.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrent_requests)
+        async with self._semaphore:
+            return await awaitable
+
+
+class AsyncStreamingPageWriter(PageWriterBase):
+    """Asyncio counterpart of :class:`~notion_formatter.notion_service.StreamingPageWriter`.
+
+    ``write`` only queues blocks; a task on the running loop archives the
+    old content on the first write and then appends the queue in order.
+    """
+
+    def __init__(
+        self,
+        service: AsyncNotionService,
+        page_id: str,
+        snapshot: PageSnapshot,
+        journal: Optional[WriteJournal] = None,
+    ) -> None:
+        super().__init__(page_id, snapshot, journal)
+        self._service = service
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def write(self, blocks: Iterable[Block]) -> None:
+        blocks = list(blocks)
+        if not blocks:
+            return
+        if self._task is not None and self._task.done() and self._task.exception():
+            raise self._task.exception()  # type: ignore[misc]
+        self._pending.extend(blocks)
+        self._wakeup.set()
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def close(self) -> ArchiveReport:
+        self._closing = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+        return self._report or ArchiveReport()
+
+    async def rollback(self) -> ArchiveReport:
+        """Archive the appended blocks and restore the archived ones (best effort)."""
+
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        report = ArchiveReport()
+        await self._service._apply_block_updates(report, self._rollback_updates())
+        return report
+
+    async def _run(self) -> None:
+        self._report = await self._service._archive_existing_children(self._snapshot)
+        if not self._report.ok:
+            raise archive_failure(self._report)
+        while True:
+            while not self._pending:
+                if self._closing:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            chunk = self._take_pending()
+            started = time.perf_counter()
+            if self._journal is None:
+                created = await self._service._append_blocks(self._page_id, chunk)
+            else:
+                created = await self._service._append_journaled(self._page_id, chunk, self._journal)
+            self._created.extend(created)
+            self._report.append_seconds += time.perf_counter() - started
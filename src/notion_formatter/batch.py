@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import IO, Any, Dict, Iterable, List, Optional
+
+from .runner import (
+    AsyncPipelineContext,
+    PipelineContext,
+    PipelineResult,
+    async_run_pipeline,
+    run_pipeline,
+)
+
+DEFAULT_BATCH_WORKERS = 4
+
+
+@dataclass(frozen=True)
+class BatchItemResult:
+    page_id: str
+    result: Optional[PipelineResult]
+    error: Optional[str]
+    duration_seconds: float
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def to_payload(self) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "page_id": self.page_id,
+            "ok": self.ok,
+            "duration_seconds": round(self.duration_seconds, 3),
+        }
+        if self.result is not None:
+            payload.update(self.result.to_payload())
+        if self.error is not None:
+            payload["error"] = self.error
+        return payload
+
+
+def query_database_page_ids(
+    context: PipelineContext,
+    database_id: str,
+    *,
+    filter: Optional[Dict[str, object]] = None,
+) -> List[str]:
+    pages = context.notion.query_database(database_id, filter=filter)
+    return [str(page["id"]) for page in pages if page.get("id")]
+
+
+def run_batch(
+    page_ids: Iterable[str],
+    *,
+    context: PipelineContext,
+    template_page_id: Optional[str] = None,
+    max_workers: int = DEFAULT_BATCH_WORKERS,
+    report: Optional[IO[str]] = None,
+) -> List[BatchItemResult]:
+    """Run the pipeline for many pages on a bounded worker pool.
+
+    All runs share ``context`` (settings, Notion/OpenAI clients and the
+    memoised template and review pages). A failing page does not stop the
+    others; each outcome is written to ``report`` as one JSON line as soon
+    as it finishes, and the results are returned in input order.
+    """
+
+    report_lock = threading.Lock()
+
+    def process(page_id: str) -> BatchItemResult:
+        started = time.perf_counter()
+        try:
+            result = run_pipeline(
+                page_id,
+                template_page_id,
+                context=context,
+            )
+        except Exception as exc:
+            item = _failed_item(page_id, exc, started)
+        else:
+            item = BatchItemResult(
+                page_id=page_id,
+                result=result,
+                error=None,
+                duration_seconds=time.perf_counter() - started,
+            )
+        with report_lock:
+            _write_report_line(report, item)
+        return item
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return list(executor.map(process, _unique_page_ids(page_ids)))
+
+
+async def async_run_batch(
+    page_ids: Iterable[str],
+    *,
+    context: AsyncPipelineContext,
+    template_page_id: Optional[str] = None,
+    max_workers: int = DEFAULT_BATCH_WORKERS,
+    report: Optional[IO[str]] = None,
+) -> List[BatchItemResult]:
+    """Asyncio version of :func:`run_batch`: all pages share one event loop.
+
+    ``max_workers`` bounds how many page pipelines are in flight at once.
+    """
+
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+
+    async def process(page_id: str) -> BatchItemResult:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await async_run_pipeline(
+                    page_id,
+                    template_page_id,
+                    context=context,
+                )
+            except Exception as exc:
+                item = _failed_item(page_id, exc, started)
+            else:
+                item = BatchItemResult(
+                    page_id=page_id,
+                    result=result,
+                    error=None,
+                    duration_seconds=time.perf_counter() - started,
+                )
+        _write_report_line(report, item)
+        return item
+
+    return list(
+        await asyncio.gather(*(process(page_id) for page_id in _unique_page_ids(page_ids)))
+    )
+
+
+def _unique_page_ids(page_ids: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(page_id for page_id in page_ids if page_id))
+
+
+def _failed_item(page_id: str, exc: Exception, started: float) -> BatchItemResult:
+    return BatchItemResult(
+        page_id=page_id,
+        result=None,
+        error=f"{exc.__class__.__name__}: {exc}",
+        duration_seconds=time.perf_counter() - started,
+    )
+
+
+def _write_report_line(report: Optional[IO[str]], item: BatchItemResult) -> None:
+    if report is None:
+        return
+    report.write(json.dumps(item.to_payload(), ensure_ascii=False) + "\n")
+    report.flush()
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+from .storage import atomic_write_text
+
+CASSETTE_VERSION = 1
+CASSETTE_MODES = {"record", "replay"}
+# Only the headers the SDKs read back are kept; request headers (including
+# the API keys) are never written to a cassette.
+_KEPT_RESPONSE_HEADERS = ("content-type", "retry-after")
+
+
+class CassetteError(RuntimeError):
+    """Raised when a cassette cannot be read or a replayed request was not recorded."""
+
+
+def _body_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def _request_target(url: httpx.URL) -> str:
+    # Replays may use a different base URL (a proxy, a stand-in server), so
+    # only the path and query identify the request.
+    query = url.query.decode("ascii", "replace")
+    return url.path + (f"?{query}" if query else "")
+
+
+class Cassette:
+    """Every Notion and OpenAI HTTP exchange of a run, stored as one JSON file.
+
+    In ``record`` mode :meth:`transport` sends requests to the network and
+    keeps each response; :meth:`save` writes them out. In ``replay`` mode the
+    transport answers from the file and never opens a connection. A replayed
+    request is matched on method, path, query and body; when the body
+    differs (a changed prompt or converter), the next unused response
+    recorded for the same method and path is served instead and counted in
+    ``loose_matches``. 429 responses are not recorded, since the retry that
+    followed them is.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        mode: str,
+        *,
+        interactions: Optional[List[Dict[str, Any]]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"unknown cassette mode: {mode}")
+        self._path = Path(path)
+        self._mode = mode
+        self._interactions: List[Dict[str, Any]] = list(interactions or [])
+        self.metadata: Dict[str, Any] = dict(metadata or {})
+        self._lock = threading.Lock()
+        self._used = [False] * len(self._interactions)
+        self._exact: Dict[Tuple[str, str, str], Deque[int]] = {}
+        self._by_endpoint: Dict[Tuple[str, str], Deque[int]] = {}
+        for index, interaction in enumerate(self._interactions):
+            request = interaction["request"]
+            endpoint = (request["method"], request["target"])
+            self._exact.setdefault(endpoint + (request["body_sha256"],), deque()).append(index)
+            self._by_endpoint.setdefault(endpoint, deque()).append(index)
+        self.replayed = 0
+        self.loose_matches = 0
+        self.misses: List[str] = []
+
+    @classmethod
+    def record(cls, path: str | os.PathLike[str]) -> "Cassette":
+        return cls(path, "record")
+
+    @classmethod
+    def replay(cls, path: str | os.PathLike[str]) -> "Cassette":
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            raise CassetteError(f"Cannot read cassette {path}: {exc}") from exc
+        if not isinstance(data, dict) or data.get("version") != CASSETTE_VERSION:
+            raise CassetteError(f"Cassette {path} has an unsupported format.")
+        return cls(
+            path,
+            "replay",
+            interactions=data.get("interactions", []),
+            metadata=data.get("metadata", {}),
+        )
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def replaying(self) -> bool:
+        return self._mode == "replay"
+
+    @property
+    def interaction_count(self) -> int:
+        return len(self._interactions)
+
+    def transport(self) -> httpx.BaseTransport:
+        """An httpx transport that records into or replays from this cassette."""
+
+        if self.replaying:
+            return _ReplayTransport(self)
+        return _RecordingTransport(self, httpx.HTTPTransport())
+
+    def async_transport(self) -> httpx.AsyncBaseTransport:
+        """Asyncio counterpart of :meth:`transport` for ``httpx.AsyncClient``."""
+
+        if self.replaying:
+            return _AsyncReplayTransport(self)
+        return _AsyncRecordingTransport(self, httpx.AsyncHTTPTransport())
+
+    def save(self) -> None:
+        if self.replaying:
+            return
+        with self._lock:
+            payload = {
+                "version": CASSETTE_VERSION,
+                "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "metadata": self.metadata,
+                "interactions": list(self._interactions),
+            }
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(self._path, json.dumps(payload, ensure_ascii=False, indent=1))
+
+    def _add(self, request: httpx.Request, response: httpx.Response, body: bytes) -> None:
+        if response.status_code == 429:
+            return
+        interaction = {
+            "request": {
+                "method": request.method,
+                "target": _request_target(request.url),
+                "body_sha256": _body_hash(request.content),
+                "body": request.content.decode("utf-8", "replace"),
+            },
+            "response": {
+                "status": response.status_code,
+                "headers": {
+                    name: response.headers[name]
+                    for name in _KEPT_RESPONSE_HEADERS
+                    if name in response.headers
+                },
+                "body": body.decode("utf-8", "replace"),
+            },
+        }
+        with self._lock:
+            self._interactions.append(interaction)
+
+    def _match(self, request: httpx.Request) -> Dict[str, Any]:
+        method, target = request.method, _request_target(request.url)
+        with self._lock:
+            index = self._take(self._exact.get((method, target, _body_hash(request.content))))
+            if index is None:
+                index = self._take(self._by_endpoint.get((method, target)))
+                if index is not None:
+                    self.loose_matches += 1
+            if index is None:
+                self.misses.append(f"{method} {target}")
+                raise CassetteError(f"No recorded response for {method} {target} in {self._path}.")
+            self.replayed += 1
+            return self._interactions[index]["response"]
+
+    def _take(self, candidates: Optional[Deque[int]]) -> Optional[int]:
+        while candidates:
+            index = candidates.popleft()
+            if not self._used[index]:
+                self._used[index] = True
+                return index
+        return None
+
+
+def _relayed_response(request: httpx.Request, response: httpx.Response, body: bytes) -> httpx.Response:
+    # The body is already decoded, so drop content-encoding and length.
+    headers = {
+        name: value
+        for name, value in response.headers.items()
+        if name.lower() not in {"content-encoding", "content-length", "transfer-encoding"}
+    }
+    return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+
+
+def _replayed_response(request: httpx.Request, recorded: Dict[str, Any]) -> httpx.Response:
+    return httpx.Response(
+        recorded["status"],
+        headers=recorded.get("headers", {}),
+        content=recorded["body"].encode("utf-8"),
+        request=request,
+    )
+
+
+class _RecordingTransport(httpx.BaseTransport):
+    def __init__(self, cassette: Cassette, inner: httpx.BaseTransport) -> None:
+        self._cassette = cassette
+        self._inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        response = self._inner.handle_request(request)
+        try:
+            body = response.read()
+        finally:
+            response.close()
+        self._cassette._add(request, response, body)
+        return _relayed_response(request, response, body)
+
+    def close(self) -> None:
+        self._inner.close()
+
+
+class _ReplayTransport(httpx.BaseTransport):
+    def __init__(self, cassette: Cassette) -> None:
+        self._cassette = cassette
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        return _replayed_response(request, self._cassette._match(request))
+
+
+class _AsyncRecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cassette: Cassette, inner: httpx.AsyncBaseTransport) -> None:
+        self._cassette = cassette
+        self._inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        response = await self._inner.handle_async_request(request)
+        try:
+            body = await response.aread()
+        finally:
+            await response.aclose()
+        self._cassette._add(request, response, body)
+        return _relayed_response(request, response, body)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+class _AsyncReplayTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cassette: Cassette) -> None:
+        self._cassette = cassette
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        return _replayed_response(request, self._cassette._match(request))
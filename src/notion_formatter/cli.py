@@ -1,12 +1,45 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import json
 import os
 import sys
-from typing import Any, Dict
+from collections import Counter
+from typing import IO, TYPE_CHECKING, Any, Callable, Dict, List, Optional
 
-from .runner import PipelineError, PipelineResult, run_pipeline
+from .batch import (
+    DEFAULT_BATCH_WORKERS,
+    BatchItemResult,
+    async_run_batch,
+    query_database_page_ids,
+    run_batch,
+)
+from .config import ConfigurationError, read_float_env, read_int_env
+from .runner import (
+    AsyncPipelineContext,
+    PipelineContext,
+    PipelineError,
+    PipelineResult,
+    resume_pipeline,
+    run_pipeline,
+)
+from .server import (
+    DEFAULT_DEBOUNCE_SECONDS,
+    DEFAULT_MAX_PENDING_JOBS,
+    DEFAULT_SERVE_WORKERS,
+    serve,
+)
+from .sweep import (
+    DEFAULT_SWEEP_STATUS,
+    SweepResult,
+    WatermarkStore,
+    default_watermark_path,
+    run_sweep,
+)
+
+if TYPE_CHECKING:
+    from .cassette import Cassette
 
 
 def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
@@ -29,33 +62,474 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
         action="store_true",
         help="Output the result as JSON (for GitHub Actions consumption).",
     )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Finish the page's interrupted write from its journal without calling OpenAI "
+            "again, and fail if there is none (a normal run also finishes it first)."
+        ),
+    )
+    mode.add_argument(
+        "--record-cassette",
+        metavar="PATH",
+        help="Save every Notion and OpenAI request/response of the run to a cassette file.",
+    )
+    mode.add_argument(
+        "--replay-cassette",
+        metavar="PATH",
+        help="Answer every Notion and OpenAI request from a recorded cassette (no network).",
+    )
     return parser.parse_args(argv)
 
 
+def _env_default(
+    parser: argparse.ArgumentParser,
+    args: argparse.Namespace,
+    name: str,
+    read: Callable[[], Any],
+) -> None:
+    # Environment defaults are read after parsing, so a bad value is reported
+    # as a usage error (and never breaks --help) instead of a traceback.
+    if getattr(args, name) is not None:
+        return
+    try:
+        setattr(args, name, read())
+    except ConfigurationError as exc:
+        parser.error(str(exc))
+
+
+def parse_batch_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="notion-formatter batch",
+        description="Format many Notion pages in one process with a shared worker pool.",
+    )
+    parser.add_argument(
+        "--page-ids",
+        nargs="*",
+        default=[],
+        help="Notion page IDs to format.",
+    )
+    parser.add_argument(
+        "--page-ids-file",
+        help="File with one page ID per line ('-' reads from stdin).",
+    )
+    parser.add_argument(
+        "--database-id",
+        help="Format every page returned by a query on this Notion database.",
+    )
+    parser.add_argument(
+        "--filter",
+        help="Notion database filter object as JSON (used with --database-id).",
+    )
+    parser.add_argument(
+        "--template-page-id",
+        default=os.getenv("NOTION_TEMPLATE_PAGE_ID"),
+        help="Template Notion page ID (defaults to env NOTION_TEMPLATE_PAGE_ID).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help=(
+            "Number of pages processed concurrently "
+            f"(defaults to env NOTION_BATCH_WORKERS or {DEFAULT_BATCH_WORKERS})."
+        ),
+    )
+    parser.add_argument(
+        "--report",
+        default="batch-report.jsonl",
+        help="Path of the JSON Lines report ('-' writes to stdout).",
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Run the pages on one asyncio event loop instead of a thread pool.",
+    )
+    args = parser.parse_args(argv)
+    _env_default(
+        parser,
+        args,
+        "workers",
+        lambda: read_int_env("NOTION_BATCH_WORKERS", DEFAULT_BATCH_WORKERS, minimum=1),
+    )
+    if not (args.page_ids or args.page_ids_file or args.database_id):
+        parser.error("one of --page-ids, --page-ids-file or --database-id is required")
+    if args.filter:
+        try:
+            args.filter = json.loads(args.filter)
+        except json.JSONDecodeError as exc:
+            parser.error(f"--filter must be valid JSON: {exc}")
+    return args
+
+
+def parse_serve_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="notion-formatter serve",
+        description="Receive Notion automation webhooks and format pages with warm clients.",
+    )
+    parser.add_argument(
+        "--host",
+        default=os.getenv("NOTION_FORMATTER_HOST", "0.0.0.0"),
+        help="Address to listen on (defaults to env NOTION_FORMATTER_HOST or 0.0.0.0).",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        help="Port to listen on (defaults to env PORT or 8080).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help=(
+            "Number of pages processed concurrently "
+            f"(defaults to env NOTION_SERVE_WORKERS or {DEFAULT_SERVE_WORKERS})."
+        ),
+    )
+    parser.add_argument(
+        "--max-queue",
+        type=int,
+        default=DEFAULT_MAX_PENDING_JOBS,
+        help=f"Queued jobs accepted before the webhook answers 503 (default {DEFAULT_MAX_PENDING_JOBS}).",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        help=(
+            "Seconds a page must go without new triggers before its run starts "
+            f"(defaults to env NOTION_SERVE_DEBOUNCE_SECONDS or {DEFAULT_DEBOUNCE_SECONDS:g})."
+        ),
+    )
+    parser.add_argument(
+        "--secret",
+        default=os.getenv("NOTION_WEBHOOK_SECRET"),
+        help="Bearer token required on webhook calls (defaults to env NOTION_WEBHOOK_SECRET).",
+    )
+    args = parser.parse_args(argv)
+    _env_default(parser, args, "port", lambda: read_int_env("PORT", 8080, minimum=0))
+    _env_default(
+        parser,
+        args,
+        "workers",
+        lambda: read_int_env("NOTION_SERVE_WORKERS", DEFAULT_SERVE_WORKERS, minimum=1),
+    )
+    _env_default(
+        parser,
+        args,
+        "debounce",
+        lambda: read_float_env(
+            "NOTION_SERVE_DEBOUNCE_SECONDS", DEFAULT_DEBOUNCE_SECONDS, allow_zero=True
+        ),
+    )
+    return args
+
+
+def parse_sweep_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="notion-formatter sweep",
+        description="Format the database pages awaiting review that changed since the last sweep.",
+    )
+    parser.add_argument(
+        "--database-id",
+        default=os.getenv("NOTION_SWEEP_DATABASE_ID"),
+        help="Requirements database to sweep (defaults to env NOTION_SWEEP_DATABASE_ID).",
+    )
+    parser.add_argument(
+        "--status",
+        default=os.getenv("NOTION_SWEEP_STATUS", DEFAULT_SWEEP_STATUS),
+        help=f"Review status of the pages to format (default {DEFAULT_SWEEP_STATUS}).",
+    )
+    parser.add_argument(
+        "--state",
+        help="Watermark file (default: sweep/<database>.json under NOTION_FORMATTER_CACHE_DIR).",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignore the stored watermark and sweep every page with the status.",
+    )
+    parser.add_argument(
+        "--template-page-id",
+        default=os.getenv("NOTION_TEMPLATE_PAGE_ID"),
+        help="Template Notion page ID (defaults to env NOTION_TEMPLATE_PAGE_ID).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help=(
+            "Number of pages processed concurrently "
+            f"(defaults to env NOTION_BATCH_WORKERS or {DEFAULT_BATCH_WORKERS})."
+        ),
+    )
+    parser.add_argument(
+        "--report",
+        default="sweep-report.jsonl",
+        help="Path of the JSON Lines report ('-' writes to stdout).",
+    )
+    args = parser.parse_args(argv)
+    _env_default(
+        parser,
+        args,
+        "workers",
+        lambda: read_int_env("NOTION_BATCH_WORKERS", DEFAULT_BATCH_WORKERS, minimum=1),
+    )
+    if not args.database_id:
+        parser.error("--database-id (or env NOTION_SWEEP_DATABASE_ID) is required")
+    return args
+
+
+def _run_sweep(
+    args: argparse.Namespace,
+    context: PipelineContext,
+    store: WatermarkStore,
+    report: IO[str],
+) -> SweepResult:
+    return run_sweep(
+        args.database_id,
+        context=context,
+        store=store,
+        status_value=args.status,
+        template_page_id=args.template_page_id,
+        max_workers=args.workers,
+        report=report,
+        full=args.full,
+    )
+
+
+def sweep_main(argv: list[str]) -> int:
+    args = parse_sweep_args(argv)
+
+    try:
+        context = PipelineContext.from_env()
+        store = WatermarkStore(args.state or default_watermark_path(context, args.database_id))
+        if args.report == "-":
+            result = _run_sweep(args, context, store, sys.stdout)
+        else:
+            with open(args.report, "w", encoding="utf-8") as report:
+                result = _run_sweep(args, context, store, report)
+    except PipelineError as exc:
+        print(f"[notion-formatter] ERROR: {exc}", file=sys.stderr)
+        return 1
+    except Exception as exc:  # pragma: no cover - safety net for unexpected errors
+        print(f"[notion-formatter] UNEXPECTED ERROR: {exc}", file=sys.stderr)
+        return 1
+
+    failed = result.failed
+    print(
+        (
+            f"[notion-formatter] スイープ完了: changed={len(result.items)} "
+            f"succeeded={len(result.items) - len(failed)} failed={len(failed)} "
+            f"watermark={result.previous.last_edited_time or '-'}"
+            f" -> {result.watermark.last_edited_time or '-'}"
+        ),
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
+
+
+def serve_main(argv: list[str]) -> int:
+    args = parse_serve_args(argv)
+
+    try:
+        context = PipelineContext.from_env()
+    except PipelineError as exc:
+        print(f"[notion-formatter] ERROR: {exc}", file=sys.stderr)
+        return 1
+
+    serve(
+        context,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        secret=args.secret,
+        max_pending=args.max_queue,
+        debounce_seconds=args.debounce,
+    )
+    return 0
+
+
+def _read_page_ids_file(path: str) -> List[str]:
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, encoding="utf-8") as handle:
+            lines = handle.read().splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.startswith("#")]
+
+
+def _run_batch(
+    args: argparse.Namespace,
+    context: PipelineContext,
+    page_ids: List[str],
+    report: IO[str],
+) -> List[BatchItemResult]:
+    if not args.use_async:
+        return run_batch(
+            page_ids,
+            context=context,
+            template_page_id=args.template_page_id,
+            max_workers=args.workers,
+            report=report,
+        )
+
+    async def run() -> List[BatchItemResult]:
+        async with AsyncPipelineContext(context.settings) as async_context:
+            return await async_run_batch(
+                page_ids,
+                context=async_context,
+                template_page_id=args.template_page_id,
+                max_workers=args.workers,
+                report=report,
+            )
+
+    return asyncio.run(run())
+
+
+def batch_main(argv: list[str]) -> int:
+    args = parse_batch_args(argv)
+
+    try:
+        context = PipelineContext.from_env()
+        page_ids: List[str] = list(args.page_ids)
+        if args.page_ids_file:
+            page_ids.extend(_read_page_ids_file(args.page_ids_file))
+        if args.database_id:
+            page_ids.extend(
+                query_database_page_ids(context, args.database_id, filter=args.filter)
+            )
+
+        if args.report == "-":
+            results = _run_batch(args, context, page_ids, sys.stdout)
+        else:
+            with open(args.report, "w", encoding="utf-8") as report:
+                results = _run_batch(args, context, page_ids, report)
+    except PipelineError as exc:
+        print(f"[notion-formatter] ERROR: {exc}", file=sys.stderr)
+        return 1
+    except Exception as exc:  # pragma: no cover - safety net for unexpected errors
+        print(f"[notion-formatter] UNEXPECTED ERROR: {exc}", file=sys.stderr)
+        return 1
+
+    failed = [item for item in results if not item.ok]
+    usages = [item.result.usage for item in results if item.result and item.result.usage]
+    prompt_tokens = sum(usage.prompt_tokens for usage in usages)
+    cached_tokens = sum(usage.cached_tokens for usage in usages)
+    cached_ratio = cached_tokens / prompt_tokens if prompt_tokens else 0.0
+    print(
+        (
+            f"[notion-formatter] バッチ完了: total={len(results)} "
+            f"succeeded={len(results) - len(failed)} failed={len(failed)} "
+            f"cached_tokens={cached_tokens}/{prompt_tokens} ({cached_ratio:.0%})"
+        ),
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
+
+
+def _open_cassette(args: argparse.Namespace) -> Optional["Cassette"]:
+    if not (args.record_cassette or args.replay_cassette):
+        return None
+    from .cassette import Cassette, CassetteError
+
+    if args.record_cassette:
+        cassette = Cassette.record(args.record_cassette)
+        cassette.metadata.update(
+            page_id=args.page_id,
+            template_page_id=args.template_page_id,
+            review_page_id=os.getenv("NOTION_REVIEW_PAGE_ID"),
+        )
+        return cassette
+
+    try:
+        cassette = Cassette.replay(args.replay_cassette)
+    except CassetteError as exc:
+        raise PipelineError(str(exc)) from exc
+    # Replayed requests never reach the APIs, so the keys and page IDs of
+    # the recording are enough to run without a .env.
+    metadata = cassette.metadata
+    args.page_id = args.page_id or metadata.get("page_id")
+    args.template_page_id = args.template_page_id or metadata.get("template_page_id")
+    for name, value in (
+        ("NOTION_API_KEY", "replay"),
+        ("OPENAI_API_KEY", "replay"),
+        ("NOTION_TEMPLATE_PAGE_ID", args.template_page_id),
+        ("NOTION_REVIEW_PAGE_ID", metadata.get("review_page_id")),
+    ):
+        if value:
+            os.environ.setdefault(name, value)
+    return cassette
+
+
+def _close_cassette(cassette: "Cassette") -> None:
+    if not cassette.replaying:
+        cassette.save()
+        print(
+            f"[notion-formatter] cassette: {cassette.interaction_count} requests recorded"
+            f" to {cassette.path}",
+            file=sys.stderr,
+        )
+        return
+    print(
+        f"[notion-formatter] cassette: {cassette.replayed}/{cassette.interaction_count}"
+        f" responses replayed ({cassette.loose_matches} matched by endpoint only,"
+        f" {len(cassette.misses)} not recorded)",
+        file=sys.stderr,
+    )
+    for miss in cassette.misses:
+        print(f"[notion-formatter]   not recorded: {miss}", file=sys.stderr)
+
+
+def _describe_models(result: PipelineResult) -> str:
+    routes = result.model_routes
+    if not routes:
+        return ""
+    if len(routes) == 1:
+        return f"\n[notion-formatter] モデル: {routes[0].model} ({routes[0].reason})"
+    # Large drafts make one call per section; list how often each model ran.
+    counts = Counter(route.model for route in routes)
+    fallbacks = [route.reason for route in routes if route.reason.startswith("fallback")]
+    summary = ", ".join(f"{model}×{count}" for model, count in counts.items())
+    return f"\n[notion-formatter] モデル: {summary}" + "".join(
+        f"\n[notion-formatter]   {reason}" for reason in fallbacks
+    )
+
+
 def main(argv: list[str] | None = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if argv and argv[0] == "batch":
+        return batch_main(argv[1:])
+    if argv and argv[0] == "serve":
+        return serve_main(argv[1:])
+    if argv and argv[0] == "sweep":
+        return sweep_main(argv[1:])
+
     args = parse_args(argv)
 
+    cassette: Optional["Cassette"] = None
     try:
-        result = run_pipeline(
-            page_id=args.page_id or "",
-            template_page_id=args.template_page_id or "",
-        )
+        cassette = _open_cassette(args)
+        context = PipelineContext.from_env(cassette=cassette) if cassette else None
+        if args.resume:
+            result = resume_pipeline(args.page_id or "", context=context)
+        else:
+            result = run_pipeline(
+                page_id=args.page_id or "",
+                template_page_id=args.template_page_id or "",
+                context=context,
+            )
     except PipelineError as exc:
         print(f"[notion-formatter] ERROR: {exc}", file=sys.stderr)
         return 1
     except Exception as exc:  # pragma: no cover - safety net for unexpected errors
         print(f"[notion-formatter] UNEXPECTED ERROR: {exc}", file=sys.stderr)
         return 1
+    finally:
+        if cassette is not None:
+            _close_cassette(cassette)
 
     if args.json:
-        payload: Dict[str, Any] = {
-            "page_id": result.page_id,
-            "template_page_id": result.template_page_id,
-            "review_page_id": result.review_page_id,
-            "is_complete": result.is_complete,
-            "completion_message": result.completion_message,
-            "updated_block_count": result.block_count,
-        }
+        payload: Dict[str, Any] = result.to_payload()
         print(json.dumps(payload, ensure_ascii=False))
     else:
         status = "完了" if result.is_complete else "要追記"
@@ -64,14 +538,33 @@ def main(argv: list[str] | None = None) -> int:
             if result.review_page_id
             else ""
         )
+        usage_info = (
+            f" tokens={result.usage.total_tokens}"
+            f" cached={result.usage.cached_tokens}/{result.usage.prompt_tokens}"
+            if result.usage
+            else ""
+        )
+        stage_info = " ".join(
+            f"{stage}={seconds:.2f}s" for stage, seconds in result.stage_seconds.items()
+        )
+        model_info = _describe_models(result)
+        action = "中断した書き込みを再開して更新完了" if result.resumed else "更新完了"
         print(
             (
-                f"[notion-formatter] 更新完了: page={result.page_id}"
+                f"[notion-formatter] {action}: page={result.page_id}"
                 f"{review_info} "
-                f"blocks={result.block_count} status={status} "
+                f"blocks={result.block_count} status={status}{usage_info} "
                 f"message={result.completion_message}"
             )
         )
+        print(
+            (
+                f"[notion-formatter] 計測: {stage_info} "
+                f"notion_requests={result.notion_requests.get('requests', 0)} "
+                f"retries={result.notion_requests.get('retried', 0)}"
+                f"{model_info}"
+            )
+        )
     return 0
 
 
@@ -4,13 +4,10 @@ import os
 from dataclasses import dataclass
 from typing import Optional
 
-try:
-    from dotenv import load_dotenv
-except ImportError:  # pragma: no cover - optional dependency safeguard
-    load_dotenv = None
+from .markdown_converter import CONVERTER_BACKENDS
 
-if load_dotenv:
-    load_dotenv()
+UPDATE_MODES = {"replace", "diff"}
+DEFAULT_OPENAI_MODEL = "gpt-4o-mini"
 
 
 class ConfigurationError(RuntimeError):
@@ -30,10 +27,83 @@ class Settings:
     review_status_property_name: Optional[str]
     review_status_complete_value: str
     review_status_rejected_value: str
+    notion_max_concurrency: int = 4
+    notion_requests_per_second: float = 3.0
+    notion_update_mode: str = "replace"
+    cache_dir: Optional[str] = None
+    page_cache_max_age_days: int = 30
+    page_cache_max_bytes: int = 10_000_000
+    ai_result_cache_ttl_hours: int = 24
+    ai_result_cache_max_entries: int = 500
+    ai_streaming: bool = False
+    large_document_threshold_chars: int = 40_000
+    large_document_max_workers: int = 4
+    markdown_converter_backend: str = "builtin"
+    notion_base_url: Optional[str] = None
+    openai_base_url: Optional[str] = None
+    openai_fast_model: Optional[str] = None
+    openai_fast_model_max_prompt_tokens: int = 4_000
+    openai_fallback_model: Optional[str] = None
+    openai_latency_budget_seconds: float = 0.0
+    openai_timeout_seconds: float = 60.0
+
+
+def read_int_env(name: str, default: int, *, minimum: int) -> int:
+    """Integer environment variable, raised to ``minimum`` if it is below it."""
+
+    raw_value = os.getenv(name, str(default))
+    try:
+        return max(minimum, int(raw_value))
+    except ValueError as exc:
+        raise ConfigurationError(
+            f"Environment variable {name} must be an integer."
+        ) from exc
+
+
+def read_float_env(name: str, default: float, *, allow_zero: bool = False) -> float:
+    """Positive (or, with ``allow_zero``, non-negative) float environment variable."""
+
+    raw_value = os.getenv(name, str(default))
+    try:
+        value = float(raw_value)
+    except ValueError as exc:
+        raise ConfigurationError(
+            f"Environment variable {name} must be a number."
+        ) from exc
+    if value < 0 or (value == 0 and not allow_zero):
+        qualifier = "zero or positive" if allow_zero else "positive"
+        raise ConfigurationError(f"Environment variable {name} must be {qualifier}.")
+    return value
+
+
+def _read_bool_env(name: str, default: bool) -> bool:
+    raw_value = os.getenv(name)
+    if raw_value is None or not raw_value.strip():
+        return default
+    value = raw_value.strip().lower()
+    if value in {"1", "true", "yes", "on"}:
+        return True
+    if value in {"0", "false", "no", "off"}:
+        return False
+    raise ConfigurationError(f"Environment variable {name} must be true or false.")
+
+
+def _load_dotenv() -> None:
+    try:
+        from dotenv import load_dotenv
+    except ImportError:  # pragma: no cover - optional dependency safeguard
+        return
+    load_dotenv()
 
 
 def load_settings() -> Settings:
-    """Load configuration from environment variables with sensible defaults."""
+    """Load configuration from environment variables with sensible defaults.
+
+    A ``.env`` file in the working directory is read first (without
+    overriding variables that are already set) when python-dotenv is installed.
+    """
+
+    _load_dotenv()
 
     notion_api_key = os.getenv("NOTION_API_KEY")
     if not notion_api_key:
@@ -49,17 +119,54 @@ def load_settings() -> Settings:
     if not openai_api_key:
         raise ConfigurationError("Environment variable OPENAI_API_KEY is required.")
 
-    openai_model = "gpt-4o-mini"
+    openai_model = os.getenv("OPENAI_MODEL", "").strip() or DEFAULT_OPENAI_MODEL
+    openai_fast_model = os.getenv("OPENAI_FAST_MODEL", "").strip() or None
+    openai_fast_model_max_prompt_tokens = read_int_env(
+        "OPENAI_FAST_MODEL_MAX_PROMPT_TOKENS", 4_000, minimum=0
+    )
+    openai_fallback_model = os.getenv("OPENAI_FALLBACK_MODEL", "").strip() or None
+    # Unset means no latency budget; a value that is set must be positive.
+    openai_latency_budget_seconds = 0.0
+    if os.getenv("OPENAI_LATENCY_BUDGET_SECONDS", "").strip():
+        openai_latency_budget_seconds = read_float_env("OPENAI_LATENCY_BUDGET_SECONDS", 0.0)
+    openai_timeout_seconds = read_float_env("OPENAI_TIMEOUT_SECONDS", 60.0)
     review_section_heading = "AIレビュー結果"
     completion_success_phrase = "🎉 完璧です"
 
-    retry_env = os.getenv("RETRY_LIMIT", "3")
-    try:
-        retry_limit = max(1, int(retry_env))
-    except ValueError as exc:
+    retry_limit = read_int_env("RETRY_LIMIT", 3, minimum=1)
+    notion_max_concurrency = read_int_env("NOTION_MAX_CONCURRENCY", 4, minimum=1)
+    notion_requests_per_second = read_float_env("NOTION_REQUESTS_PER_SECOND", 3.0)
+
+    notion_update_mode = os.getenv("NOTION_UPDATE_MODE", "replace").strip().lower()
+    if notion_update_mode not in UPDATE_MODES:
         raise ConfigurationError(
-            "Environment variable RETRY_LIMIT must be an integer."
-        ) from exc
+            "Environment variable NOTION_UPDATE_MODE must be one of: "
+            + ", ".join(sorted(UPDATE_MODES))
+        )
+
+    markdown_converter_backend = (
+        os.getenv("MARKDOWN_CONVERTER_BACKEND", "builtin").strip().lower()
+    )
+    if markdown_converter_backend not in CONVERTER_BACKENDS:
+        raise ConfigurationError(
+            "Environment variable MARKDOWN_CONVERTER_BACKEND must be one of: "
+            + ", ".join(sorted(CONVERTER_BACKENDS))
+        )
+
+    ai_streaming = _read_bool_env("AI_STREAMING", False)
+    large_document_threshold_chars = read_int_env(
+        "LARGE_DOCUMENT_THRESHOLD_CHARS", 40_000, minimum=0
+    )
+    large_document_max_workers = read_int_env("LARGE_DOCUMENT_MAX_WORKERS", 4, minimum=1)
+
+    notion_base_url = os.getenv("NOTION_BASE_URL", "").strip().rstrip("/")
+    openai_base_url = os.getenv("OPENAI_BASE_URL", "").strip().rstrip("/")
+
+    cache_dir = os.getenv("NOTION_FORMATTER_CACHE_DIR", "").strip()
+    page_cache_max_age_days = read_int_env("NOTION_PAGE_CACHE_MAX_AGE_DAYS", 30, minimum=0)
+    page_cache_max_bytes = read_int_env("NOTION_PAGE_CACHE_MAX_BYTES", 10_000_000, minimum=0)
+    ai_result_cache_ttl_hours = read_int_env("AI_RESULT_CACHE_TTL_HOURS", 24, minimum=0)
+    ai_result_cache_max_entries = read_int_env("AI_RESULT_CACHE_MAX_ENTRIES", 500, minimum=0)
 
     review_status_property_name = os.getenv(
         "NOTION_REVIEW_STATUS_PROPERTY",
@@ -89,4 +196,23 @@ def load_settings() -> Settings:
         review_status_property_name=review_status_property_name,
         review_status_complete_value=review_status_complete_value,
         review_status_rejected_value=review_status_rejected_value,
+        notion_max_concurrency=notion_max_concurrency,
+        notion_requests_per_second=notion_requests_per_second,
+        notion_update_mode=notion_update_mode,
+        cache_dir=cache_dir or None,
+        page_cache_max_age_days=page_cache_max_age_days,
+        page_cache_max_bytes=page_cache_max_bytes,
+        ai_result_cache_ttl_hours=ai_result_cache_ttl_hours,
+        ai_result_cache_max_entries=ai_result_cache_max_entries,
+        ai_streaming=ai_streaming,
+        large_document_threshold_chars=large_document_threshold_chars,
+        large_document_max_workers=large_document_max_workers,
+        markdown_converter_backend=markdown_converter_backend,
+        notion_base_url=notion_base_url or None,
+        openai_base_url=openai_base_url or None,
+        openai_fast_model=openai_fast_model,
+        openai_fast_model_max_prompt_tokens=openai_fast_model_max_prompt_tokens,
+        openai_fallback_model=openai_fallback_model,
+        openai_latency_budget_seconds=openai_latency_budget_seconds,
+        openai_timeout_seconds=openai_timeout_seconds,
     )
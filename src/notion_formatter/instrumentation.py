@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+# Stages of one pipeline run, in order. ``archive`` also covers in-place
+# block updates in diff mode. With AI_STREAMING the ``ai`` stage overlaps
+# ``archive`` and ``append``, which run while the response is generated.
+PIPELINE_STAGES = ("fetch", "ai", "convert", "archive", "append", "status")
+
+
+class StageTimer:
+    """Accumulates wall-clock seconds per pipeline stage."""
+
+    def __init__(self) -> None:
+        self._seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._seconds[name] = self._seconds.get(name, 0.0) + seconds
+
+    def as_dict(self) -> Dict[str, float]:
+        """Seconds per stage in ``PIPELINE_STAGES`` order, rounded to milliseconds."""
+
+        with self._lock:
+            return {stage: round(self._seconds.get(stage, 0.0), 3) for stage in PIPELINE_STAGES}
@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Tuple
+
+from .ai_client import (
+    AIFormatter,
+    AIResult,
+    AIServiceError,
+    AsyncAIFormatter,
+    TokenUsage,
+    sum_token_usage,
+)
+from .config import Settings
+from .model_router import ModelRoute
+from .prompt_builder import PromptPayload, build_review_prompts, build_section_prompts
+
+FINDING_KINDS = ("missing", "needs_improvement", "adequate")
+UNMATCHED_TEMPLATE_SECTION = "（テンプレートに対応するセクションはありません。ドラフトの見出しを維持して整形してください）"
+
+_HEADING_MATCH_RATIO = 0.6
+_NON_WORD = re.compile(r"[\W\d_]+")
+
+
+@dataclass(frozen=True)
+class MarkdownSection:
+    """A level-2 heading and everything up to the next one.
+
+    The text before the first heading is the preamble, with an empty
+    ``heading``. ``markdown`` includes the heading line itself.
+    """
+
+    heading: str
+    markdown: str
+
+
+@dataclass(frozen=True)
+class SectionTask:
+    title: str
+    template_section: str
+    draft_section: str
+    draft_overview: str
+
+
+@dataclass(frozen=True)
+class SectionResult:
+    title: str
+    markdown: str
+    findings: Dict[str, List[str]] = field(default_factory=dict)
+    usage: Optional[TokenUsage] = None
+    route: Optional[ModelRoute] = None
+
+
+@dataclass(frozen=True)
+class LargeDocumentPlan:
+    tasks: List[SectionTask]
+    previous_review: Optional[str]
+
+
+def split_markdown_sections(markdown: str) -> List[MarkdownSection]:
+    """Split ``markdown`` at level-2 headings that are not inside code fences."""
+
+    sections: List[MarkdownSection] = []
+    heading = ""
+    lines: List[str] = []
+    in_code = False
+    for raw_line in markdown.splitlines():
+        line = raw_line.rstrip()
+        if line.startswith("```"):
+            in_code = not in_code
+        level = len(line) - len(line.lstrip("#"))
+        if not in_code and level == 2 and line[level:].strip():
+            if heading or "\n".join(lines).strip():
+                sections.append(MarkdownSection(heading, "\n".join(lines).strip()))
+            heading = line[level:].strip()
+            lines = [raw_line]
+            continue
+        lines.append(raw_line)
+    if heading or "\n".join(lines).strip():
+        sections.append(MarkdownSection(heading, "\n".join(lines).strip()))
+    return sections
+
+
+def is_large_document(settings: Settings, draft_markdown: str) -> bool:
+    """Return True if the draft should be formatted section by section.
+
+    Drafts below the size threshold, or without any level-2 heading to
+    align with the template, use the single-call path.
+    """
+
+    threshold = settings.large_document_threshold_chars
+    if threshold <= 0 or len(draft_markdown) < threshold:
+        return False
+    return any(
+        section.heading and section.heading != settings.review_section_heading
+        for section in split_markdown_sections(draft_markdown)
+    )
+
+
+def plan_large_document(
+    *,
+    template_markdown: str,
+    draft_markdown: str,
+    review_heading: str,
+) -> LargeDocumentPlan:
+    """Pair each template section with the draft sections whose headings match.
+
+    The draft's preamble is formatted with the template's preamble and is
+    also given to every section as context. Draft sections without a
+    matching template heading become their own tasks so no content is
+    dropped, and a previous review section is handed to the reduce step.
+    """
+
+    template_sections = split_markdown_sections(template_markdown)
+    overview = ""
+    previous_review: Optional[str] = None
+    matched: Dict[int, List[MarkdownSection]] = {}
+    unmatched: List[MarkdownSection] = []
+    for section in split_markdown_sections(draft_markdown):
+        if not section.heading:
+            overview = section.markdown
+        elif section.heading == review_heading:
+            previous_review = section.markdown
+        else:
+            index = _match_template_section(section.heading, template_sections)
+            if index is None:
+                unmatched.append(section)
+            else:
+                matched.setdefault(index, []).append(section)
+
+    tasks: List[SectionTask] = []
+    if overview and not any(not section.heading for section in template_sections):
+        tasks.append(SectionTask("", UNMATCHED_TEMPLATE_SECTION, overview, ""))
+    for index, template_section in enumerate(template_sections):
+        if template_section.heading == review_heading:
+            continue
+        if not template_section.heading:
+            tasks.append(SectionTask("", template_section.markdown, overview, ""))
+            continue
+        draft_section = "\n\n".join(section.markdown for section in matched.get(index, []))
+        tasks.append(
+            SectionTask(template_section.heading, template_section.markdown, draft_section, overview)
+        )
+    for section in unmatched:
+        tasks.append(
+            SectionTask(section.heading, UNMATCHED_TEMPLATE_SECTION, section.markdown, overview)
+        )
+    return LargeDocumentPlan(tasks=tasks, previous_review=previous_review)
+
+
+def format_large_document(
+    formatter: AIFormatter,
+    settings: Settings,
+    *,
+    template_markdown: str,
+    draft_markdown: str,
+    review_markdown: Optional[str],
+) -> AIResult:
+    """Format a large draft with one model call per section plus a reduce call.
+
+    Sections are formatted concurrently (``large_document_max_workers``);
+    the reduce call turns their findings into the review section, which is
+    appended to the merged body. The combined Markdown goes through the
+    usual conversion, including review-section pruning.
+    """
+
+    plan = plan_large_document(
+        template_markdown=template_markdown,
+        draft_markdown=draft_markdown,
+        review_heading=settings.review_section_heading,
+    )
+    section_prompts = [_section_prompts(settings, task, review_markdown) for task in plan.tasks]
+
+    def format_section(item: Tuple[SectionTask, PromptPayload]) -> SectionResult:
+        task, prompts = item
+        response_json, usage, route = formatter.generate_json(prompts)
+        return _parse_section(task, response_json, usage, route, settings.review_section_heading)
+
+    with ThreadPoolExecutor(max_workers=max(1, settings.large_document_max_workers)) as executor:
+        sections = list(executor.map(format_section, zip(plan.tasks, section_prompts)))
+
+    review = formatter.generate(_review_prompts(settings, sections, plan, review_markdown))
+    return _merge(settings, sections, review)
+
+
+async def async_format_large_document(
+    formatter: AsyncAIFormatter,
+    settings: Settings,
+    *,
+    template_markdown: str,
+    draft_markdown: str,
+    review_markdown: Optional[str],
+) -> AIResult:
+    plan = plan_large_document(
+        template_markdown=template_markdown,
+        draft_markdown=draft_markdown,
+        review_heading=settings.review_section_heading,
+    )
+    semaphore = asyncio.Semaphore(max(1, settings.large_document_max_workers))
+
+    async def format_section(task: SectionTask) -> SectionResult:
+        async with semaphore:
+            response_json, usage, route = await formatter.generate_json(
+                _section_prompts(settings, task, review_markdown)
+            )
+        return _parse_section(task, response_json, usage, route, settings.review_section_heading)
+
+    sections = list(await asyncio.gather(*(format_section(task) for task in plan.tasks)))
+    review = await formatter.generate(_review_prompts(settings, sections, plan, review_markdown))
+    return _merge(settings, sections, review)
+
+
+def _normalize_heading(heading: str) -> str:
+    return _NON_WORD.sub("", heading.lower())
+
+
+def _match_template_section(
+    heading: str, template_sections: List[MarkdownSection]
+) -> Optional[int]:
+    key = _normalize_heading(heading)
+    if not key:
+        return None
+    best: Optional[int] = None
+    best_ratio = _HEADING_MATCH_RATIO
+    for index, section in enumerate(template_sections):
+        candidate = _normalize_heading(section.heading)
+        if not candidate:
+            continue
+        if candidate == key or candidate in key or key in candidate:
+            return index
+        ratio = SequenceMatcher(None, key, candidate).ratio()
+        if ratio >= best_ratio:
+            best, best_ratio = index, ratio
+    return best
+
+
+def _section_prompts(
+    settings: Settings, task: SectionTask, review_markdown: Optional[str]
+) -> PromptPayload:
+    return build_section_prompts(
+        template_section=task.template_section,
+        draft_section=task.draft_section,
+        draft_overview=task.draft_overview,
+        review_guidelines=review_markdown,
+        review_section_heading=settings.review_section_heading,
+    )
+
+
+def _review_prompts(
+    settings: Settings,
+    sections: List[SectionResult],
+    plan: LargeDocumentPlan,
+    review_markdown: Optional[str],
+) -> PromptPayload:
+    findings = [
+        {"section": section.title or "冒頭", **section.findings}
+        for section in sections
+        if any(section.findings.values())
+    ]
+    return build_review_prompts(
+        findings_json=json.dumps(findings, ensure_ascii=False, indent=1),
+        previous_review=plan.previous_review,
+        review_guidelines=review_markdown,
+        review_section_heading=settings.review_section_heading,
+        completion_phrase=settings.completion_success_phrase,
+    )
+
+
+def _parse_section(
+    task: SectionTask,
+    response_json: Dict[str, Any],
+    usage: Optional[TokenUsage],
+    route: ModelRoute,
+    review_heading: str,
+) -> SectionResult:
+    markdown = response_json.get("formatted_markdown")
+    if not isinstance(markdown, str):
+        raise AIServiceError(
+            f"Missing 'formatted_markdown' in AI response for section '{task.title or '冒頭'}'."
+        )
+    # A section must not bring its own review section; the reduce step writes it.
+    markdown = "\n\n".join(
+        section.markdown
+        for section in split_markdown_sections(markdown)
+        if section.heading != review_heading
+    )
+
+    raw_findings = response_json.get("findings")
+    findings: Dict[str, List[str]] = {}
+    if isinstance(raw_findings, dict):
+        for kind in FINDING_KINDS:
+            items = raw_findings.get(kind)
+            if isinstance(items, list):
+                findings[kind] = [str(item).strip() for item in items if str(item).strip()]
+    return SectionResult(task.title, markdown.strip(), findings, usage, route)
+
+
+def _merge(settings: Settings, sections: List[SectionResult], review: AIResult) -> AIResult:
+    review_markdown = review.formatted_markdown.strip()
+    heading_line = f"## {settings.review_section_heading}"
+    if not any(
+        section.heading == settings.review_section_heading
+        for section in split_markdown_sections(review_markdown)
+    ):
+        review_markdown = f"{heading_line}\n{review_markdown}"
+
+    body = "\n\n".join(section.markdown for section in sections if section.markdown)
+    return AIResult(
+        formatted_markdown=f"{body}\n\n{review_markdown}".strip(),
+        is_complete=review.is_complete,
+        completion_message=review.completion_message,
+        usage=sum_token_usage([section.usage for section in sections] + [review.usage]),
+        model_routes=tuple(section.route for section in sections if section.route)
+        + review.model_routes,
+    )
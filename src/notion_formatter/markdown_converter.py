@@ -2,11 +2,14 @@ from __future__ import annotations
 
 import os
 import re
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 Block = Dict[str, object]
 
 INSTRUCTION_CALLOUT_TEXT = "解決したい課題を自由に以下に記述して、「要件定義レビュー」ボタンを押下してください"
+COMPLETION_SUBSECTION_TITLE = "🎉 完璧です"
+RED_REVIEW_SUBSECTIONS = {"❌ 不足している項目", "⚠️ 改善が必要な項目"}
+CONVERTER_BACKENDS = {"builtin", "markdown-it"}
 
 
 def make_rich_text(text: str, *, color: str | None = None) -> List[Dict[str, object]]:
@@ -82,167 +85,69 @@ def _is_instruction_callout(block: Block) -> bool:
     return INSTRUCTION_CALLOUT_TEXT in text
 
 
-def _prune_review_sections(
-    blocks: List[Block],
+def review_text_color(
+    text: str | None,
+    *,
+    heading_level_2: str | None,
+    heading_level_3: str | None,
     review_heading: str,
-    is_complete: bool | None,
-    debug_enabled: bool,
-) -> List[Block]:
-    pruned: List[Block] = []
-    idx = 0
-    while idx < len(blocks):
-        block = blocks[idx]
-        block_type = block.get("type")
-        if block_type == "heading_2" and _extract_text(block) == review_heading:
-            pruned.append(block)
-            idx += 1
-            while idx < len(blocks):
-                candidate = blocks[idx]
-                candidate_type = candidate.get("type")
-                if candidate_type == "heading_2":
-                    break
-                if candidate_type == "heading_3":
-                    title = _extract_text(candidate)
-                    subsection: List[Block] = []
-                    cursor = idx + 1
-                    while cursor < len(blocks):
-                        follower = blocks[cursor]
-                        follower_type = follower.get("type")
-                        if follower_type in {"heading_3", "heading_2"}:
-                            break
-                        subsection.append(follower)
-                        cursor += 1
-
-                    has_content = any(_block_has_content(item) for item in subsection)
-                    keep = has_content
-                    if title == "🎉 完璧です":
-                        if is_complete is None:
-                            keep = has_content
-                        else:
-                            keep = is_complete
-                    if keep:
-                        pruned.append(candidate)
-                        pruned.extend(subsection)
-                    elif debug_enabled:
-                        print(
-                            "DEBUG: Dropping review subsection",
-                            {
-                                "title": title,
-                                "has_content": has_content,
-                                "is_complete": is_complete,
-                            },
-                        )
-                    idx = cursor
-                    continue
-
-                pruned.append(candidate)
-                idx += 1
-            continue
-
-        pruned.append(block)
-        idx += 1
+) -> str | None:
+    """Return ``"red"`` for review notes and for the ❌/⚠️ review subsections."""
 
-    return pruned
-
-
-def markdown_to_blocks(
-    markdown: str,
-    *,
-    review_heading: str = "AIレビュー結果",
-    is_complete: bool | None = None,
-) -> List[Block]:
-    blocks: List[Block] = []
-    paragraph_buffer: List[str] = []
-    in_code = False
-    code_language = "plain text"
-    code_lines: List[str] = []
-    current_heading_level_2: str | None = None
-    current_heading_level_3: str | None = None
-
-    def determine_text_color(text: str | None = None) -> str | None:
-        if text:
-            stripped = text.strip()
-            if "🔴" in stripped or stripped.startswith("【レビュー】"):
-                return "red"
-        if (
-            current_heading_level_2 == review_heading
-            and current_heading_level_3 in {"❌ 不足している項目", "⚠️ 改善が必要な項目"}
-        ):
+    if text:
+        stripped = text.strip()
+        if "🔴" in stripped or stripped.startswith("【レビュー】"):
             return "red"
-        return None
-
-    def flush_paragraph() -> None:
-        nonlocal paragraph_buffer
-        if not paragraph_buffer:
-            return
-        text = " ".join(paragraph_buffer).strip()
-        paragraph_buffer.clear()
-        if not text:
-            return
-        # 空のテキストや空白のみのテキストをスキップ
-        if not text or text.isspace():
-            return
-        color = determine_text_color(text)
-        blocks.append(
-            {
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": make_rich_text(text, color=color),
-                },
-            }
-        )
-
-    def flush_code_block() -> None:
-        nonlocal in_code, code_language, code_lines
-        if not in_code:
-            return
-        code_text = "\n".join(code_lines)
-        # 空のコードブロックをスキップ
-        if not code_text.strip():
-            in_code = False
-            code_language = "plain text"
-            code_lines = []
-            return
-        blocks.append(
-            {
-                "type": "code",
-                "code": {
-                    "language": code_language or "plain text",
-                    "rich_text": make_rich_text(code_text),
-                },
-            }
-        )
-        in_code = False
-        code_language = "plain text"
-        code_lines = []
-
-    for raw_line in markdown.splitlines():
+    if heading_level_2 == review_heading and heading_level_3 in RED_REVIEW_SUBSECTIONS:
+        return "red"
+    return None
+
+
+class MarkdownBlockParser:
+    """Line-by-line state machine that turns Markdown into Notion blocks.
+
+    ``feed_line`` returns the blocks completed by that line (a paragraph is
+    only complete once a blank line or another block follows it) and
+    ``finish`` flushes whatever is still open at the end of the text.
+    """
+
+    def __init__(self, *, review_heading: str = "AIレビュー結果") -> None:
+        self._review_heading = review_heading
+        self._paragraph_buffer: List[str] = []
+        self._in_code = False
+        self._code_language = "plain text"
+        self._code_lines: List[str] = []
+        self._current_heading_level_2: str | None = None
+        self._current_heading_level_3: str | None = None
+
+    def feed_line(self, raw_line: str) -> List[Block]:
+        blocks: List[Block] = []
         line = raw_line.rstrip()
 
         if line.startswith("```"):
-            if in_code:
-                flush_code_block()
-                continue
-            flush_paragraph()
-            in_code = True
-            code_language = line[3:].strip() or "plain text"
-            code_lines = []
-            continue
-
-        if in_code:
-            code_lines.append(raw_line)
-            continue
+            if self._in_code:
+                self._flush_code_block(blocks)
+                return blocks
+            self._flush_paragraph(blocks)
+            self._in_code = True
+            self._code_language = line[3:].strip() or "plain text"
+            self._code_lines = []
+            return blocks
+
+        if self._in_code:
+            self._code_lines.append(raw_line)
+            return blocks
 
         if not line.strip():
-            flush_paragraph()
-            continue
+            self._flush_paragraph(blocks)
+            return blocks
 
         if line.startswith("#"):
-            flush_paragraph()
+            self._flush_paragraph(blocks)
             level = len(line) - len(line.lstrip("#"))
             content = line[level:].strip()
             if not content:  # 空の見出しをスキップ
-                continue
+                return blocks
             level = min(max(level, 1), 3)
             key = f"heading_{level}"
             blocks.append(
@@ -252,161 +157,431 @@ def markdown_to_blocks(
                 }
             )
             if level == 1:
-                current_heading_level_2 = None
-                current_heading_level_3 = None
+                self._current_heading_level_2 = None
+                self._current_heading_level_3 = None
             elif level == 2:
-                current_heading_level_2 = content
-                current_heading_level_3 = None
+                self._current_heading_level_2 = content
+                self._current_heading_level_3 = None
             else:
-                current_heading_level_3 = content
-            continue
+                self._current_heading_level_3 = content
+            return blocks
 
         if line.startswith(">"):
-            flush_paragraph()
+            self._flush_paragraph(blocks)
             content = line[1:].strip()
             if not content:  # 空の引用をスキップ
-                continue
+                return blocks
             blocks.append(
                 {
                     "type": "quote",
-                    "quote": {"rich_text": make_rich_text(content, color=determine_text_color(content))},
+                    "quote": {"rich_text": make_rich_text(content, color=self._text_color(content))},
                 }
             )
-            continue
+            return blocks
 
         if line.startswith("---"):
-            flush_paragraph()
+            self._flush_paragraph(blocks)
             blocks.append({
                 "type": "divider",
                 "divider": {}
             })
-            continue
+            return blocks
 
         if line.startswith("- [") and "]" in line:
-            flush_paragraph()
+            self._flush_paragraph(blocks)
             closing = line.index("]")
             marker = line[3:closing].strip().lower()
             checked = marker in {"x", "✓", "done"}
             content = line[closing + 1 :].strip()
             if not content:  # 空のToDoをスキップ
-                continue
+                return blocks
             blocks.append(
                 {
                     "type": "to_do",
                     "to_do": {
                         "checked": checked,
-                        "rich_text": make_rich_text(content, color=determine_text_color(content)),
+                        "rich_text": make_rich_text(content, color=self._text_color(content)),
                     },
                 }
             )
-            continue
+            return blocks
 
         if line.startswith("- "):
-            flush_paragraph()
+            self._flush_paragraph(blocks)
             content = line[2:].strip()
             if not content:  # 空の箇条書きをスキップ
-                continue
+                return blocks
             blocks.append(
                 {
                     "type": "bulleted_list_item",
                     "bulleted_list_item": {
-                        "rich_text": make_rich_text(content, color=determine_text_color(content)),
+                        "rich_text": make_rich_text(content, color=self._text_color(content)),
                     },
                 }
             )
-            continue
+            return blocks
 
         if re.match(r"^\d+\.\s+", line):
-            flush_paragraph()
+            self._flush_paragraph(blocks)
             content = re.sub(r"^\d+\.\s+", "", line).strip()
             if not content:  # 空の番号付きリストをスキップ
-                continue
+                return blocks
             blocks.append(
                 {
                     "type": "numbered_list_item",
                     "numbered_list_item": {
-                        "rich_text": make_rich_text(content, color=determine_text_color(content)),
+                        "rich_text": make_rich_text(content, color=self._text_color(content)),
                     },
                 }
             )
-            continue
+            return blocks
 
         if line.startswith("💡"):
-            flush_paragraph()
+            self._flush_paragraph(blocks)
             content = line[1:].strip()
             if not content:  # 空のコールアウトをスキップ
-                continue
+                return blocks
             blocks.append(
                 {
                     "type": "callout",
                     "callout": {
                         "icon": {"type": "emoji", "emoji": "💡"},
-                        "rich_text": make_rich_text(content, color=determine_text_color(content)),
+                        "rich_text": make_rich_text(content, color=self._text_color(content)),
                     },
                 }
             )
-            continue
+            return blocks
+
+        self._paragraph_buffer.append(line)
+        return blocks
+
+    def finish(self) -> List[Block]:
+        blocks: List[Block] = []
+        self._flush_paragraph(blocks)
+        self._flush_code_block(blocks)
+        return blocks
+
+    def _text_color(self, text: str | None = None) -> str | None:
+        return review_text_color(
+            text,
+            heading_level_2=self._current_heading_level_2,
+            heading_level_3=self._current_heading_level_3,
+            review_heading=self._review_heading,
+        )
+
+    def _flush_paragraph(self, blocks: List[Block]) -> None:
+        if not self._paragraph_buffer:
+            return
+        text = " ".join(self._paragraph_buffer).strip()
+        self._paragraph_buffer.clear()
+        # 空のテキストや空白のみのテキストをスキップ
+        if not text or text.isspace():
+            return
+        blocks.append(
+            {
+                "type": "paragraph",
+                "paragraph": {
+                    "rich_text": make_rich_text(text, color=self._text_color(text)),
+                },
+            }
+        )
+
+    def _flush_code_block(self, blocks: List[Block]) -> None:
+        if not self._in_code:
+            return
+        code_text = "\n".join(self._code_lines)
+        self._in_code = False
+        language = self._code_language or "plain text"
+        self._code_language = "plain text"
+        self._code_lines = []
+        # 空のコードブロックをスキップ
+        if not code_text.strip():
+            return
+        blocks.append(
+            {
+                "type": "code",
+                "code": {
+                    "language": language,
+                    "rich_text": make_rich_text(code_text),
+                },
+            }
+        )
+
+
+_Subsection = Tuple[Block, str, List[Block]]
+
+
+class ReviewSectionPruner:
+    """Drops empty subsections of the review section, one block at a time.
+
+    Only the current ``heading_3`` subsection of the review section is
+    buffered. With ``defer_completion`` the "🎉 完璧です" subsection and
+    everything after it are held until :meth:`finish` supplies
+    ``is_complete``, so streamed output can be pruned before the model has
+    reported whether the document is complete.
+    """
+
+    def __init__(
+        self,
+        review_heading: str,
+        *,
+        is_complete: bool | None = None,
+        defer_completion: bool = False,
+        debug_enabled: bool = False,
+    ) -> None:
+        self._review_heading = review_heading
+        self._is_complete = is_complete
+        self._defer_completion = defer_completion
+        self._debug_enabled = debug_enabled
+        self._in_review = False
+        self._subsection: Optional[_Subsection] = None
+        self._held: Optional[List[Union[Block, _Subsection]]] = None
+
+    def push(self, block: Block) -> List[Block]:
+        output: List[Block] = []
+        block_type = block.get("type")
+        if self._subsection is not None:
+            if block_type not in {"heading_3", "heading_2"}:
+                self._subsection[2].append(block)
+                return output
+            output.extend(self._close_subsection())
+
+        if block_type == "heading_2":
+            self._in_review = _extract_text(block) == self._review_heading
+        elif self._in_review and block_type == "heading_3":
+            self._subsection = (block, _extract_text(block), [])
+            return output
+        output.extend(self._emit([block]))
+        return output
+
+    def finish(self, *, is_complete: bool | None = None) -> List[Block]:
+        output = self._close_subsection()
+        if self._held is not None:
+            for item in self._held:
+                if isinstance(item, tuple):
+                    output.extend(self._resolve(item, is_complete))
+                else:
+                    output.append(item)
+            self._held = None
+        return output
+
+    def _close_subsection(self) -> List[Block]:
+        subsection, self._subsection = self._subsection, None
+        if subsection is None:
+            return []
+        if self._held is not None:
+            self._held.append(subsection)
+            return []
+        if self._defer_completion and subsection[1] == COMPLETION_SUBSECTION_TITLE:
+            self._held = [subsection]
+            return []
+        return self._resolve(subsection, self._is_complete)
+
+    def _emit(self, blocks: List[Block]) -> List[Block]:
+        if self._held is not None:
+            self._held.extend(blocks)
+            return []
+        return blocks
+
+    def _resolve(self, subsection: _Subsection, is_complete: bool | None) -> List[Block]:
+        heading, title, followers = subsection
+        has_content = any(_block_has_content(item) for item in followers)
+        keep = has_content
+        if title == COMPLETION_SUBSECTION_TITLE and is_complete is not None:
+            keep = is_complete
+        if keep:
+            return [heading, *followers]
+        if self._debug_enabled:
+            print(
+                "DEBUG: Dropping review subsection",
+                {
+                    "title": title,
+                    "has_content": has_content,
+                    "is_complete": is_complete,
+                },
+            )
+        return []
+
+
+def _prune_review_sections(
+    blocks: List[Block],
+    review_heading: str,
+    is_complete: bool | None,
+    debug_enabled: bool,
+) -> List[Block]:
+    pruner = ReviewSectionPruner(
+        review_heading,
+        is_complete=is_complete,
+        debug_enabled=debug_enabled,
+    )
+    pruned: List[Block] = []
+    for block in blocks:
+        pruned.extend(pruner.push(block))
+    pruned.extend(pruner.finish())
+    return pruned
 
-        paragraph_buffer.append(line)
 
-    flush_paragraph()
-    flush_code_block()
-    
+def _is_valid_block(block: Block, index: int, debug_enabled: bool) -> bool:
+    if debug_enabled:
+        print(f"DEBUG: Block {index}: {block}")
+    if not block.get("type"):
+        if debug_enabled:
+            print(f"WARNING: Skipping block {index} with no type: {block}")
+        return False
+    block_type = block["type"]
+    # dividerブロックは特別な処理（空のオブジェクトが有効）
+    if block_type == "divider":
+        valid = block_type in block
+    else:
+        # その他のブロックタイプはデータが必要
+        valid = bool(block.get(block_type))
+    if not valid and debug_enabled:
+        print(f"WARNING: Skipping block {index} ({block_type}) with no data: {block}")
+    return valid
+
+
+def clean_blocks(
+    blocks: Iterable[Block],
+    *,
+    review_heading: str = "AIレビュー結果",
+    is_complete: bool | None = None,
+) -> Iterator[Block]:
+    """Validate, prune the review section and drop instruction callouts in one pass.
+
+    Shared by every converter backend; only the current review subsection
+    is buffered.
+    """
+
     # デバッグ用：ブロック構造を検証（環境変数で制御）
     debug_enabled = os.getenv("DEBUG_MARKDOWN_CONVERTER", "false").lower() == "true"
-    if debug_enabled:
-        print(f"DEBUG: Generated {len(blocks)} blocks")
-        for i, block in enumerate(blocks):
-            print(f"DEBUG: Block {i}: {block}")
-            if not block.get("type"):
-                print(f"ERROR: Block {i} has no type: {block}")
-            else:
-                block_type = block["type"]
-                # dividerブロックは特別な処理（空のオブジェクトが有効）
-                if block_type == "divider":
-                    if block_type not in block:
-                        print(f"ERROR: Block {i} ({block_type}) has no data: {block}")
-                else:
-                    if not block.get(block_type):
-                        print(f"ERROR: Block {i} ({block_type}) has no data: {block}")
-    
-    # 空のブロックをフィルタリング
-    valid_blocks = []
-    for i, block in enumerate(blocks):
-        if not block.get("type"):
-            if debug_enabled:
-                print(f"WARNING: Skipping block {i} with no type: {block}")
+    pruner = ReviewSectionPruner(
+        review_heading,
+        is_complete=is_complete,
+        debug_enabled=debug_enabled,
+    )
+    generated = 0
+    yielded = 0
+    for block in blocks:
+        generated += 1
+        if not _is_valid_block(block, generated - 1, debug_enabled):
             continue
-        block_type = block["type"]
-        
-        # dividerブロックは特別な処理（空のオブジェクトが有効）
-        if block_type == "divider":
-            if block_type not in block:
-                if debug_enabled:
-                    print(f"WARNING: Skipping block {i} ({block_type}) with no data: {block}")
-                continue
-        else:
-            # その他のブロックタイプはデータが必要
-            if not block.get(block_type):
-                if debug_enabled:
-                    print(f"WARNING: Skipping block {i} ({block_type}) with no data: {block}")
-                continue
-        
-        valid_blocks.append(block)
-    
-    pruned_blocks = _prune_review_sections(
-        valid_blocks,
+        for kept in pruner.push(block):
+            if not _is_instruction_callout(kept):
+                yielded += 1
+                yield kept
+    for kept in pruner.finish():
+        if not _is_instruction_callout(kept):
+            yielded += 1
+            yield kept
+
+    if debug_enabled:
+        print(f"DEBUG: Generated {generated} blocks, yielded {yielded} after validation and review cleanup")
+
+
+def _parse_lines(lines: Iterable[str], review_heading: str) -> Iterator[Block]:
+    parser = MarkdownBlockParser(review_heading=review_heading)
+    for raw_line in lines:
+        yield from parser.feed_line(raw_line.rstrip("\r\n"))
+    yield from parser.finish()
+
+
+def iter_markdown_blocks(
+    lines: Iterable[str],
+    *,
+    review_heading: str = "AIレビュー結果",
+    is_complete: bool | None = None,
+) -> Iterator[Block]:
+    """Yield blocks for Markdown ``lines`` in a single pass.
+
+    Validation, review-section pruning and instruction-callout filtering
+    happen as each block is produced, so only the current paragraph, code
+    block and review subsection are held in memory. ``lines`` may come from
+    any iterable, e.g. a file or streamed model output split into lines.
+    """
+
+    return clean_blocks(
+        _parse_lines(lines, review_heading),
         review_heading=review_heading,
         is_complete=is_complete,
-        debug_enabled=debug_enabled,
     )
 
-    filtered_blocks = [
-        block for block in pruned_blocks if not _is_instruction_callout(block)
-    ]
 
-    if debug_enabled:
-        print(f"DEBUG: Filtered to {len(valid_blocks)} valid blocks")
-        print(f"DEBUG: Pruned to {len(pruned_blocks)} blocks after review cleanup")
-        print(f"DEBUG: Removed {len(pruned_blocks) - len(filtered_blocks)} instruction callouts")
-    return filtered_blocks
+def markdown_to_blocks(
+    markdown: str,
+    *,
+    review_heading: str = "AIレビュー結果",
+    is_complete: bool | None = None,
+) -> List[Block]:
+    return list(
+        iter_markdown_blocks(
+            markdown.splitlines(),
+            review_heading=review_heading,
+            is_complete=is_complete,
+        )
+    )
+
+
+def convert_markdown(
+    markdown: str,
+    *,
+    backend: str = "builtin",
+    review_heading: str = "AIレビュー結果",
+    is_complete: bool | None = None,
+) -> List[Block]:
+    """Convert ``markdown`` with the selected backend (see ``CONVERTER_BACKENDS``)."""
+
+    if backend == "builtin":
+        return markdown_to_blocks(markdown, review_heading=review_heading, is_complete=is_complete)
+    if backend == "markdown-it":
+        from .markdown_it_converter import markdown_it_to_blocks
+
+        return markdown_it_to_blocks(
+            markdown, review_heading=review_heading, is_complete=is_complete
+        )
+    raise ValueError(f"Unknown Markdown converter backend: {backend}")
+
+
+class StreamingMarkdownConverter:
+    """Incremental :func:`markdown_to_blocks` for Markdown that arrives in pieces.
+
+    Each complete line goes through the same parser and pruner as
+    :func:`iter_markdown_blocks`, so blocks come out as soon as they are
+    complete. Only the "🎉 完璧です" review subsection (and anything after
+    it) waits for :meth:`finish`, because keeping it depends on
+    ``is_complete``. The blocks returned by ``feed`` and ``finish`` together
+    equal ``markdown_to_blocks`` on the whole text.
+    """
+
+    def __init__(self, *, review_heading: str = "AIレビュー結果") -> None:
+        self._partial_line = ""
+        self._parser = MarkdownBlockParser(review_heading=review_heading)
+        self._pruner = ReviewSectionPruner(review_heading, defer_completion=True)
+
+    def feed(self, text: str) -> List[Block]:
+        *lines, self._partial_line = (self._partial_line + text).split("\n")
+        blocks: List[Block] = []
+        for line in lines:
+            blocks.extend(self._process(self._parser.feed_line(line.rstrip("\r"))))
+        return blocks
+
+    def finish(self, *, is_complete: bool | None = None) -> List[Block]:
+        blocks: List[Block] = []
+        if self._partial_line:
+            blocks.extend(self._process(self._parser.feed_line(self._partial_line)))
+            self._partial_line = ""
+        blocks.extend(self._process(self._parser.finish()))
+        blocks.extend(
+            block
+            for block in self._pruner.finish(is_complete=is_complete)
+            if not _is_instruction_callout(block)
+        )
+        return blocks
+
+    def _process(self, blocks: List[Block]) -> List[Block]:
+        output: List[Block] = []
+        for block in blocks:
+            if _is_valid_block(block, 0, False):
+                output.extend(
+                    kept for kept in self._pruner.push(block) if not _is_instruction_callout(kept)
+                )
+        return output
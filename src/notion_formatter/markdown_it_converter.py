@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterator, List, Optional
+
+from markdown_it import MarkdownIt
+from markdown_it.tree import SyntaxTreeNode
+
+from .markdown_converter import Block, clean_blocks, review_text_color
+
+RichText = List[Dict[str, object]]
+
+_TASK_MARKER = re.compile(r"^\[([^\]]*)\]\s*")
+_LINKABLE_URL = re.compile(r"^(https?://|mailto:)", re.IGNORECASE)
+
+_parser: Optional[MarkdownIt] = None
+
+
+def _markdown_parser() -> MarkdownIt:
+    global _parser
+    if _parser is None:
+        _parser = MarkdownIt("commonmark", {"html": False}).enable(["table", "strikethrough"])
+    return _parser
+
+
+def iter_markdown_it_blocks(
+    markdown: str,
+    *,
+    review_heading: str = "AIレビュー結果",
+    is_complete: bool | None = None,
+) -> Iterator[Block]:
+    """Yield blocks for ``markdown`` from the markdown-it token stream.
+
+    Produces the same block dicts as the builtin converter for the
+    constructs both support, plus nested list items and quotes (as
+    ``children``), inline bold / italic / strikethrough / code / links as
+    rich-text annotations, and tables. Review pruning, validation and
+    instruction-callout filtering are shared with the builtin backend.
+    """
+
+    tree = SyntaxTreeNode(_markdown_parser().parse(markdown))
+    builder = _BlockBuilder(review_heading)
+    return clean_blocks(
+        builder.iter_blocks(tree.children),
+        review_heading=review_heading,
+        is_complete=is_complete,
+    )
+
+
+def markdown_it_to_blocks(
+    markdown: str,
+    *,
+    review_heading: str = "AIレビュー結果",
+    is_complete: bool | None = None,
+) -> List[Block]:
+    return list(
+        iter_markdown_it_blocks(markdown, review_heading=review_heading, is_complete=is_complete)
+    )
+
+
+class _BlockBuilder:
+    def __init__(self, review_heading: str) -> None:
+        self._review_heading = review_heading
+        self._heading_level_2: str | None = None
+        self._heading_level_3: str | None = None
+
+    def iter_blocks(self, nodes: List[SyntaxTreeNode]) -> Iterator[Block]:
+        for node in nodes:
+            yield from self._convert(node)
+
+    def _convert_all(self, nodes: List[SyntaxTreeNode]) -> List[Block]:
+        blocks: List[Block] = []
+        for node in nodes:
+            blocks.extend(self._convert(node))
+        return blocks
+
+    def _convert(self, node: SyntaxTreeNode) -> List[Block]:
+        node_type = node.type
+        if node_type == "heading":
+            return self._heading(node)
+        if node_type == "paragraph":
+            return self._paragraph(node)
+        if node_type in {"bullet_list", "ordered_list"}:
+            return [
+                block
+                for item in node.children
+                for block in self._list_item(item, ordered=node_type == "ordered_list")
+            ]
+        if node_type == "blockquote":
+            return self._quote(node)
+        if node_type in {"fence", "code_block"}:
+            return self._code(node)
+        if node_type == "hr":
+            return [{"type": "divider", "divider": {}}]
+        if node_type == "table":
+            return self._table(node)
+        return []
+
+    def _heading(self, node: SyntaxTreeNode) -> List[Block]:
+        inline = node.children[0] if node.children else None
+        rich_text = self._rich_text(inline, color=None)
+        content = _plain_text(rich_text).strip()
+        if not content:  # 空の見出しをスキップ
+            return []
+        level = min(max(int(node.tag[1:]), 1), 3)
+        if level == 1:
+            self._heading_level_2 = None
+            self._heading_level_3 = None
+        elif level == 2:
+            self._heading_level_2 = content
+            self._heading_level_3 = None
+        else:
+            self._heading_level_3 = content
+        key = f"heading_{level}"
+        return [{"type": key, key: {"rich_text": rich_text}}]
+
+    def _paragraph(self, node: SyntaxTreeNode) -> List[Block]:
+        inline = node.children[0] if node.children else None
+        rich_text = self._colored_rich_text(inline)
+        text = _plain_text(rich_text)
+        if not text.strip():
+            return []
+        if text.startswith("💡"):
+            rich_text = _strip_leading(rich_text, len("💡"))
+            if not _plain_text(rich_text).strip():  # 空のコールアウトをスキップ
+                return []
+            return [
+                {
+                    "type": "callout",
+                    "callout": {
+                        "icon": {"type": "emoji", "emoji": "💡"},
+                        "rich_text": _strip_leading_whitespace(rich_text),
+                    },
+                }
+            ]
+        return [{"type": "paragraph", "paragraph": {"rich_text": rich_text}}]
+
+    def _list_item(self, node: SyntaxTreeNode, *, ordered: bool) -> List[Block]:
+        children = list(node.children)
+        rich_text: RichText = []
+        if children and children[0].type == "paragraph":
+            first = children.pop(0)
+            rich_text = self._colored_rich_text(first.children[0] if first.children else None)
+
+        block_type = "numbered_list_item" if ordered else "bulleted_list_item"
+        data: Dict[str, object] = {}
+        marker = _TASK_MARKER.match(_plain_text(rich_text)) if not ordered else None
+        if marker is not None:
+            block_type = "to_do"
+            data["checked"] = marker.group(1).strip().lower() in {"x", "✓", "done"}
+            rich_text = _strip_leading(rich_text, marker.end())
+
+        nested = self._convert_all(children)
+        if not _plain_text(rich_text).strip() and not nested:
+            return []
+        data["rich_text"] = rich_text
+        if nested:
+            data["children"] = nested
+        return [{"type": block_type, block_type: data}]
+
+    def _quote(self, node: SyntaxTreeNode) -> List[Block]:
+        children = list(node.children)
+        rich_text: RichText = []
+        if children and children[0].type == "paragraph":
+            first = children.pop(0)
+            rich_text = self._colored_rich_text(first.children[0] if first.children else None)
+        nested = self._convert_all(children)
+        if not _plain_text(rich_text).strip() and not nested:  # 空の引用をスキップ
+            return []
+        data: Dict[str, object] = {"rich_text": rich_text}
+        if nested:
+            data["children"] = nested
+        return [{"type": "quote", "quote": data}]
+
+    def _code(self, node: SyntaxTreeNode) -> List[Block]:
+        code_text = node.content.rstrip("\n")
+        if not code_text.strip():  # 空のコードブロックをスキップ
+            return []
+        language = node.info.strip() if node.type == "fence" else ""
+        return [
+            {
+                "type": "code",
+                "code": {
+                    "language": language or "plain text",
+                    "rich_text": _fragments([(code_text, {}, None)], color=None),
+                },
+            }
+        ]
+
+    def _table(self, node: SyntaxTreeNode) -> List[Block]:
+        rows: List[List[RichText]] = []
+        for section in node.children:
+            for row in section.children:
+                rows.append(
+                    [
+                        self._rich_text(cell.children[0] if cell.children else None, color=None)
+                        for cell in row.children
+                    ]
+                )
+        if not rows:
+            return []
+        width = max(len(row) for row in rows)
+        return [
+            {
+                "type": "table",
+                "table": {
+                    "table_width": width,
+                    "has_column_header": node.children[0].type == "thead",
+                    "has_row_header": False,
+                    "children": [
+                        {
+                            "type": "table_row",
+                            "table_row": {"cells": row + [[] for _ in range(width - len(row))]},
+                        }
+                        for row in rows
+                    ],
+                },
+            }
+        ]
+
+    def _colored_rich_text(self, inline: Optional[SyntaxTreeNode]) -> RichText:
+        color = review_text_color(
+            _inline_plain_text(inline),
+            heading_level_2=self._heading_level_2,
+            heading_level_3=self._heading_level_3,
+            review_heading=self._review_heading,
+        )
+        return self._rich_text(inline, color=color)
+
+    def _rich_text(self, inline: Optional[SyntaxTreeNode], *, color: str | None) -> RichText:
+        runs: List[tuple] = []
+        if inline is not None:
+            _collect_runs(inline, {}, None, runs)
+        return _fragments(runs, color=color)
+
+
+def _collect_runs(
+    node: SyntaxTreeNode,
+    annotations: Dict[str, bool],
+    link: Optional[str],
+    runs: List[tuple],
+) -> None:
+    for child in node.children:
+        child_type = child.type
+        if child_type in {"text", "html_inline"}:
+            runs.append((child.content, annotations, link))
+        elif child_type == "code_inline":
+            runs.append((child.content, {**annotations, "code": True}, link))
+        elif child_type == "softbreak":
+            runs.append((" ", annotations, link))
+        elif child_type == "hardbreak":
+            runs.append(("\n", annotations, link))
+        elif child_type == "strong":
+            _collect_runs(child, {**annotations, "bold": True}, link, runs)
+        elif child_type == "em":
+            _collect_runs(child, {**annotations, "italic": True}, link, runs)
+        elif child_type == "s":
+            _collect_runs(child, {**annotations, "strikethrough": True}, link, runs)
+        elif child_type == "link":
+            href = str(child.attrs.get("href", ""))
+            _collect_runs(child, annotations, href if _LINKABLE_URL.match(href) else link, runs)
+        else:
+            _collect_runs(child, annotations, link, runs)
+
+
+def _fragments(runs: List[tuple], *, color: str | None) -> RichText:
+    rich_text: RichText = []
+    previous_key: Optional[tuple] = None
+    for content, run_annotations, link in runs:
+        if not content:
+            continue
+        key = (tuple(sorted(run_annotations.items())), link)
+        if key == previous_key:
+            text_data = rich_text[-1]["text"]
+            text_data["content"] += content  # type: ignore[index]
+            continue
+        text: Dict[str, object] = {"content": content}
+        if link:
+            text["link"] = {"url": link}
+        rich_text.append(
+            {
+                "type": "text",
+                "text": text,
+                "annotations": {
+                    "bold": run_annotations.get("bold", False),
+                    "italic": run_annotations.get("italic", False),
+                    "strikethrough": run_annotations.get("strikethrough", False),
+                    "underline": False,
+                    "code": run_annotations.get("code", False),
+                    "color": color or "default",
+                },
+            }
+        )
+        previous_key = key
+    return rich_text
+
+
+def _plain_text(rich_text: RichText) -> str:
+    return "".join(str(fragment["text"]["content"]) for fragment in rich_text)  # type: ignore[index]
+
+
+def _inline_plain_text(inline: Optional[SyntaxTreeNode]) -> str:
+    if inline is None:
+        return ""
+    runs: List[tuple] = []
+    _collect_runs(inline, {}, None, runs)
+    return "".join(content for content, _, _ in runs)
+
+
+def _strip_leading(rich_text: RichText, count: int) -> RichText:
+    """Drop the first ``count`` characters (e.g. a task marker) from ``rich_text``."""
+
+    result: RichText = []
+    for fragment in rich_text:
+        content = str(fragment["text"]["content"])  # type: ignore[index]
+        if count >= len(content):
+            count -= len(content)
+            continue
+        if count:
+            fragment = {**fragment, "text": {**fragment["text"], "content": content[count:]}}  # type: ignore[dict-item]
+            count = 0
+        result.append(fragment)
+    return result
+
+
+def _strip_leading_whitespace(rich_text: RichText) -> RichText:
+    text = _plain_text(rich_text)
+    return _strip_leading(rich_text, len(text) - len(text.lstrip()))
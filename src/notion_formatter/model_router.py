@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from .config import Settings
+from .prompt_builder import PromptPayload
+
+# Conservative output rate used to size request timeouts and to estimate
+# how long a completion will take. The formatted document is about as long
+# as the draft, so the completion is estimated from the draft part of the
+# prompt plus room for the review section.
+ASSUMED_OUTPUT_TOKENS_PER_SECOND = 40.0
+REVIEW_OVERHEAD_TOKENS = 500
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count without a tokenizer.
+
+    ASCII text averages about four characters per token; Japanese and other
+    non-ASCII characters are closer to one token each.
+    """
+
+    non_ascii = sum(1 for char in text if ord(char) > 0x7F)
+    return (len(text) - non_ascii + 3) // 4 + non_ascii
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    """The model chosen for one completion and why.
+
+    ``fallback_from`` names the model this route replaced after it failed.
+    """
+
+    model: str
+    reason: str
+    estimated_prompt_tokens: int
+    timeout_seconds: float
+    fallback_from: Optional[str] = None
+
+    def to_payload(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "reason": self.reason,
+            "estimated_prompt_tokens": self.estimated_prompt_tokens,
+            "timeout_seconds": round(self.timeout_seconds, 1),
+        }
+
+
+class ModelRouter:
+    """Pick the OpenAI model for a prompt from its size and the latency budget.
+
+    Prompts up to ``openai_fast_model_max_prompt_tokens`` go to
+    ``openai_fast_model``, as do larger ones whose estimated generation time
+    on ``openai_model`` exceeds ``openai_latency_budget_seconds``. Everything
+    else uses ``openai_model``. Each request gets a timeout that grows with
+    the expected completion, so large drafts are not cut off while short
+    ones fail over quickly to ``openai_fallback_model``.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self._settings = settings
+
+    def route(self, prompts: PromptPayload) -> ModelRoute:
+        settings = self._settings
+        prompt_tokens = estimate_tokens(prompts.system_prompt) + estimate_tokens(prompts.user_prompt)
+        draft_tokens = estimate_tokens(prompts.user_prompt[prompts.static_prefix_length :])
+        expected_seconds = (draft_tokens + REVIEW_OVERHEAD_TOKENS) / ASSUMED_OUTPUT_TOKENS_PER_SECOND
+        timeout = settings.openai_timeout_seconds + expected_seconds
+
+        fast_model = settings.openai_fast_model
+        budget = settings.openai_latency_budget_seconds
+        if fast_model and prompt_tokens <= settings.openai_fast_model_max_prompt_tokens:
+            model = fast_model
+            reason = (
+                f"prompt ~{prompt_tokens} tokens <= "
+                f"{settings.openai_fast_model_max_prompt_tokens}"
+            )
+        elif fast_model and budget and expected_seconds > budget:
+            model = fast_model
+            reason = f"estimated {expected_seconds:.0f}s exceeds the {budget:g}s latency budget"
+        else:
+            model = settings.openai_model
+            reason = f"prompt ~{prompt_tokens} tokens" if fast_model else "default model"
+        return ModelRoute(model, reason, prompt_tokens, timeout)
+
+    def has_fallback(self, route: ModelRoute) -> bool:
+        fallback_model = self._settings.openai_fallback_model
+        return bool(fallback_model) and fallback_model != route.model
+
+    def fallback(self, route: ModelRoute, cause: str) -> Optional[ModelRoute]:
+        """The route to retry on after ``route`` failed, or None if there is none."""
+
+        fallback_model = self._settings.openai_fallback_model
+        if not fallback_model or fallback_model == route.model:
+            return None
+        return ModelRoute(
+            fallback_model,
+            f"fallback from {route.model}: {cause}",
+            route.estimated_prompt_tokens,
+            route.timeout_seconds,
+            fallback_from=route.model,
+        )
@@ -1,42 +1,448 @@
 from __future__ import annotations
 
-from typing import Dict, Iterable, List, Set
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
 
-from notion_client import Client
+from .append_planner import AppendRequest, plan_append_requests
+from .page_cache import PageMarkdownCache
+from .page_diff import BlockInsert, DiffPlan, plan_page_diff, update_payload
+from .page_snapshot import Block, BlockTree, PageSnapshot
+from .rate_limiter import (
+    NOTION_REQUESTS_PER_SECOND,
+    RateLimiter,
+    RequestStats,
+    bind_request_tracking,
+    shared_rate_limiter,
+)
+from .write_journal import WriteJournal
 
-RichText = List[Dict[str, object]]
-Block = Dict[str, object]
+if TYPE_CHECKING:
+    import httpx
 
 PRESERVE_LEADING_BLOCKS = 1
+DEFAULT_MAX_CONCURRENT_REQUESTS = 4
 
 
-def extract_plain_text(rich_text: Iterable[Dict[str, object]]) -> str:
-    return "".join(fragment.get("plain_text", "") for fragment in rich_text)
+class NotionServiceError(RuntimeError):
+    """Raised when a Notion write cannot be completed safely."""
+
+
+@dataclass
+class ArchiveReport:
+    """Outcome of archiving a page's existing top-level blocks.
+
+    ``archive_seconds`` and ``append_seconds`` are the wall time spent
+    removing (or updating) old blocks and appending new ones.
+    """
+
+    archived: List[str] = field(default_factory=list)
+    preserved: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    archive_seconds: float = 0.0
+    append_seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+
+@dataclass
+class DiffReport(ArchiveReport):
+    """Outcome of a diff-based page update."""
+
+    updated: List[str] = field(default_factory=list)
+    inserted: int = 0
+
+
+def split_replaceable_blocks(
+    snapshot: PageSnapshot,
+) -> Tuple[List[Block], List[str], Optional[str]]:
+    """Split the page's top-level blocks into replaceable and preserved ones.
+
+    Returns the replaceable blocks in order, the IDs of the preserved blocks
+    (the leading blocks plus anything containing a button or instruction
+    callout) and the ID of the block right before the first replaceable one.
+    """
+
+    top_level = snapshot.top_level_blocks
+    replaceable: List[Block] = []
+    preserved: List[str] = []
+    anchor: Optional[str] = None
+    for index, child in enumerate(top_level):
+        child_id = child.get("id")
+        if not isinstance(child_id, str):
+            continue
+        if index < PRESERVE_LEADING_BLOCKS or snapshot.contains_preserved(child):
+            preserved.append(child_id)
+            continue
+        if not replaceable and index > 0:
+            anchor = str(top_level[index - 1].get("id"))
+        replaceable.append(child)
+    return replaceable, preserved, anchor
+
+
+BlockUpdates = List[Tuple[str, Dict[str, object]]]
+
+
+def plan_diff_update(
+    snapshot: PageSnapshot, blocks: List[Block]
+) -> Optional[Tuple[DiffPlan, List[str]]]:
+    """Plan a diff-based rewrite of the snapshot's page.
+
+    Returns the plan and the preserved block IDs, or ``None`` when the first
+    replaceable block has no preceding block to anchor insertions on and
+    the page has to be replaced instead.
+    """
+
+    existing, preserved, initial_anchor = split_replaceable_blocks(snapshot)
+    if existing and initial_anchor is None:
+        return None
+    plan = plan_page_diff(existing, list(blocks), snapshot=snapshot, initial_anchor=initial_anchor)
+    return plan, preserved
+
+
+def diff_block_updates(plan: DiffPlan) -> BlockUpdates:
+    """The ``blocks.update`` calls of a diff plan: in-place edits, then archives."""
+
+    return [(update.block_id, update_payload(update.block)) for update in plan.updates] + [
+        (target, {"archived": True}) for target in plan.archives
+    ]
+
+
+def insert_anchor(insert: BlockInsert, last_created: List[str]) -> Optional[str]:
+    """The block ``insert`` goes after, given the last block created by each earlier insert."""
+
+    if insert.after_insert is not None:
+        return last_created[insert.after_insert]
+    return insert.after_block_id
+
+
+def resume_archive_targets(journal: WriteJournal, children: List[Block]) -> List[str]:
+    """Blocks to archive before an interrupted write continues.
+
+    ``children`` are the page's current top-level blocks. Planned archives
+    that did not happen are retried, and blocks after the last one the
+    journal knows about are the remains of an append request that was not
+    confirmed.
+    """
+
+    targets = set(journal.archive_targets)
+    known = targets | set(journal.created_ids) | set(journal.preserved)
+    live = [
+        str(block["id"])
+        for block in children
+        if not block.get("archived") and not block.get("in_trash")
+    ]
+    last_known = max(
+        (index for index, block_id in enumerate(live) if block_id in known),
+        default=-1,
+    )
+    return [
+        block_id
+        for index, block_id in enumerate(live)
+        if block_id in targets or (index > last_known and block_id not in known)
+    ]
+
+
+def restore_updates(journal: WriteJournal, children: List[Block]) -> BlockUpdates:
+    """Updates that undo a journaled write which cannot be finished.
+
+    The blocks it appended (and unconfirmed leftovers, as found by
+    :func:`resume_archive_targets`) are archived and the blocks it archived
+    are restored.
+    """
+
+    targets = set(journal.archive_targets)
+    live = {str(block["id"]) for block in children}
+    appended = [block_id for block_id in journal.created_ids if block_id in live]
+    appended.extend(
+        block_id
+        for block_id in resume_archive_targets(journal, children)
+        if block_id not in targets and block_id not in appended
+    )
+    return [(block_id, {"archived": True}) for block_id in appended] + [
+        (block_id, {"archived": False}) for block_id in journal.archive_targets
+    ]
+
+
+def created_block_ids(
+    request: AppendRequest, response: object, *, after: Optional[str] = None
+) -> List[str]:
+    """IDs of the blocks an append request created, checked where later writes need them."""
+
+    created = response.get("results", []) if isinstance(response, dict) else []
+    ids = [str(block.get("id")) for block in created]
+    if (after or request.deferred) and len(ids) != len(request.children):
+        raise NotionServiceError(
+            "Notion did not return the appended blocks; cannot place the remaining ones."
+        )
+    return ids
+
+
+def record_update_outcome(
+    report: ArchiveReport,
+    block_id: str,
+    payload: Dict[str, object],
+    error: Optional[BaseException],
+) -> None:
+    if error is not None:
+        report.failed[block_id] = str(error) or error.__class__.__name__
+    elif payload.get("archived"):
+        report.archived.append(block_id)
+    elif isinstance(report, DiffReport):
+        report.updated.append(block_id)
+
+
+def collect_children_level(
+    tree: BlockTree, level: List[str], results: Iterable[List[Block]]
+) -> List[str]:
+    """Store one level of listed children in ``tree`` and return the next level to list."""
+
+    next_level: List[str] = []
+    for parent_id, children in zip(level, results):
+        tree[parent_id] = children
+        for child in children:
+            child_id = child.get("id")
+            if child.get("has_children") and isinstance(child_id, str) and child_id not in tree:
+                next_level.append(child_id)
+    return next_level
+
+
+def archive_failure(report: ArchiveReport, *, resuming: bool = False) -> NotionServiceError:
+    if resuming:
+        what = f"Failed to archive {len(report.failed)} block(s) while resuming"
+    else:
+        what = f"Failed to archive {len(report.failed)} existing block(s)"
+    return NotionServiceError(
+        f"{what}; refusing to append so the page does not end up with duplicated content."
+    )
+
+
+def diff_failure(report: ArchiveReport) -> NotionServiceError:
+    return NotionServiceError(
+        f"Failed to update or archive {len(report.failed)} block(s) during the diff update."
+    )
 
 
 class NotionService:
     """Wraps the Notion SDK with helpers tailored to the formatting workflow."""
 
-    def __init__(self, api_key: str) -> None:
-        self._client = Client(auth=api_key)
-
-    def fetch_page_markdown(self, page_id: str) -> str:
-        blocks = self._fetch_block_children(page_id)
-        lines: List[str] = []
-        self._blocks_to_markdown(blocks, lines, 0)
-        return "\n".join(lines).strip()
-
-    def replace_page_content(self, page_id: str, blocks: List[Block]) -> None:
-        self._archive_existing_children(page_id)
-        blocks_to_append = list(blocks)
-        for chunk_start in range(0, len(blocks_to_append), 50):
-            chunk = blocks_to_append[chunk_start : chunk_start + 50]
-            if not chunk:
-                continue
-            self._client.blocks.children.append(
-                block_id=page_id,
-                children=chunk,
-            )
+    def __init__(
+        self,
+        api_key: str,
+        *,
+        max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+        page_cache: Optional[PageMarkdownCache] = None,
+        retry_limit: int = 3,
+        requests_per_second: float = NOTION_REQUESTS_PER_SECOND,
+        rate_limiter: Optional[RateLimiter] = None,
+        stats: Optional[RequestStats] = None,
+        base_url: Optional[str] = None,
+        transport: Optional["httpx.BaseTransport"] = None,
+    ) -> None:
+        self._stats = stats or RequestStats()
+        # notion-client and httpx are only imported once a service is built.
+        from .throttled_client import ThrottledClient
+
+        client_options: Dict[str, Any] = {"base_url": base_url} if base_url else {}
+        if transport is not None:
+            import httpx
+
+            client_options["client"] = httpx.Client(transport=transport)
+        self._client = ThrottledClient(
+            auth=api_key,
+            rate_limiter=rate_limiter or shared_rate_limiter(requests_per_second),
+            stats=self._stats,
+            retry_limit=retry_limit,
+            **client_options,
+        )
+        self._max_concurrent_requests = max(1, max_concurrent_requests)
+        self._page_cache = page_cache
+
+    @property
+    def request_stats(self) -> RequestStats:
+        """Counters for requests, retries and 429 throttling on this service."""
+
+        return self._stats
+
+    def fetch_page_markdown(self, page_id: str, *, use_cache: bool = False) -> str:
+        """Render the page as Markdown.
+
+        With ``use_cache`` and a configured page cache, the page's
+        ``last_edited_time`` is checked first and the cached Markdown is
+        returned when it is still current, skipping the block tree walk.
+        """
+
+        if not use_cache or self._page_cache is None:
+            return self.fetch_page_snapshot(page_id).to_markdown()
+
+        page = self._client.pages.retrieve(page_id=page_id)
+        last_edited_time = str(page.get("last_edited_time", ""))
+        if last_edited_time:
+            cached = self._page_cache.get(page_id, last_edited_time)
+            if cached is not None:
+                return cached
+
+        markdown = self.fetch_page_snapshot(page_id).to_markdown()
+        if last_edited_time:
+            self._page_cache.put(page_id, last_edited_time, markdown)
+        return markdown
+
+    def fetch_page_snapshot(self, page_id: str) -> PageSnapshot:
+        """Walk the page's block tree once and return it as a snapshot."""
+
+        return PageSnapshot.from_tree(page_id, self._fetch_block_tree(page_id))
+
+    def replace_page_content(
+        self,
+        page_id: str,
+        blocks: List[Block],
+        *,
+        snapshot: Optional[PageSnapshot] = None,
+        journal: Optional[WriteJournal] = None,
+    ) -> ArchiveReport:
+        """Archive the page's current blocks and append ``blocks``.
+
+        Pass the ``snapshot`` taken when the page was read to skip listing the
+        block tree again; blocks added to the page after that snapshot are
+        left untouched. With a ``journal``, every confirmed append request is
+        recorded so :meth:`resume_page_content` can finish an interrupted write.
+        """
+
+        if snapshot is None:
+            snapshot = self.fetch_page_snapshot(page_id)
+        report = self._archive_existing_children(snapshot)
+        if not report.ok:
+            raise archive_failure(report)
+        started = time.perf_counter()
+        if journal is None:
+            self._append_blocks(page_id, list(blocks))
+        else:
+            self._append_journaled(page_id, journal.remaining_blocks, journal)
+        report.append_seconds = time.perf_counter() - started
+        return report
+
+    def resume_page_content(self, journal: WriteJournal) -> ArchiveReport:
+        """Finish the interrupted replace-mode write recorded in ``journal``.
+
+        The page's top-level blocks are listed once and reconciled with the
+        journal (see :func:`resume_archive_targets`), then the remaining
+        requests are appended from the journaled blocks.
+        """
+
+        page_id = journal.page_id
+        leftovers = resume_archive_targets(journal, self._fetch_block_children(page_id))
+        report = self._archive_blocks(leftovers, preserved=journal.preserved)
+        if not report.ok:
+            raise archive_failure(report, resuming=True)
+        started = time.perf_counter()
+        self._append_journaled(page_id, journal.remaining_blocks, journal)
+        report.append_seconds = time.perf_counter() - started
+        return report
+
+    def restore_page_content(self, journal: WriteJournal) -> ArchiveReport:
+        """Undo the interrupted write recorded in ``journal`` (see :func:`restore_updates`)."""
+
+        report = ArchiveReport()
+        updates = restore_updates(journal, self._fetch_block_children(journal.page_id))
+        self._apply_block_updates(report, updates)
+        return report
+
+    def open_page_writer(
+        self,
+        page_id: str,
+        *,
+        snapshot: PageSnapshot,
+        journal: Optional[WriteJournal] = None,
+    ) -> "StreamingPageWriter":
+        """Start a replace-mode write whose blocks are supplied incrementally.
+
+        With a ``journal``, every confirmed append request is recorded in it.
+        """
+
+        return StreamingPageWriter(self, page_id, snapshot, journal)
+
+    def update_page_content(
+        self,
+        page_id: str,
+        blocks: List[Block],
+        *,
+        snapshot: Optional[PageSnapshot] = None,
+    ) -> ArchiveReport:
+        """Rewrite the page by diffing its current blocks against ``blocks``.
+
+        Unchanged blocks are left alone, changed blocks of the same type are
+        updated in place, new blocks are inserted with ``after`` and only the
+        removed blocks are archived, so the number of writes follows the size
+        of the change. Preserved blocks are never touched. Falls back to
+        :meth:`replace_page_content` when the first replaceable block has no
+        preceding block to anchor insertions on.
+        """
+
+        if snapshot is None:
+            snapshot = self.fetch_page_snapshot(page_id)
+
+        planned = plan_diff_update(snapshot, blocks)
+        if planned is None:
+            return self.replace_page_content(page_id, blocks, snapshot=snapshot)
+        plan, preserved = planned
+        report = DiffReport(preserved=preserved)
+
+        started = time.perf_counter()
+        last_created: List[str] = []
+        for insert in plan.inserts:
+            after = insert_anchor(insert, last_created)
+            created = self._append_blocks(page_id, insert.blocks, after=after)
+            report.inserted += len(created)
+            last_created.append(created[-1] if created else str(after))
+        report.append_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        self._apply_block_updates(report, diff_block_updates(plan))
+        report.archive_seconds = time.perf_counter() - started
+        if not report.ok:
+            raise diff_failure(report)
+        return report
+
+    def query_database(
+        self,
+        database_id: str,
+        *,
+        filter: Optional[Dict[str, object]] = None,
+        sorts: Optional[List[Dict[str, object]]] = None,
+    ) -> List[Dict[str, object]]:
+        """Return every page of a database query, following the cursors.
+
+        Databases are queried through their first data source when the
+        client targets a Notion API version that has data sources.
+        """
+
+        path = f"databases/{database_id}/query"
+        if hasattr(self._client, "data_sources"):
+            database = self._client.databases.retrieve(database_id=database_id)
+            data_sources = database.get("data_sources") or []
+            if data_sources:
+                path = f"data_sources/{data_sources[0]['id']}/query"
+
+        pages: List[Dict[str, object]] = []
+        cursor: str | None = None
+        while True:
+            body: Dict[str, object] = {"page_size": 100}
+            if filter:
+                body["filter"] = filter
+            if sorts:
+                body["sorts"] = sorts
+            if cursor:
+                body["start_cursor"] = cursor
+            response = self._client.request(path=path, method="POST", body=body)
+            pages.extend(response.get("results", []))
+            if not response.get("has_more"):
+                break
+            cursor = response.get("next_cursor")
+        return pages
 
     def update_status_property(
         self,
@@ -56,52 +462,98 @@ class NotionService:
             },
         )
 
-    def _archive_existing_children(self, block_id: str) -> None:
-        children = self._fetch_block_children(block_id)
-        seen: Set[str] = set()
-        for index, child in enumerate(children):
-            preserve = index < PRESERVE_LEADING_BLOCKS or self._should_preserve_block(
-                child, seen=seen
-            )
-            if preserve:
-                continue
-            block_id_value = child.get("id")
-            if isinstance(block_id_value, str):
-                self._client.blocks.update(block_id=block_id_value, archived=True)
-
-    def _should_preserve_block(self, block: Block, *, seen: Set[str]) -> bool:
-        preserved_types = {"button", "template_button"}
-        preserved_keys = {"button", "template_button"}
-
-        block_type = str(block.get("type"))
-        if block_type in preserved_types:
-            return True
-
-        if any(key in block for key in preserved_keys):
-            return True
-
-        if block_type == "callout":
-            callout = block.get("callout", {})
-            rich_text = callout.get("rich_text", [])
-            text = extract_plain_text(rich_text)
-            if "解決したい課題" in text or "要件定義レビュー" in text:
-                return True
-
-        block_id = block.get("id")
-        if not isinstance(block_id, str):
-            block_id = None
-
-        if block_id and block_id in seen:
-            return False
-
-        if block.get("has_children") and block_id:
-            seen.add(block_id)
-            descendants = self._fetch_block_children(block_id)
-            for child in descendants:
-                if self._should_preserve_block(child, seen=seen):
-                    return True
-
-        return False
+    def _archive_existing_children(self, snapshot: PageSnapshot) -> ArchiveReport:
+        """Archive every non-preserved top-level block of the snapshot's page.
+
+        Archive calls run concurrently but are paced by the shared rate
+        limiter; each block is retried on its own by the client, and failures
+        are collected in the returned report instead of aborting the remaining
+        blocks.
+        """
+
+        replaceable, preserved, _ = split_replaceable_blocks(snapshot)
+        return self._archive_blocks([str(block["id"]) for block in replaceable], preserved=preserved)
+
+    def _archive_blocks(self, targets: List[str], *, preserved: List[str]) -> ArchiveReport:
+        report = ArchiveReport(preserved=list(preserved))
+        started = time.perf_counter()
+        self._apply_block_updates(report, [(target, {"archived": True}) for target in targets])
+        report.archive_seconds = time.perf_counter() - started
+        return report
+
+    def _apply_block_updates(self, report: ArchiveReport, updates: BlockUpdates) -> None:
+        """Send ``updates`` concurrently and record each outcome in ``report``."""
+
+        if not updates:
+            return
+        update_block = bind_request_tracking(self._update_block)
+        with ThreadPoolExecutor(max_workers=self._max_concurrent_requests) as executor:
+            futures = [
+                (block_id, payload, executor.submit(update_block, block_id, payload))
+                for block_id, payload in updates
+            ]
+            for block_id, payload, future in futures:
+                try:
+                    future.result()
+                except Exception as exc:
+                    record_update_outcome(report, block_id, payload, exc)
+                else:
+                    record_update_outcome(report, block_id, payload, None)
+
+    def _append_blocks(
+        self,
+        parent_id: str,
+        blocks: List[Block],
+        *,
+        after: Optional[str] = None,
+    ) -> List[str]:
+        """Append ``blocks`` under ``parent_id`` as planned by :func:`plan_append_requests`.
+
+        With ``after``, the blocks are inserted after that sibling instead of
+        at the end. Deferred nested children are appended under their created
+        parent. Returns the IDs of the created top-level blocks in order.
+        """
+
+        created_ids: List[str] = []
+        for request in plan_append_requests(blocks):
+            ids = self._append_request(parent_id, request, after=after)
+            if after:
+                after = ids[-1]
+            created_ids.extend(ids)
+        return created_ids
+
+    def _append_journaled(
+        self, page_id: str, blocks: List[Block], journal: WriteJournal
+    ) -> List[str]:
+        """Like :meth:`_append_blocks`, recording each confirmed request in ``journal``."""
+
+        created_ids: List[str] = []
+        for request in plan_append_requests(blocks):
+            ids = self._append_request(page_id, request)
+            journal.record_request(ids, request.source_blocks)
+            created_ids.extend(ids)
+        return created_ids
+
+    def _append_request(
+        self,
+        parent_id: str,
+        request: AppendRequest,
+        *,
+        after: Optional[str] = None,
+    ) -> List[str]:
+        """Send one planned append request and its deferred nested children."""
+
+        kwargs: Dict[str, object] = {"block_id": parent_id, "children": request.children}
+        if after:
+            kwargs["after"] = after
+        response = self._client.blocks.children.append(**kwargs)
+        ids = created_block_ids(request, response, after=after)
+        for index, nested in request.deferred.items():
+            self._append_blocks(ids[index], nested)
+        return ids
+
+    def _update_block(self, block_id: str, payload: Dict[str, object]) -> None:
+        self._client.blocks.update(block_id=block_id, **payload)
 
     def _fetch_block_children(self, block_id: str) -> List[Block]:
         results: List[Block] = []
@@ -119,41 +571,137 @@ class NotionService:
             cursor = response.get("next_cursor")
         return results
 
-    def _blocks_to_markdown(
-        self, blocks: Iterable[Block], output: List[str], indent: int
+    def _fetch_block_tree(self, root_id: str) -> BlockTree:
+        """Fetch every descendant of ``root_id`` level by level.
+
+        Sibling subtrees on the same level are listed concurrently (bounded by
+        ``max_concurrent_requests``), so latency grows with the depth of the
+        tree rather than with the number of blocks that have children. The
+        result maps each parent ID to its children in document order.
+        """
+
+        tree: BlockTree = {}
+        level: List[str] = [root_id]
+        fetch_children = bind_request_tracking(self._fetch_block_children)
+        with ThreadPoolExecutor(max_workers=self._max_concurrent_requests) as executor:
+            while level:
+                level = collect_children_level(tree, level, executor.map(fetch_children, level))
+        return tree
+
+
+class PageWriterBase:
+    """State shared by the thread and asyncio streaming page writers.
+
+    Holds the blocks queued for appending, the IDs created so far and the
+    report of the archive step, and knows which updates undo the write.
+    """
+
+    def __init__(
+        self, page_id: str, snapshot: PageSnapshot, journal: Optional[WriteJournal]
+    ) -> None:
+        self._page_id = page_id
+        self._snapshot = snapshot
+        self._journal = journal
+        self._pending: List[Block] = []
+        self._created: List[str] = []
+        self._report: Optional[ArchiveReport] = None
+
+    def _take_pending(self) -> List[Block]:
+        chunk = self._pending[:]
+        del self._pending[:]
+        return chunk
+
+    def _rollback_updates(self) -> BlockUpdates:
+        archived = self._report.archived if self._report is not None else []
+        return [(created, {"archived": True}) for created in self._created] + [
+            (original, {"archived": False}) for original in archived
+        ]
+
+
+class StreamingPageWriter(PageWriterBase):
+    """Replace-mode page write fed with blocks while they are being generated.
+
+    The first :meth:`write` archives the snapshot's replaceable blocks, so a
+    generation that produces nothing leaves the page untouched. Blocks are
+    then appended in order by a background thread; each round takes
+    everything queued so far and packs it into as few append requests as
+    the API limits allow, so appends keep pace with generation without one
+    request per block. :meth:`close` waits for the
+    remaining appends; :meth:`rollback` undoes a write that cannot finish.
+    """
+
+    def __init__(
+        self,
+        service: NotionService,
+        page_id: str,
+        snapshot: PageSnapshot,
+        journal: Optional[WriteJournal] = None,
     ) -> None:
-        indent_str = "  " * indent
-        for block in blocks:
-            block_type = block.get("type")
-            data = block.get(block_type, {})
-            rich_text = data.get("rich_text", [])
-            content = extract_plain_text(rich_text).strip()
-
-            if block_type in {"paragraph", "quote"}:
-                if content:
-                    prefix = "> " if block_type == "quote" else ""
-                    output.append(f"{indent_str}{prefix}{content}")
-            elif block_type in {"heading_1", "heading_2", "heading_3"}:
-                level = int(block_type[-1])
-                output.append(f"{indent_str}{'#' * level} {content}")
-            elif block_type == "bulleted_list_item":
-                output.append(f"{indent_str}- {content}")
-            elif block_type == "numbered_list_item":
-                output.append(f"{indent_str}1. {content}")
-            elif block_type == "to_do":
-                checked = data.get("checked", False)
-                checkbox = "x" if checked else " "
-                output.append(f"{indent_str}- [{checkbox}] {content}")
-            elif block_type == "callout":
-                output.append(f"{indent_str}💡 {content}")
-            elif block_type == "code":
-                language = data.get("language", "plain text")
-                output.append(f"{indent_str}```{language}")
-                output.append(content)
-                output.append(f"{indent_str}```")
-            elif block_type == "divider":
-                output.append(f"{indent_str}---")
-
-            if block.get("has_children"):
-                children = self._fetch_block_children(block["id"])
-                self._blocks_to_markdown(children, output, indent + 1)
+        super().__init__(page_id, snapshot, journal)
+        self._service = service
+        self._error: Optional[BaseException] = None
+        self._closing = False
+        self._cancelled = False
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self, blocks: Iterable[Block]) -> None:
+        blocks = list(blocks)
+        if not blocks:
+            return
+        with self._condition:
+            if self._error is not None:
+                raise self._error
+            self._pending.extend(blocks)
+            self._condition.notify()
+        if self._thread is None:
+            self._thread = threading.Thread(target=bind_request_tracking(self._run), daemon=True)
+            self._thread.start()
+
+    def close(self) -> ArchiveReport:
+        with self._condition:
+            self._closing = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._report or ArchiveReport()
+
+    def rollback(self) -> ArchiveReport:
+        """Archive the appended blocks and restore the archived ones.
+
+        Best effort: the returned report lists the updates that failed.
+        """
+
+        with self._condition:
+            self._cancelled = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        report = ArchiveReport()
+        self._service._apply_block_updates(report, self._rollback_updates())
+        return report
+
+    def _run(self) -> None:
+        try:
+            self._report = self._service._archive_existing_children(self._snapshot)
+            if not self._report.ok:
+                raise archive_failure(self._report)
+            while True:
+                with self._condition:
+                    while not self._pending and not self._closing and not self._cancelled:
+                        self._condition.wait()
+                    if self._cancelled or not self._pending:
+                        return
+                    chunk = self._take_pending()
+                started = time.perf_counter()
+                if self._journal is None:
+                    created = self._service._append_blocks(self._page_id, chunk)
+                else:
+                    created = self._service._append_journaled(self._page_id, chunk, self._journal)
+                self._created.extend(created)
+                self._report.append_seconds += time.perf_counter() - started
+        except BaseException as exc:
+            with self._condition:
+                self._error = exc
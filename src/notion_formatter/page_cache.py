@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Optional
+
+from .storage import DiskLRU
+
+DEFAULT_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+DEFAULT_MAX_BYTES = 10_000_000
+
+# Bump when ``PageSnapshot.to_markdown`` output changes, so entries rendered
+# by an older version are not served.
+_MARKDOWN_VERSION = 2
+
+
+class PageMarkdownCache:
+    """On-disk cache of rendered page Markdown keyed by Notion page ID.
+
+    Each entry remembers the page's ``last_edited_time``; an entry is only
+    served when the caller presents the same timestamp, so a single
+    ``pages.retrieve`` call is enough to validate it. Entries unused for
+    ``max_age_seconds`` are dropped, and the least recently used entries are
+    evicted once the directory grows beyond ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str],
+        *,
+        max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self._entries = DiskLRU(directory, max_age_seconds=max_age_seconds, max_bytes=max_bytes)
+
+    @property
+    def directory(self) -> Path:
+        return self._entries.directory
+
+    def get(self, page_id: str, last_edited_time: str) -> Optional[str]:
+        entry = self._entries.get(_entry_name(page_id))
+        if entry is None:
+            return None
+        if entry.get("last_edited_time") != last_edited_time:
+            return None
+        if entry.get("version") != _MARKDOWN_VERSION:
+            return None
+        markdown = entry.get("markdown")
+        return markdown if isinstance(markdown, str) else None
+
+    def put(self, page_id: str, last_edited_time: str, markdown: str) -> None:
+        entry = {
+            "version": _MARKDOWN_VERSION,
+            "page_id": page_id,
+            "last_edited_time": last_edited_time,
+            "markdown": markdown,
+        }
+        self._entries.put(_entry_name(page_id), entry)
+
+
+def _entry_name(page_id: str) -> str:
+    return page_id.replace("-", "").lower()
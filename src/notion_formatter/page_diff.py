@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+from .append_planner import fit_block, fit_rich_text
+from .page_snapshot import Block, PageSnapshot
+
+UPDATABLE_BLOCK_TYPES = {
+    "paragraph",
+    "heading_1",
+    "heading_2",
+    "heading_3",
+    "bulleted_list_item",
+    "numbered_list_item",
+    "to_do",
+    "quote",
+    "callout",
+    "code",
+}
+
+BlockSignature = Tuple[object, ...]
+
+
+@dataclass(frozen=True)
+class BlockUpdate:
+    block_id: str
+    block: Block
+
+
+@dataclass(frozen=True)
+class BlockInsert:
+    """Blocks to append after ``after_block_id``.
+
+    ``after_insert`` refers to an earlier insert in the plan when the anchor
+    is a block that does not exist yet; its last created block becomes the
+    anchor once that insert has been sent.
+    """
+
+    blocks: List[Block]
+    after_block_id: Optional[str] = None
+    after_insert: Optional[int] = None
+
+
+@dataclass
+class DiffPlan:
+    updates: List[BlockUpdate] = field(default_factory=list)
+    inserts: List[BlockInsert] = field(default_factory=list)
+    archives: List[str] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.updates or self.inserts or self.archives)
+
+
+def _rich_text_signature(rich_text: object) -> Tuple[Tuple[str, str], ...]:
+    if not isinstance(rich_text, list):
+        return ()
+    fragments: List[Tuple[str, str]] = []
+    for fragment in rich_text:
+        if not isinstance(fragment, dict):
+            continue
+        text = fragment.get("plain_text")
+        if text is None:
+            text_data = fragment.get("text")
+            text = text_data.get("content", "") if isinstance(text_data, dict) else ""
+        annotations = fragment.get("annotations")
+        color = "default"
+        if isinstance(annotations, dict):
+            color = str(annotations.get("color", "default"))
+        fragments.append((str(text), color))
+    return tuple(fragments)
+
+
+def block_signature(block: Block, snapshot: Optional[PageSnapshot] = None) -> BlockSignature:
+    """Key used to match blocks: type, text with colours, and nested children.
+
+    Tables add their width and header flags, and table rows their cells.
+
+    Existing blocks take their children from ``snapshot``; generated blocks
+    carry them inline under ``<type>.children``.
+    """
+
+    block_type = str(block.get("type"))
+    data = block.get(block_type)
+    if not isinstance(data, dict):
+        data = {}
+
+    extra: Tuple[object, ...] = ()
+    if block_type == "to_do":
+        extra = (bool(data.get("checked", False)),)
+    elif block_type == "code":
+        extra = (str(data.get("language", "plain text")),)
+    elif block_type == "table":
+        extra = (
+            data.get("table_width"),
+            bool(data.get("has_column_header", False)),
+            bool(data.get("has_row_header", False)),
+        )
+    elif block_type == "table_row":
+        cells = data.get("cells")
+        extra = tuple(_rich_text_signature(cell) for cell in cells) if isinstance(cells, list) else ()
+
+    children: List[Block] = []
+    block_id = block.get("id")
+    if snapshot is not None and block.get("has_children") and isinstance(block_id, str):
+        children = snapshot.children(block_id)
+    elif isinstance(data.get("children"), list):
+        children = data["children"]
+
+    return (
+        block_type,
+        _rich_text_signature(data.get("rich_text")),
+        extra,
+        tuple(block_signature(child, snapshot) for child in children),
+    )
+
+
+def _can_update_in_place(existing: Block, new: Block) -> bool:
+    block_type = existing.get("type")
+    if block_type != new.get("type") or block_type not in UPDATABLE_BLOCK_TYPES:
+        return False
+    new_data = new.get(str(block_type))
+    new_has_children = isinstance(new_data, dict) and bool(new_data.get("children"))
+    return not existing.get("has_children") and not new_has_children
+
+
+def plan_page_diff(
+    existing: List[Block],
+    new_blocks: List[Block],
+    *,
+    snapshot: PageSnapshot,
+    initial_anchor: Optional[str],
+) -> DiffPlan:
+    """Plan the writes that turn ``existing`` into ``new_blocks``.
+
+    ``existing`` are the page's replaceable top-level blocks in order and
+    ``initial_anchor`` is the block right before the first of them (``None``
+    appends at the end of the page). ``new_blocks`` are compared as
+    :func:`fit_block` will write them, so a block that overflows into
+    continuation blocks matches those on the page and is never updated in
+    place with more rich text than one block can hold. Matching uses a
+    sequence diff over :func:`block_signature`; changed blocks of the same
+    type are updated in place, everything else is archived or inserted.
+    """
+
+    plan = DiffPlan()
+    new_blocks = _fitted(new_blocks)
+    old_keys = [block_signature(block, snapshot) for block in existing]
+    new_keys = [block_signature(block) for block in new_blocks]
+    matcher = SequenceMatcher(None, old_keys, new_keys, autojunk=False)
+
+    anchor_id: Optional[str] = initial_anchor
+    anchor_insert: Optional[int] = None
+    pending: List[Block] = []
+
+    def flush_pending() -> None:
+        nonlocal anchor_id, anchor_insert, pending
+        if not pending:
+            return
+        plan.inserts.append(
+            BlockInsert(
+                blocks=pending,
+                after_block_id=anchor_id if anchor_insert is None else None,
+                after_insert=anchor_insert,
+            )
+        )
+        anchor_id = None
+        anchor_insert = len(plan.inserts) - 1
+        pending = []
+
+    def keep(block: Block) -> None:
+        nonlocal anchor_id, anchor_insert
+        flush_pending()
+        anchor_id = str(block.get("id"))
+        anchor_insert = None
+
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            for block in existing[i1:i2]:
+                keep(block)
+            continue
+
+        old_slice = existing[i1:i2]
+        new_slice = new_blocks[j1:j2]
+        paired = min(len(old_slice), len(new_slice)) if tag == "replace" else 0
+        for old_block, new_block in zip(old_slice[:paired], new_slice[:paired]):
+            if _can_update_in_place(old_block, new_block):
+                plan.updates.append(BlockUpdate(str(old_block.get("id")), new_block))
+                keep(old_block)
+            else:
+                plan.archives.append(str(old_block.get("id")))
+                pending.append(new_block)
+        for old_block in old_slice[paired:]:
+            plan.archives.append(str(old_block.get("id")))
+        pending.extend(new_slice[paired:])
+
+    flush_pending()
+    return plan
+
+
+def update_payload(block: Block) -> Dict[str, object]:
+    """Return the ``blocks.update`` keyword arguments for an in-place edit."""
+
+    block_type = str(block.get("type"))
+    data = fit_rich_text(block).get(block_type)
+    payload = dict(data) if isinstance(data, dict) else {}
+    payload.pop("children", None)
+    return {block_type: payload}
+
+
+def blocks_match(
+    existing: List[Block],
+    new_blocks: List[Block],
+    *,
+    snapshot: PageSnapshot,
+) -> bool:
+    """Return True if writing ``new_blocks`` over ``existing`` would change nothing."""
+
+    new_blocks = _fitted(new_blocks)
+    if len(existing) != len(new_blocks):
+        return False
+    return all(
+        block_signature(old, snapshot) == block_signature(new)
+        for old, new in zip(existing, new_blocks)
+    )
+
+
+def _fitted(blocks: List[Block]) -> List[Block]:
+    return [piece for block in blocks for piece in fit_block(block)]
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import itertools
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+RichText = List[Dict[str, object]]
+Block = Dict[str, object]
+BlockTree = Dict[str, List[Block]]
+
+PRESERVED_BLOCK_TYPES = {"button", "template_button"}
+PRESERVED_CALLOUT_PHRASES = ("解決したい課題", "要件定義レビュー")
+
+
+def page_key(page_id: str) -> str:
+    """Normalise a Notion page ID so dashed and undashed forms compare equal."""
+
+    return page_id.strip().replace("-", "").lower()
+
+
+def extract_plain_text(rich_text: Iterable[Dict[str, object]]) -> str:
+    # Generated blocks only carry ``text.content``; API responses add ``plain_text``.
+    parts: List[str] = []
+    for fragment in rich_text:
+        text = fragment.get("plain_text")
+        if text is None:
+            text_data = fragment.get("text")
+            text = text_data.get("content", "") if isinstance(text_data, dict) else ""
+        parts.append(str(text))
+    return "".join(parts)
+
+
+def is_preserved_block(block: Block) -> bool:
+    """Return True for buttons and the instruction callout, ignoring descendants."""
+
+    block_type = str(block.get("type"))
+    if block_type in PRESERVED_BLOCK_TYPES:
+        return True
+
+    if any(key in block for key in PRESERVED_BLOCK_TYPES):
+        return True
+
+    if block_type == "callout":
+        callout = block.get("callout", {})
+        rich_text = callout.get("rich_text", [])
+        text = extract_plain_text(rich_text)
+        if any(phrase in text for phrase in PRESERVED_CALLOUT_PHRASES):
+            return True
+
+    return False
+
+
+@dataclass
+class PageSnapshot:
+    """In-memory copy of a page's block tree, fetched once per run.
+
+    ``children_by_parent`` maps the page ID and every block with children to
+    its child blocks in document order. Parent links and the "contains a
+    preserved block" flag are computed once when the snapshot is built, so
+    Markdown rendering, preserve decisions and archiving do not have to go
+    back to the Notion API.
+    """
+
+    root_id: str
+    children_by_parent: BlockTree
+    parent_by_id: Dict[str, str] = field(default_factory=dict)
+    _contains_preserved: Dict[str, bool] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_tree(cls, root_id: str, tree: BlockTree) -> "PageSnapshot":
+        snapshot = cls(root_id=root_id, children_by_parent=tree)
+        for parent_id, children in tree.items():
+            for child in children:
+                child_id = child.get("id")
+                if isinstance(child_id, str):
+                    snapshot.parent_by_id[child_id] = parent_id
+        for block in tree.get(root_id, []):
+            snapshot._compute_contains_preserved(block, visiting=set())
+        return snapshot
+
+    @property
+    def top_level_blocks(self) -> List[Block]:
+        return self.children_by_parent.get(self.root_id, [])
+
+    def children(self, block_id: str) -> List[Block]:
+        return self.children_by_parent.get(block_id, [])
+
+    def parent_of(self, block_id: str) -> Optional[str]:
+        return self.parent_by_id.get(block_id)
+
+    def contains_preserved(self, block: Block) -> bool:
+        """Return True if ``block`` or any of its descendants must be kept."""
+
+        block_id = block.get("id")
+        if isinstance(block_id, str) and block_id in self._contains_preserved:
+            return self._contains_preserved[block_id]
+        return self._compute_contains_preserved(block, visiting=set())
+
+    def with_content(self, blocks: List[Block], *, keep: Iterable[str]) -> "PageSnapshot":
+        """Return the snapshot the page will have after a replace-mode write.
+
+        Top-level blocks whose IDs are in ``keep`` stay in place with their
+        subtrees and ``blocks`` (generated blocks carrying their children
+        inline) are appended after them under placeholder IDs.
+        """
+
+        keep_ids = set(keep)
+        tree: BlockTree = dict(self.children_by_parent)
+        placeholder_ids = itertools.count()
+
+        def adopt(block: Block) -> Block:
+            data = block.get(str(block.get("type")))
+            children = data.get("children") if isinstance(data, dict) else None
+            if not isinstance(children, list) or not children:
+                return block
+            block_id = f"pending-{next(placeholder_ids)}"
+            tree[block_id] = [adopt(child) for child in children]
+            return {**block, "id": block_id, "has_children": True}
+
+        top_level = [block for block in self.top_level_blocks if block.get("id") in keep_ids]
+        top_level.extend(adopt(block) for block in blocks)
+        tree[self.root_id] = top_level
+        return PageSnapshot.from_tree(self.root_id, tree)
+
+    def to_markdown(self) -> str:
+        lines: List[str] = []
+        self._blocks_to_markdown(self.top_level_blocks, lines, 0)
+        return "\n".join(lines).strip()
+
+    def _compute_contains_preserved(self, block: Block, *, visiting: Set[str]) -> bool:
+        block_id = block.get("id")
+        if not isinstance(block_id, str):
+            block_id = None
+        if block_id and block_id in self._contains_preserved:
+            return self._contains_preserved[block_id]
+        if block_id and block_id in visiting:
+            return False
+
+        result = is_preserved_block(block)
+        if block_id:
+            visiting.add(block_id)
+            for child in self.children(block_id):
+                # Evaluate every child so the whole subtree gets its flag.
+                if self._compute_contains_preserved(child, visiting=visiting):
+                    result = True
+            self._contains_preserved[block_id] = result
+        return result
+
+    def _blocks_to_markdown(
+        self, blocks: Iterable[Block], output: List[str], indent: int
+    ) -> None:
+        indent_str = "  " * indent
+        for block in blocks:
+            block_type = block.get("type")
+            data = block.get(block_type, {})
+            rich_text = data.get("rich_text", [])
+            content = extract_plain_text(rich_text).strip()
+
+            if block_type in {"paragraph", "quote"}:
+                if content:
+                    prefix = "> " if block_type == "quote" else ""
+                    output.append(f"{indent_str}{prefix}{content}")
+            elif block_type in {"heading_1", "heading_2", "heading_3"}:
+                level = int(block_type[-1])
+                output.append(f"{indent_str}{'#' * level} {content}")
+            elif block_type == "bulleted_list_item":
+                output.append(f"{indent_str}- {content}")
+            elif block_type == "numbered_list_item":
+                output.append(f"{indent_str}1. {content}")
+            elif block_type == "to_do":
+                checked = data.get("checked", False)
+                checkbox = "x" if checked else " "
+                output.append(f"{indent_str}- [{checkbox}] {content}")
+            elif block_type == "callout":
+                output.append(f"{indent_str}💡 {content}")
+            elif block_type == "code":
+                language = data.get("language", "plain text")
+                output.append(f"{indent_str}```{language}")
+                output.append(content)
+                output.append(f"{indent_str}```")
+            elif block_type == "divider":
+                output.append(f"{indent_str}---")
+            elif block_type == "table":
+                self._table_to_markdown(block, output, indent_str)
+                continue
+
+            if block.get("has_children"):
+                children = self.children(str(block.get("id")))
+                self._blocks_to_markdown(children, output, indent + 1)
+
+    def _table_to_markdown(self, block: Block, output: List[str], indent_str: str) -> None:
+        # Rows are the table's children; they are rendered here as one
+        # pipe table instead of being walked as nested blocks. Blank lines
+        # around it keep the next line from being read as another row.
+        rows = [
+            row.get("table_row", {}).get("cells", [])
+            for row in self.children(str(block.get("id")))
+            if row.get("type") == "table_row"
+        ]
+        if not rows:
+            return
+        width = max(len(cells) for cells in rows)
+        output.append("")
+        for index, cells in enumerate(rows):
+            texts = [_table_cell_text(cell) for cell in cells]
+            texts.extend("" for _ in range(width - len(cells)))
+            output.append(f"{indent_str}| {' | '.join(texts)} |")
+            if index == 0:
+                output.append(f"{indent_str}|{' --- |' * width}")
+        output.append("")
+
+
+def _table_cell_text(cell: Iterable[Dict[str, object]]) -> str:
+    text = extract_plain_text(cell).strip()
+    return text.replace("|", "\\|").replace("\n", " ")
@@ -1,12 +1,29 @@
 from __future__ import annotations
 
+import hashlib
 from dataclasses import dataclass
 
 
 @dataclass(frozen=True)
 class PromptPayload:
+    """System and user prompt for one formatting request.
+
+    The first ``static_prefix_length`` characters of ``user_prompt`` only
+    depend on the template, the guidelines and the settings; the draft comes
+    after them. Together with the system prompt they form the prefix that
+    OpenAI's prompt cache can reuse across pages and runs.
+    """
+
     system_prompt: str
     user_prompt: str
+    static_prefix_length: int = 0
+
+    @property
+    def prefix_fingerprint(self) -> str:
+        """Short hash of the cacheable prefix; equal values can share cached tokens."""
+
+        prefix = self.system_prompt + "\0" + self.user_prompt[: self.static_prefix_length]
+        return hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:16]
 
 
 def build_prompts(
@@ -33,7 +50,9 @@ def build_prompts(
         else ""
     )
 
-    user_prompt = f"""
+    # Everything up to the draft is byte-stable for a given template and
+    # guideline page, so it is kept first; the draft always comes last.
+    static_prefix = f"""
 あなたは営業担当者が作成した粗い要件定義ドラフトを整形し、レビュー観点から不足情報を洗い出すAIです。
 
 ## 出力要件
@@ -58,14 +77,136 @@ def build_prompts(
     - status_message: string (例: "{completion_phrase}" または改善が必要な理由)
 
 ## フォーマット基準（テンプレート）
-{template_markdown}
+{template_markdown.strip()}
 
 {review_block}
 
+ドラフトがテンプレートに対して不足している場合でも、分かっている情報は必ず残し、足りない情報はレビューセクションで補足してください。
+
 ## 現在のドラフト
-{page_markdown}
+""".lstrip()
 
-ドラフトがテンプレートに対して不足している場合でも、分かっている情報は必ず残し、足りない情報はレビューセクションで補足してください。
-"""
+    return PromptPayload(
+        system_prompt=system_prompt,
+        user_prompt=static_prefix + page_markdown.strip(),
+        static_prefix_length=len(static_prefix),
+    )
+
+
+def build_section_prompts(
+    *,
+    template_section: str,
+    draft_section: str,
+    draft_overview: str,
+    review_guidelines: str | None,
+    review_section_heading: str,
+) -> PromptPayload:
+    """Prompts for formatting one heading-aligned section of a large draft."""
+
+    system_prompt = (
+        "You are an assistant that reformats one section of a requirement definition document for a sales team.\n"
+        "Follow the template section strictly, keep terminology in Japanese when provided, and make it easy to read.\n"
+        f"Do not write the '{review_section_heading}' section; report review findings in the JSON fields instead.\n"
+        "Always return valid JSON matching the schema described in the user message."
+    )
+
+    review_block = (
+        f"\n## レビュー観点ガイドライン\n{review_guidelines.strip()}"
+        if review_guidelines and review_guidelines.strip()
+        else ""
+    )
 
-    return PromptPayload(system_prompt=system_prompt, user_prompt=user_prompt.strip())
+    static_prefix = f"""
+あなたは大きな要件定義ドラフトの1セクションだけを整形し、レビュー観点から不足情報を洗い出すAIです。
+
+## 出力要件
+- JSONオブジェクトを返却してください。
+- プロパティ定義:
+  - formatted_markdown: string
+    - Markdown形式。テンプレートのセクション見出しから始め、このセクションの本文だけを含める。
+    - 「{review_section_heading}」セクションや他のセクションの見出しは出力しないこと。
+    - 内容が不足している場合は、本文や箇条書きの直後に "`- 未記入。🔴 レビュー: 質問文（例: 選択肢A / 選択肢B / 選択肢C）`" の形式で追記すること。
+    - 既に情報がある場合でも補足が必要なら、既存の記述を残しつつ次行に `🔴 レビュー: ...` を追加して改善案を示すこと。
+  - findings: object
+    - missing: string[] (不足している項目)
+    - needs_improvement: string[] (改善が必要な項目)
+    - adequate: string[] (適切に記載されている項目)
+
+## フォーマット基準（テンプレートの該当セクション）
+{template_section.strip()}
+
+{review_block}
+
+ドラフトに対応する記述がない場合でも、分かっている情報は必ず残し、足りない情報は findings に記載してください。
+
+## ドラフト冒頭の要望（参考）
+""".lstrip()
+
+    user_prompt = (
+        static_prefix
+        + (draft_overview.strip() or "（なし）")
+        + "\n\n## 整形対象のドラフト\n"
+        + (draft_section.strip() or "（記載なし）")
+    )
+    return PromptPayload(
+        system_prompt=system_prompt,
+        user_prompt=user_prompt,
+        static_prefix_length=len(static_prefix),
+    )
+
+
+def build_review_prompts(
+    *,
+    findings_json: str,
+    previous_review: str | None,
+    review_guidelines: str | None,
+    review_section_heading: str,
+    completion_phrase: str,
+) -> PromptPayload:
+    """Prompts for the reduce step that writes the review section from section findings."""
+
+    system_prompt = (
+        "You are an assistant that writes the review section of a requirement definition document.\n"
+        f"Merge per-section findings into one '{review_section_heading}' section in concise, direct Japanese.\n"
+        "Always return valid JSON matching the schema described in the user message."
+    )
+
+    review_block = (
+        f"\n## レビュー観点ガイドライン\n{review_guidelines.strip()}"
+        if review_guidelines and review_guidelines.strip()
+        else ""
+    )
+
+    static_prefix = f"""
+各セクションの整形時に集めたレビュー所見から、ドキュメント末尾のAIレビューセクションを作成してください。
+
+## 出力要件
+- JSONオブジェクトを返却してください。
+- プロパティ定義:
+  - formatted_markdown: string
+    - `## {review_section_heading}` から始まるAIレビューセクションだけをMarkdown形式で含める。
+    - 以下の順番の小見出しを含めること:
+      1. ❌ 不足している項目
+      2. ⚠️ 改善が必要な項目
+      3. ✅ 適切に記載されている項目
+      4. 🎉 完璧です (不足なしの場合のみ1行で記載)
+    - 重複する所見はまとめ、どのセクションの所見か分かるように書くこと。
+    - ❌ もしくは ⚠️ の項目が1つでもある場合は、`🎉 完璧です` セクションを出力しないこと。
+    - 各レビューヘッダーの下に内容がない場合は、そのヘッダーごと省略すること。
+  - completion_summary: object
+    - is_complete: boolean
+    - status_message: string (例: "{completion_phrase}" または改善が必要な理由)
+
+{review_block}
+
+## セクションごとの所見（JSON）
+""".lstrip()
+
+    user_prompt = static_prefix + findings_json
+    if previous_review and previous_review.strip():
+        user_prompt += "\n\n## 前回のAIレビュー結果（参考）\n" + previous_review.strip()
+    return PromptPayload(
+        system_prompt=system_prompt,
+        user_prompt=user_prompt,
+        static_prefix_length=len(static_prefix),
+    )
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import asyncio
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+NOTION_REQUESTS_PER_SECOND = 3.0
+
+_ID_SEGMENT = re.compile(r"^[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}$")
+
+
+class RateLimiter:
+    """Token bucket shared by threads and asyncio tasks.
+
+    Tokens refill continuously at ``rate_per_second`` up to ``burst``; each
+    ``acquire`` call takes one token, sleeping until one is available.
+    ``pause`` empties the bucket for a while, which is how a ``Retry-After``
+    from one caller slows down every other caller as well.
+    """
+
+    def __init__(self, rate_per_second: float, *, burst: Optional[int] = None) -> None:
+        if rate_per_second <= 0:
+            raise ValueError("rate_per_second must be positive")
+        self._rate = rate_per_second
+        self._capacity = float(burst if burst is not None else max(1, int(rate_per_second)))
+        self._tokens = self._capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def rate_per_second(self) -> float:
+        return self._rate
+
+    def acquire(self) -> None:
+        while True:
+            delay = self._try_acquire()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    async def acquire_async(self) -> None:
+        while True:
+            delay = self._try_acquire()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for ``seconds`` (e.g. after a 429)."""
+
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+    def _try_acquire(self) -> float:
+        """Take a token if one is available, otherwise return the wait time."""
+
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            elapsed = max(0.0, now - max(self._updated_at, self._paused_until))
+            self._updated_at = now
+            self._tokens = min(self._capacity, self._tokens + elapsed * self._rate)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self._rate
+
+
+class RequestStats:
+    """Thread-safe counters for API requests made through a throttled client."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._by_endpoint: Counter[str] = Counter()
+        self._throttled = 0
+        self._retried = 0
+        self._failed = 0
+
+    def record_request(self, method: str, path: str) -> None:
+        with self._lock:
+            self._by_endpoint[endpoint_key(method, path)] += 1
+
+    def record_retry(self, *, throttled: bool) -> None:
+        with self._lock:
+            self._retried += 1
+            if throttled:
+                self._throttled += 1
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failed += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "requests": sum(self._by_endpoint.values()),
+                "by_endpoint": dict(self._by_endpoint),
+                "throttled": self._throttled,
+                "retried": self._retried,
+                "failed": self._failed,
+            }
+
+
+_tracked_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "notion_formatter_tracked_stats", default=None
+)
+
+
+@contextmanager
+def track_requests() -> Iterator[RequestStats]:
+    """Count the requests made within this context on a separate ``RequestStats``.
+
+    Services keep their own totals; this one only sees the requests issued
+    from the current context, so concurrent pipeline runs sharing a service
+    are counted apart. Asyncio tasks inherit the context automatically;
+    work handed to threads must be wrapped with :func:`bind_request_tracking`.
+    """
+
+    stats = RequestStats()
+    token = _tracked_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _tracked_stats.reset(token)
+
+
+def bind_request_tracking(function: Callable[..., T]) -> Callable[..., T]:
+    """Wrap ``function`` so it records into the caller's tracker in any thread."""
+
+    stats = _tracked_stats.get()
+    if stats is None:
+        return function
+
+    def bound(*args: object, **kwargs: object) -> T:
+        token = _tracked_stats.set(stats)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _tracked_stats.reset(token)
+
+    return bound
+
+
+def recording_stats(stats: RequestStats) -> Tuple[RequestStats, ...]:
+    """``stats`` plus the current context's tracker, if there is one."""
+
+    tracked = _tracked_stats.get()
+    return (stats,) if tracked is None or tracked is stats else (stats, tracked)
+
+
+def endpoint_key(method: str, path: str) -> str:
+    """Collapse IDs in an API path, e.g. ``PATCH blocks/{id}/children``."""
+
+    segments = [
+        "{id}" if _ID_SEGMENT.match(segment) else segment
+        for segment in path.strip("/").split("/")
+    ]
+    return f"{method.upper()} {'/'.join(segments)}"
+
+
+_shared_limiters: Dict[float, RateLimiter] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_rate_limiter(rate_per_second: float = NOTION_REQUESTS_PER_SECOND) -> RateLimiter:
+    """Return the process-wide limiter for ``rate_per_second``.
+
+    Every Notion client created with the same rate shares one bucket, so
+    concurrent fetches, archives and appends stay within the limit together.
+    """
+
+    with _shared_lock:
+        limiter = _shared_limiters.get(rate_per_second)
+        if limiter is None:
+            limiter = RateLimiter(rate_per_second)
+            _shared_limiters[rate_per_second] = limiter
+        return limiter
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+from .ai_client import AIResult
+from .prompt_builder import PromptPayload
+from .storage import DiskLRU
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 500
+
+# Bump when the stored result format or its parsing changes.
+_KEY_VERSION = "1"
+
+
+def result_cache_key(model: str, prompts: PromptPayload) -> str:
+    """Hash of everything the model sees: model name, system and user prompt."""
+
+    payload = json.dumps(
+        [_KEY_VERSION, model, prompts.system_prompt, prompts.user_prompt],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AIResultCache:
+    """On-disk cache of parsed AI results keyed by :func:`result_cache_key`.
+
+    Identical inputs (a review button pressed twice, an automation firing on
+    an unrelated property edit) are answered from disk instead of paying for
+    another completion. Entries expire ``ttl_seconds`` after they were last
+    used and the least recently used ones are evicted beyond ``max_entries``.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str],
+        *,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ) -> None:
+        self._entries = DiskLRU(directory, max_age_seconds=ttl_seconds, max_entries=max_entries)
+
+    @property
+    def directory(self) -> Path:
+        return self._entries.directory
+
+    def get(self, model: str, prompts: PromptPayload) -> Optional[AIResult]:
+        key = result_cache_key(model, prompts)
+        entry = self._entries.get(key)
+        if entry is None or entry.get("key") != key:
+            return None
+        result = entry.get("result")
+        if not isinstance(result, dict) or not isinstance(result.get("formatted_markdown"), str):
+            return None
+        return AIResult(
+            formatted_markdown=result["formatted_markdown"],
+            is_complete=bool(result.get("is_complete")),
+            completion_message=str(result.get("completion_message", "")),
+        )
+
+    def put(self, model: str, prompts: PromptPayload, result: AIResult) -> None:
+        key = result_cache_key(model, prompts)
+        entry = {
+            "key": key,
+            "result": {
+                "formatted_markdown": result.formatted_markdown,
+                "is_complete": result.is_complete,
+                "completion_message": result.completion_message,
+            },
+        }
+        self._entries.put(key, entry)
@@ -1,12 +1,44 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING, Any, Awaitable, Dict, List, Optional, Tuple
 
-from .ai_client import AIFormatter, AIResult
+from .ai_client import AIFormatter, AIResult, AsyncAIFormatter, TokenUsage
+from .async_notion_service import AsyncNotionService
 from .config import ConfigurationError, Settings, load_settings
-from .markdown_converter import markdown_to_blocks
-from .notion_service import NotionService
-from .prompt_builder import build_prompts
+from .instrumentation import StageTimer
+from .large_document import async_format_large_document, format_large_document, is_large_document
+from .markdown_converter import StreamingMarkdownConverter, convert_markdown
+from .model_router import ModelRoute
+from .async_notion_service import AsyncStreamingPageWriter
+from .notion_service import (
+    ArchiveReport,
+    NotionService,
+    StreamingPageWriter,
+    split_replaceable_blocks,
+)
+from .page_cache import PageMarkdownCache
+from .page_diff import blocks_match
+from .page_snapshot import Block, PageSnapshot, page_key
+from .prompt_builder import PromptPayload, build_prompts
+from .rate_limiter import bind_request_tracking, track_requests
+from .result_cache import AIResultCache
+from .write_journal import WriteJournal
+
+if TYPE_CHECKING:
+    import httpx
+
+    from .cassette import Cassette
+
+# Replayed Notion responses come from memory; pacing them would only slow
+# the run down.
+REPLAY_REQUESTS_PER_SECOND = 10_000.0
 
 
 @dataclass(frozen=True)
@@ -17,65 +49,965 @@ class PipelineResult:
     is_complete: bool
     completion_message: str
     block_count: int
+    ai_cache_hit: bool = False
+    page_rewritten: bool = True
+    usage: Optional[TokenUsage] = None
+    prompt_prefix_fingerprint: Optional[str] = None
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+    notion_requests: Dict[str, Any] = field(default_factory=dict)
+    model_routes: Tuple[ModelRoute, ...] = ()
+    resumed: bool = False
+
+    def to_payload(self) -> Dict[str, Any]:
+        """Return the JSON payload printed by ``--json`` and batch reports."""
+
+        usage = self.usage
+        requests = self.notion_requests
+        return {
+            "page_id": self.page_id,
+            "template_page_id": self.template_page_id,
+            "review_page_id": self.review_page_id,
+            "is_complete": self.is_complete,
+            "completion_message": self.completion_message,
+            "updated_block_count": self.block_count,
+            "ai_cache_hit": self.ai_cache_hit,
+            "page_rewritten": self.page_rewritten,
+            "prompt_prefix_fingerprint": self.prompt_prefix_fingerprint,
+            "prompt_tokens": usage.prompt_tokens if usage else None,
+            "cached_tokens": usage.cached_tokens if usage else None,
+            "completion_tokens": usage.completion_tokens if usage else None,
+            "total_tokens": usage.total_tokens if usage else None,
+            "cached_token_ratio": round(usage.cached_ratio, 4) if usage else None,
+            "stage_seconds": dict(self.stage_seconds),
+            "notion_requests": requests.get("requests", 0),
+            "notion_requests_by_endpoint": dict(requests.get("by_endpoint", {})),
+            "notion_retries": requests.get("retried", 0),
+            "notion_throttled": requests.get("throttled", 0),
+            "ai_models": [route.to_payload() for route in self.model_routes],
+            "resumed": self.resumed,
+        }
 
 
 class PipelineError(RuntimeError):
     """Raised when the pipeline cannot complete successfully."""
 
 
-def run_pipeline(page_id: str, template_page_id: str | None = None) -> PipelineResult:
+class PipelineContext:
+    """Settings and warm clients shared by every pipeline run in a process.
+
+    The template and review guideline pages are memoised for
+    ``static_page_ttl_seconds`` so concurrent runs (batch mode) fetch them
+    once; concurrent callers wait for the first fetch instead of repeating it.
+    Runs on the same page are serialised with :meth:`page_lock` so two
+    writers never archive each other's blocks.
+    """
+
+    def __init__(
+        self,
+        settings: Settings,
+        *,
+        notion: Optional[NotionService] = None,
+        ai_formatter: Optional[AIFormatter] = None,
+        static_page_ttl_seconds: float = 300.0,
+        cassette: Optional[Cassette] = None,
+    ) -> None:
+        transport = None
+        if cassette is not None:
+            settings = _cassette_settings(settings, cassette)
+            transport = cassette.transport()
+        self.settings = settings
+        self.notion = notion or _create_notion_service(settings, transport=transport)
+        self.ai_formatter = ai_formatter or AIFormatter(
+            settings, result_cache=_create_result_cache(settings), transport=transport
+        )
+        self._static_page_ttl_seconds = static_page_ttl_seconds
+        self._static_pages: Dict[str, Tuple[float, Future[str]]] = {}
+        self._page_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, *, cassette: Optional[Cassette] = None) -> "PipelineContext":
+        try:
+            settings = load_settings()
+        except ConfigurationError as exc:
+            raise PipelineError(str(exc)) from exc
+        return cls(settings, cassette=cassette)
+
+    def page_lock(self, page_id: str) -> threading.Lock:
+        """The lock held by ``run_pipeline`` while it reads and rewrites ``page_id``."""
+
+        with self._lock:
+            return self._page_locks.setdefault(page_key(page_id), threading.Lock())
+
+    def fetch_static_markdown(self, page_id: str) -> str:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._static_pages.get(page_id)
+            reuse = (
+                entry is not None
+                and now - entry[0] <= self._static_page_ttl_seconds
+                and not (entry[1].done() and entry[1].exception() is not None)
+            )
+            if reuse:
+                future = entry[1]  # type: ignore[index]
+            else:
+                future = Future()
+                self._static_pages[page_id] = (now, future)
+
+        if not reuse:
+            try:
+                future.set_result(self.notion.fetch_page_markdown(page_id, use_cache=True))
+            except BaseException as exc:
+                future.set_exception(exc)
+        return future.result()
+
+
+def _cassette_settings(settings: Settings, cassette: Cassette) -> Settings:
+    # Disk caches would skip requests on one run and not the next, so
+    # recorded and replayed runs always go through the cassette.
+    settings = replace(settings, cache_dir=None)
+    if cassette.replaying:
+        settings = replace(settings, notion_requests_per_second=REPLAY_REQUESTS_PER_SECOND)
+    return settings
+
+
+def _create_page_cache(settings: Settings) -> Optional[PageMarkdownCache]:
+    if not settings.cache_dir:
+        return None
+    return PageMarkdownCache(
+        os.path.join(settings.cache_dir, "pages"),
+        max_age_seconds=settings.page_cache_max_age_days * 24 * 60 * 60,
+        max_bytes=settings.page_cache_max_bytes,
+    )
+
+
+def _create_result_cache(settings: Settings) -> Optional[AIResultCache]:
+    if not settings.cache_dir or settings.ai_result_cache_ttl_hours <= 0:
+        return None
+    return AIResultCache(
+        os.path.join(settings.cache_dir, "ai-results"),
+        ttl_seconds=settings.ai_result_cache_ttl_hours * 60 * 60,
+        max_entries=settings.ai_result_cache_max_entries,
+    )
+
+
+def _create_notion_service(
+    settings: Settings, *, transport: Optional["httpx.BaseTransport"] = None
+) -> NotionService:
+    return NotionService(
+        settings.notion_api_key,
+        max_concurrent_requests=settings.notion_max_concurrency,
+        page_cache=_create_page_cache(settings),
+        retry_limit=settings.retry_limit,
+        requests_per_second=settings.notion_requests_per_second,
+        base_url=settings.notion_base_url,
+        transport=transport,
+    )
+
+
+@dataclass(frozen=True)
+class _Sources:
+    """The inputs of one run once the pages are fetched, and what follows from them."""
+
+    page_id: str
+    template_id: str
+    template_markdown: str
+    review_markdown: Optional[str]
+    snapshot: PageSnapshot
+    draft_markdown: str
+    prompts: PromptPayload
+    existing: List[Block]
+    preserved: List[str]
+
+
+def _prepare_sources(
+    settings: Settings,
+    *,
+    page_id: str,
+    template_id: str,
+    template_markdown: str,
+    snapshot: PageSnapshot,
+    review_markdown: Optional[str],
+) -> _Sources:
+    draft_markdown = snapshot.to_markdown()
+    existing, preserved, _ = split_replaceable_blocks(snapshot)
+    return _Sources(
+        page_id=page_id,
+        template_id=template_id,
+        template_markdown=template_markdown,
+        review_markdown=review_markdown,
+        snapshot=snapshot,
+        draft_markdown=draft_markdown,
+        prompts=_build_page_prompts(
+            settings,
+            template_markdown=template_markdown,
+            page_markdown=draft_markdown,
+            review_markdown=review_markdown,
+        ),
+        existing=existing,
+        preserved=preserved,
+    )
+
+
+def _prefetch_sources(
+    context: PipelineContext,
+    *,
+    template_id: str,
+    page_id: str,
+    review_page_id: Optional[str],
+) -> Tuple[str, PageSnapshot, Optional[str]]:
+    """Fetch the template, draft and review guideline pages concurrently.
+
+    The draft is returned as a snapshot so the same block tree can be reused
+    when the page is rewritten.
+
+    The first failure is re-raised as soon as it happens; fetches that have not
+    started yet are cancelled instead of being waited for.
+    """
+
+    executor = ThreadPoolExecutor(max_workers=3)
+    try:
+        fetch_static_markdown = bind_request_tracking(context.fetch_static_markdown)
+        template_future = executor.submit(fetch_static_markdown, template_id)
+        draft_future = executor.submit(
+            bind_request_tracking(context.notion.fetch_page_snapshot), page_id
+        )
+        review_future: Optional[Future[str]] = None
+        if review_page_id:
+            review_future = executor.submit(fetch_static_markdown, review_page_id)
+
+        futures: List[Future[Any]] = [template_future, draft_future]
+        if review_future is not None:
+            futures.append(review_future)
+        done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in done:
+            future.result()  # re-raises the failure that ended the wait
+
+        review_markdown = review_future.result() if review_future else None
+        return template_future.result(), draft_future.result(), review_markdown
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_pipeline(
+    page_id: str,
+    template_page_id: str | None = None,
+    *,
+    context: Optional[PipelineContext] = None,
+) -> PipelineResult:
+    """Format one page and report stage timings and the Notion requests it made."""
+
+    timer = StageTimer()
+    page_lock = context.page_lock(page_id) if context is not None else nullcontext()
+    with page_lock, track_requests() as requests:
+        result = _run_pipeline(page_id, template_page_id, context=context, timer=timer)
+    return replace(result, stage_seconds=timer.as_dict(), notion_requests=requests.snapshot())
+
+
+def _run_pipeline(
+    page_id: str,
+    template_page_id: str | None,
+    *,
+    context: Optional[PipelineContext],
+    timer: StageTimer,
+) -> PipelineResult:
+    _require_page_id(page_id)
+    if context is None:
+        context = PipelineContext.from_env()
+    settings = context.settings
+    notion = context.notion
+    unfinished = _load_journal(settings, page_id)
+    if unfinished is not None and unfinished.generated:
+        return _finish_write(context, unfinished, timer)
+    if unfinished is not None:
+        _discard_restored(unfinished, notion.restore_page_content(unfinished))
+    template_id = _template_id(settings, template_page_id)
+
+    with timer.stage("fetch"):
+        template_markdown, draft_snapshot, review_markdown = _prefetch_sources(
+            context,
+            template_id=template_id,
+            page_id=page_id,
+            review_page_id=settings.notion_review_page_id,
+        )
+    sources = _prepare_sources(
+        settings,
+        page_id=page_id,
+        template_id=template_id,
+        template_markdown=template_markdown,
+        snapshot=draft_snapshot,
+        review_markdown=review_markdown,
+    )
+
+    streamed_blocks: Optional[List[Block]] = None
+    write_report: Optional[ArchiveReport] = None
+    journal: Optional[WriteJournal] = None
+    with timer.stage("ai"):
+        if is_large_document(settings, sources.draft_markdown):
+            ai_result = context.ai_formatter.cached(sources.prompts) or format_large_document(
+                context.ai_formatter,
+                settings,
+                template_markdown=sources.template_markdown,
+                draft_markdown=sources.draft_markdown,
+                review_markdown=sources.review_markdown,
+            )
+            context.ai_formatter.remember(sources.prompts, ai_result)
+        elif _streams_page_writes(settings):
+            journal = _begin_journal(settings, sources)
+            ai_result, streamed_blocks, write_report = _stream_to_page(context, sources, journal)
+        else:
+            ai_result = context.ai_formatter.generate(sources.prompts)
+
+    if streamed_blocks is not None:
+        page_blocks, page_rewritten = streamed_blocks, True
+    else:
+        page_blocks, page_rewritten = _planned_blocks(settings, sources, ai_result, timer)
+        if page_rewritten:
+            if settings.notion_update_mode == "diff":
+                write_report = notion.update_page_content(
+                    page_id, page_blocks, snapshot=sources.snapshot
+                )
+            else:
+                journal = _begin_journal(settings, sources, ai_result, page_blocks)
+                try:
+                    write_report = notion.replace_page_content(
+                        page_id, page_blocks, snapshot=sources.snapshot, journal=journal
+                    )
+                except Exception as exc:
+                    if journal is None:
+                        raise
+                    raise PipelineError(_interrupted_write_message(journal, exc)) from exc
+    _record_written_page(
+        context.ai_formatter, settings, sources, ai_result, page_blocks, write_report, timer
+    )
+
+    target_status = _target_status(settings, ai_result)
+    if target_status:
+        with timer.stage("status"):
+            notion.update_status_property(page_id, *target_status)
+    if journal is not None:
+        journal.discard()
+    return _pipeline_result(settings, sources, ai_result, page_blocks, page_rewritten)
+
+
+def resume_pipeline(page_id: str, *, context: Optional[PipelineContext] = None) -> PipelineResult:
+    """Finish a replace-mode write that was interrupted, from its journal.
+
+    Nothing is fetched from the source pages and OpenAI is not called: the
+    journaled AI result and blocks are written from the last append request
+    Notion confirmed, then the review status is updated as usual.
+    :func:`run_pipeline` does the same before formatting a page with an
+    unfinished write; this only fails when there is nothing to resume. A
+    streamed write that stopped before generation finished cannot be
+    finished, so its page is restored and formatted again.
+    """
+
+    timer = StageTimer()
+    page_lock = context.page_lock(page_id) if context is not None else nullcontext()
+    with page_lock, track_requests() as requests:
+        result = _resume_pipeline(page_id, context=context, timer=timer)
+    return replace(result, stage_seconds=timer.as_dict(), notion_requests=requests.snapshot())
+
+
+def _resume_pipeline(
+    page_id: str,
+    *,
+    context: Optional[PipelineContext],
+    timer: StageTimer,
+) -> PipelineResult:
+    _require_page_id(page_id)
+    if context is None:
+        context = PipelineContext.from_env()
+    journal = _require_journal(context.settings, page_id)
+    return _run_pipeline(page_id, journal.template_page_id, context=context, timer=timer)
+
+
+def _finish_write(
+    context: PipelineContext, journal: WriteJournal, timer: StageTimer
+) -> PipelineResult:
+    try:
+        write_report = context.notion.resume_page_content(journal)
+    except Exception as exc:
+        raise PipelineError(_interrupted_write_message(journal, exc)) from exc
+    _record_write_timings(write_report, timer)
+
+    target_status = _target_status(context.settings, journal.ai_result)
+    if target_status:
+        with timer.stage("status"):
+            context.notion.update_status_property(journal.page_id, *target_status)
+    journal.discard()
+    return _resumed_result(context.settings, journal)
+
+
+class AsyncPipelineContext:
+    """Asyncio counterpart of :class:`PipelineContext`.
+
+    Holds an :class:`AsyncNotionService` and :class:`AsyncAIFormatter` so many
+    ``async_run_pipeline`` calls can share one event loop and one set of
+    connections. Close it with ``aclose`` (or ``async with``) when done.
+    """
+
+    def __init__(
+        self,
+        settings: Settings,
+        *,
+        notion: Optional[AsyncNotionService] = None,
+        ai_formatter: Optional[AsyncAIFormatter] = None,
+        static_page_ttl_seconds: float = 300.0,
+        cassette: Optional[Cassette] = None,
+    ) -> None:
+        transport = None
+        if cassette is not None:
+            settings = _cassette_settings(settings, cassette)
+            transport = cassette.async_transport()
+        self.settings = settings
+        self.notion = notion or AsyncNotionService(
+            settings.notion_api_key,
+            max_concurrent_requests=settings.notion_max_concurrency,
+            page_cache=_create_page_cache(settings),
+            retry_limit=settings.retry_limit,
+            requests_per_second=settings.notion_requests_per_second,
+            base_url=settings.notion_base_url,
+            transport=transport,
+        )
+        self.ai_formatter = ai_formatter or AsyncAIFormatter(
+            settings, result_cache=_create_result_cache(settings), transport=transport
+        )
+        self._static_page_ttl_seconds = static_page_ttl_seconds
+        self._static_pages: Dict[str, Tuple[float, asyncio.Task[str]]] = {}
+        self._page_locks: Dict[str, asyncio.Lock] = {}
+
+    @classmethod
+    def from_env(cls, *, cassette: Optional[Cassette] = None) -> "AsyncPipelineContext":
+        try:
+            settings = load_settings()
+        except ConfigurationError as exc:
+            raise PipelineError(str(exc)) from exc
+        return cls(settings, cassette=cassette)
+
+    async def __aenter__(self) -> "AsyncPipelineContext":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self.notion.aclose()
+        await self.ai_formatter.aclose()
+
+    def page_lock(self, page_id: str) -> asyncio.Lock:
+        """Asyncio counterpart of :meth:`PipelineContext.page_lock`."""
+
+        return self._page_locks.setdefault(page_key(page_id), asyncio.Lock())
+
+    async def fetch_static_markdown(self, page_id: str) -> str:
+        now = time.monotonic()
+        entry = self._static_pages.get(page_id)
+        if (
+            entry is None
+            or now - entry[0] > self._static_page_ttl_seconds
+            or (entry[1].done() and entry[1].exception() is not None)
+        ):
+            task = asyncio.ensure_future(
+                self.notion.fetch_page_markdown(page_id, use_cache=True)
+            )
+            entry = (now, task)
+            self._static_pages[page_id] = entry
+        return await asyncio.shield(entry[1])
+
+
+async def async_run_pipeline(
+    page_id: str,
+    template_page_id: str | None = None,
+    *,
+    context: Optional[AsyncPipelineContext] = None,
+) -> PipelineResult:
+    """Asyncio version of :func:`run_pipeline`.
+
+    The three page fetches run as concurrent tasks, and every Notion and
+    OpenAI call is awaited, so many pages can be processed on one loop.
+    """
+
+    timer = StageTimer()
+    page_lock = context.page_lock(page_id) if context is not None else nullcontext()
+    async with page_lock:
+        with track_requests() as requests:
+            result = await _async_run_pipeline(
+                page_id, template_page_id, context=context, timer=timer
+            )
+    return replace(result, stage_seconds=timer.as_dict(), notion_requests=requests.snapshot())
+
+
+async def _async_run_pipeline(
+    page_id: str,
+    template_page_id: str | None,
+    *,
+    context: Optional[AsyncPipelineContext],
+    timer: StageTimer,
+) -> PipelineResult:
+    _require_page_id(page_id)
+    owns_context = context is None
+    if context is None:
+        context = AsyncPipelineContext.from_env()
+    try:
+        settings = context.settings
+        notion = context.notion
+        unfinished = _load_journal(settings, page_id)
+        if unfinished is not None and unfinished.generated:
+            return await _async_finish_write(context, unfinished, timer)
+        if unfinished is not None:
+            _discard_restored(unfinished, await notion.restore_page_content(unfinished))
+        template_id = _template_id(settings, template_page_id)
+
+        review_page_id = settings.notion_review_page_id
+        fetches: List[Awaitable[Any]] = [
+            context.fetch_static_markdown(template_id),
+            notion.fetch_page_snapshot(page_id),
+        ]
+        if review_page_id:
+            fetches.append(context.fetch_static_markdown(review_page_id))
+        with timer.stage("fetch"):
+            fetched = await _gather_or_cancel(fetches)
+        sources = _prepare_sources(
+            settings,
+            page_id=page_id,
+            template_id=template_id,
+            template_markdown=fetched[0],
+            snapshot=fetched[1],
+            review_markdown=fetched[2] if review_page_id else None,
+        )
+
+        streamed_blocks: Optional[List[Block]] = None
+        write_report: Optional[ArchiveReport] = None
+        journal: Optional[WriteJournal] = None
+        with timer.stage("ai"):
+            if is_large_document(settings, sources.draft_markdown):
+                cached = context.ai_formatter.cached(sources.prompts)
+                ai_result = cached or await async_format_large_document(
+                    context.ai_formatter,
+                    settings,
+                    template_markdown=sources.template_markdown,
+                    draft_markdown=sources.draft_markdown,
+                    review_markdown=sources.review_markdown,
+                )
+                context.ai_formatter.remember(sources.prompts, ai_result)
+            elif _streams_page_writes(settings):
+                journal = _begin_journal(settings, sources)
+                ai_result, streamed_blocks, write_report = await _async_stream_to_page(
+                    context, sources, journal
+                )
+            else:
+                ai_result = await context.ai_formatter.generate(sources.prompts)
+
+        if streamed_blocks is not None:
+            page_blocks, page_rewritten = streamed_blocks, True
+        else:
+            page_blocks, page_rewritten = _planned_blocks(settings, sources, ai_result, timer)
+            if page_rewritten:
+                if settings.notion_update_mode == "diff":
+                    write_report = await notion.update_page_content(
+                        page_id, page_blocks, snapshot=sources.snapshot
+                    )
+                else:
+                    journal = _begin_journal(settings, sources, ai_result, page_blocks)
+                    try:
+                        write_report = await notion.replace_page_content(
+                            page_id, page_blocks, snapshot=sources.snapshot, journal=journal
+                        )
+                    except Exception as exc:
+                        if journal is None:
+                            raise
+                        raise PipelineError(_interrupted_write_message(journal, exc)) from exc
+        _record_written_page(
+            context.ai_formatter, settings, sources, ai_result, page_blocks, write_report, timer
+        )
+
+        target_status = _target_status(settings, ai_result)
+        if target_status:
+            with timer.stage("status"):
+                await notion.update_status_property(page_id, *target_status)
+        if journal is not None:
+            journal.discard()
+    finally:
+        if owns_context:
+            await context.aclose()
+    return _pipeline_result(settings, sources, ai_result, page_blocks, page_rewritten)
+
+
+async def async_resume_pipeline(
+    page_id: str, *, context: Optional[AsyncPipelineContext] = None
+) -> PipelineResult:
+    """Asyncio version of :func:`resume_pipeline`."""
+
+    timer = StageTimer()
+    page_lock = context.page_lock(page_id) if context is not None else nullcontext()
+    async with page_lock:
+        with track_requests() as requests:
+            result = await _async_resume_pipeline(page_id, context=context, timer=timer)
+    return replace(result, stage_seconds=timer.as_dict(), notion_requests=requests.snapshot())
+
+
+async def _async_resume_pipeline(
+    page_id: str,
+    *,
+    context: Optional[AsyncPipelineContext],
+    timer: StageTimer,
+) -> PipelineResult:
+    _require_page_id(page_id)
+    owns_context = context is None
+    if context is None:
+        context = AsyncPipelineContext.from_env()
+    try:
+        journal = _require_journal(context.settings, page_id)
+        return await _async_run_pipeline(
+            page_id, journal.template_page_id, context=context, timer=timer
+        )
+    finally:
+        if owns_context:
+            await context.aclose()
+
+
+async def _async_finish_write(
+    context: AsyncPipelineContext, journal: WriteJournal, timer: StageTimer
+) -> PipelineResult:
+    try:
+        write_report = await context.notion.resume_page_content(journal)
+    except Exception as exc:
+        raise PipelineError(_interrupted_write_message(journal, exc)) from exc
+    _record_write_timings(write_report, timer)
+
+    target_status = _target_status(context.settings, journal.ai_result)
+    if target_status:
+        with timer.stage("status"):
+            await context.notion.update_status_property(journal.page_id, *target_status)
+    journal.discard()
+    return _resumed_result(context.settings, journal)
+
+
+async def _gather_or_cancel(awaitables: List[Awaitable[Any]]) -> List[Any]:
+    """Like ``asyncio.gather`` but cancels the siblings once one task fails."""
+
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+def _streams_page_writes(settings: Settings) -> bool:
+    # A diff needs the whole document, so streaming only applies to replace mode,
+    # and the incremental converter is the builtin line parser.
+    return (
+        settings.ai_streaming
+        and settings.notion_update_mode == "replace"
+        and settings.markdown_converter_backend == "builtin"
+    )
+
+
+class _StreamedBlocks:
+    """Converts the streamed Markdown into blocks and queues them on a page writer."""
+
+    def __init__(
+        self, settings: Settings, writer: StreamingPageWriter | AsyncStreamingPageWriter
+    ) -> None:
+        self._converter = StreamingMarkdownConverter(review_heading=settings.review_section_heading)
+        self._writer = writer
+        self.written: List[Block] = []
+
+    def feed(self, markdown: str) -> None:
+        blocks = self._converter.feed(markdown)
+        self.written.extend(blocks)
+        self._writer.write(blocks)
+
+    def finish(self, ai_result: AIResult) -> None:
+        tail = self._converter.finish(is_complete=ai_result.is_complete)
+        self.written.extend(tail)
+        if not self.written:
+            raise PipelineError("AI returned empty document; refusing to overwrite the page.")
+        self._writer.write(tail)
+
+
+def _stream_to_page(
+    context: PipelineContext, sources: _Sources, journal: Optional[WriteJournal]
+) -> Tuple[AIResult, Optional[List[Block]], Optional[ArchiveReport]]:
+    """Generate with a streaming completion and append blocks as they appear.
+
+    Returns the blocks written and the writer's report, or ``None`` for both
+    when the result came from the result cache and nothing was written yet.
+    Appends are recorded in ``journal`` as they are confirmed. If generation
+    fails, the blocks appended so far are archived and the old content is
+    restored before the error is re-raised. Once generation has finished
+    and is journaled, a failed append is left to be resumed instead, like a
+    non-streamed write; without a journal it is rolled back too.
+    """
+
+    writer = context.notion.open_page_writer(
+        sources.page_id, snapshot=sources.snapshot, journal=journal
+    )
+    stream = _StreamedBlocks(context.settings, writer)
+    try:
+        ai_result = context.ai_formatter.generate_streaming(sources.prompts, stream.feed)
+        if ai_result.from_cache:
+            _discard_unused(journal)
+            return ai_result, None, None
+        stream.finish(ai_result)
+    except BaseException as exc:
+        _check_rolled_back(journal, writer.rollback(), exc)
+        raise
+    if journal is not None:
+        journal.complete_generation(ai_result, stream.written)
+    try:
+        report = writer.close()
+    except BaseException as exc:
+        if journal is None:
+            writer.rollback()
+        elif isinstance(exc, Exception):
+            raise PipelineError(_interrupted_write_message(journal, exc)) from exc
+        raise
+    return ai_result, stream.written, report
+
+
+async def _async_stream_to_page(
+    context: AsyncPipelineContext, sources: _Sources, journal: Optional[WriteJournal]
+) -> Tuple[AIResult, Optional[List[Block]], Optional[ArchiveReport]]:
+    writer = context.notion.open_page_writer(
+        sources.page_id, snapshot=sources.snapshot, journal=journal
+    )
+    stream = _StreamedBlocks(context.settings, writer)
+    try:
+        ai_result = await context.ai_formatter.generate_streaming(sources.prompts, stream.feed)
+        if ai_result.from_cache:
+            _discard_unused(journal)
+            return ai_result, None, None
+        stream.finish(ai_result)
+    except BaseException as exc:
+        _check_rolled_back(journal, await writer.rollback(), exc)
+        raise
+    if journal is not None:
+        journal.complete_generation(ai_result, stream.written)
+    try:
+        report = await writer.close()
+    except BaseException as exc:
+        if journal is None:
+            await writer.rollback()
+        elif isinstance(exc, Exception):
+            raise PipelineError(_interrupted_write_message(journal, exc)) from exc
+        raise
+    return ai_result, stream.written, report
+
+
+def _discard_unused(journal: Optional[WriteJournal]) -> None:
+    if journal is not None:
+        journal.discard()
+
+
+def _check_rolled_back(
+    journal: Optional[WriteJournal], report: ArchiveReport, exc: BaseException
+) -> None:
+    """Drop the journal of a streamed write that was fully undone.
+
+    If some of the undo failed the journal is kept, so the next run can
+    finish restoring the page before formatting it again.
+    """
+
+    if journal is None:
+        return
+    if report.ok:
+        journal.discard()
+    elif isinstance(exc, Exception):
+        raise PipelineError(_unrestored_page_message(journal, report, exc)) from exc
+
+
+def _discard_restored(journal: WriteJournal, report: ArchiveReport) -> None:
+    if not report.ok:
+        raise PipelineError(_unrestored_page_message(journal, report))
+    journal.discard()
+
+
+def _require_page_id(page_id: str) -> None:
     if not page_id:
         raise PipelineError("Target Notion page ID is required.")
 
-    try:
-        settings: Settings = load_settings()
-    except ConfigurationError as exc:
-        raise PipelineError(str(exc)) from exc
 
+def _template_id(settings: Settings, template_page_id: str | None) -> str:
     template_id = template_page_id or settings.notion_template_page_id
     if not template_id:
         raise PipelineError("Template Notion page ID is required.")
+    return template_id
+
+
+def _planned_blocks(
+    settings: Settings, sources: _Sources, ai_result: AIResult, timer: StageTimer
+) -> Tuple[List[Block], bool]:
+    """Convert the AI result; also report whether writing it would change the page."""
+
+    with timer.stage("convert"):
+        page_blocks = _convert_ai_result(settings, ai_result)
+    return page_blocks, not blocks_match(sources.existing, page_blocks, snapshot=sources.snapshot)
+
+
+def _record_write_timings(write_report: Optional[ArchiveReport], timer: StageTimer) -> None:
+    if write_report is not None:
+        timer.add("archive", write_report.archive_seconds)
+        timer.add("append", write_report.append_seconds)
+
+
+def _record_written_page(
+    ai_formatter: AIFormatter | AsyncAIFormatter,
+    settings: Settings,
+    sources: _Sources,
+    ai_result: AIResult,
+    page_blocks: List[Block],
+    write_report: Optional[ArchiveReport],
+    timer: StageTimer,
+) -> None:
+    _record_write_timings(write_report, timer)
+    # The next run on the untouched page (a second button press, an automation
+    # re-firing) sees the page as written now; answer it from the cache.
+    written = sources.snapshot.with_content(page_blocks, keep=sources.preserved)
+    ai_formatter.remember(
+        _build_page_prompts(
+            settings,
+            template_markdown=sources.template_markdown,
+            page_markdown=written.to_markdown(),
+            review_markdown=sources.review_markdown,
+        ),
+        ai_result,
+    )
+
+
+def _pipeline_result(
+    settings: Settings,
+    sources: _Sources,
+    ai_result: AIResult,
+    page_blocks: List[Block],
+    page_rewritten: bool,
+) -> PipelineResult:
+    return PipelineResult(
+        page_id=sources.page_id,
+        template_page_id=sources.template_id,
+        review_page_id=settings.notion_review_page_id,
+        is_complete=ai_result.is_complete,
+        completion_message=ai_result.completion_message,
+        block_count=len(page_blocks),
+        ai_cache_hit=ai_result.from_cache,
+        page_rewritten=page_rewritten,
+        usage=ai_result.usage,
+        prompt_prefix_fingerprint=sources.prompts.prefix_fingerprint,
+        model_routes=ai_result.model_routes,
+    )
 
-    notion = NotionService(settings.notion_api_key)
-    template_markdown = notion.fetch_page_markdown(template_id)
-    draft_markdown = notion.fetch_page_markdown(page_id)
-    review_markdown = None
-    if settings.notion_review_page_id:
-        review_markdown = notion.fetch_page_markdown(settings.notion_review_page_id)
 
-    prompts = build_prompts(
+def _resumed_result(settings: Settings, journal: WriteJournal) -> PipelineResult:
+    ai_result = journal.ai_result
+    return PipelineResult(
+        page_id=journal.page_id,
+        template_page_id=journal.template_page_id,
+        review_page_id=settings.notion_review_page_id,
+        is_complete=ai_result.is_complete,
+        completion_message=ai_result.completion_message,
+        block_count=len(journal.blocks),
+        resumed=True,
+    )
+
+
+def _build_page_prompts(
+    settings: Settings,
+    *,
+    template_markdown: str,
+    page_markdown: str,
+    review_markdown: Optional[str],
+) -> PromptPayload:
+    return build_prompts(
         template_markdown=template_markdown,
-        page_markdown=draft_markdown,
+        page_markdown=page_markdown,
         review_guidelines=review_markdown,
         review_section_heading=settings.review_section_heading,
         completion_phrase=settings.completion_success_phrase,
     )
 
-    ai_formatter = AIFormatter(settings)
-    ai_result: AIResult = ai_formatter.generate(prompts)
 
-    page_blocks = markdown_to_blocks(
+def _convert_ai_result(settings: Settings, ai_result: AIResult) -> List[Block]:
+    page_blocks = convert_markdown(
         ai_result.formatted_markdown,
+        backend=settings.markdown_converter_backend,
         review_heading=settings.review_section_heading,
         is_complete=ai_result.is_complete,
     )
     if not page_blocks:
         raise PipelineError("AI returned empty document; refusing to overwrite the page.")
+    return page_blocks
 
-    notion.replace_page_content(page_id, page_blocks)
 
+def _target_status(settings: Settings, ai_result: AIResult) -> Optional[Tuple[str, str]]:
     status_property = settings.review_status_property_name
     complete_value = settings.review_status_complete_value
     rejected_value = settings.review_status_rejected_value
     if status_property and complete_value and rejected_value:
         target_status = complete_value if ai_result.is_complete else rejected_value
-        notion.update_status_property(page_id, status_property, target_status)
+        return status_property, target_status
+    return None
 
-    return PipelineResult(
-        page_id=page_id,
-        template_page_id=template_id,
-        review_page_id=settings.notion_review_page_id,
-        is_complete=ai_result.is_complete,
-        completion_message=ai_result.completion_message,
-        block_count=len(page_blocks),
+
+def _journal_root(settings: Settings) -> Optional[str]:
+    if not settings.cache_dir:
+        return None
+    return os.path.join(settings.cache_dir, "journal")
+
+
+def _load_journal(settings: Settings, page_id: str) -> Optional[WriteJournal]:
+    root = _journal_root(settings)
+    return WriteJournal.load(root, page_id) if root else None
+
+
+def _require_journal(settings: Settings, page_id: str) -> WriteJournal:
+    journal = _load_journal(settings, page_id)
+    if journal is None:
+        raise PipelineError(f"No unfinished write is recorded for page {page_id}.")
+    return journal
+
+
+def _begin_journal(
+    settings: Settings,
+    sources: _Sources,
+    ai_result: Optional[AIResult] = None,
+    page_blocks: Optional[List[Block]] = None,
+) -> Optional[WriteJournal]:
+    # Formatting a half-written page again would feed the partial output back
+    # to the model, so the next run on the page finishes (or, for a streamed
+    # write cut off mid-generation, undoes) the journaled write first.
+    root = _journal_root(settings)
+    if not root:
+        return None
+    return WriteJournal.begin(
+        root,
+        page_id=sources.page_id,
+        template_page_id=sources.template_id,
+        ai_result=ai_result,
+        blocks=page_blocks,
+        archive_targets=[str(block["id"]) for block in sources.existing],
+        preserved=sources.preserved,
+    )
+
+
+def _interrupted_write_message(journal: WriteJournal, exc: Exception) -> str:
+    return (
+        f"Writing page {journal.page_id} stopped after {journal.completed_requests} "
+        f"confirmed append request(s): {exc}. Running the page again finishes the write "
+        "without calling OpenAI; to start over instead, restore the page from its "
+        f"version history and delete {journal.directory}."
+    )
+
+
+def _unrestored_page_message(
+    journal: WriteJournal, report: ArchiveReport, exc: Optional[Exception] = None
+) -> str:
+    cause = f"failed ({exc})" if exc is not None else "was interrupted"
+    return (
+        f"The streamed write to page {journal.page_id} {cause} and {len(report.failed)} "
+        "block(s) could not be restored. Running the page again retries the restore "
+        "before formatting; to give up on it, fix the page by hand and delete "
+        f"{journal.directory}."
     )
@@ -0,0 +1,388 @@
+from __future__ import annotations
+
+import hmac
+import json
+import re
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .page_snapshot import page_key
+from .runner import PipelineContext, PipelineResult, run_pipeline
+
+DEFAULT_SERVE_WORKERS = 2
+DEFAULT_MAX_PENDING_JOBS = 100
+DEFAULT_JOB_HISTORY = 1000
+DEFAULT_DEBOUNCE_SECONDS = 2.0
+MAX_WEBHOOK_BODY_BYTES = 1_000_000
+
+_PAGE_ID = re.compile(r"[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}")
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+@dataclass
+class Job:
+    """One pipeline run requested through the webhook.
+
+    ``triggers`` counts the webhook calls merged into this run.
+    """
+
+    page_id: str
+    template_page_id: Optional[str] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"
+    triggers: int = 1
+    submitted_at: float = field(default_factory=time.time)
+    run_after: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[PipelineResult] = None
+    error: Optional[str] = None
+
+    def to_payload(self) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "job_id": self.id,
+            "page_id": self.page_id,
+            "status": self.status,
+            "triggers": self.triggers,
+            "submitted_at": _isoformat(self.submitted_at),
+            "started_at": _isoformat(self.started_at),
+            "finished_at": _isoformat(self.finished_at),
+        }
+        if self.result is not None:
+            payload["result"] = self.result.to_payload()
+        if self.error is not None:
+            payload["error"] = self.error
+        return payload
+
+
+class JobQueue:
+    """Per-page coalescing queue of pipeline runs served by worker threads.
+
+    Every worker shares one :class:`PipelineContext`, so the Notion and
+    OpenAI clients, the rate limiter and the memoised template and review
+    pages stay warm between webhook calls.
+
+    Each page has at most one queued job. A trigger for a page that is
+    already queued is merged into that job and pushes its start back to
+    ``debounce_seconds`` after the latest trigger. A trigger for a page
+    that is running queues a single follow-up run, which starts only after
+    the current one finishes. The latest job of each page is kept for
+    status lookups, up to ``history_limit`` pages.
+    """
+
+    def __init__(
+        self,
+        context: PipelineContext,
+        *,
+        workers: int = DEFAULT_SERVE_WORKERS,
+        max_pending: int = DEFAULT_MAX_PENDING_JOBS,
+        history_limit: int = DEFAULT_JOB_HISTORY,
+        debounce_seconds: float = DEFAULT_DEBOUNCE_SECONDS,
+    ) -> None:
+        self._context = context
+        self._workers = max(1, workers)
+        self._max_pending = max(1, max_pending)
+        self._history_limit = max(1, history_limit)
+        self._debounce_seconds = max(0.0, debounce_seconds)
+        self._queued: Dict[str, Job] = {}
+        self._running: Set[str] = set()
+        self._jobs: Dict[str, Job] = {}
+        self._stopping = False
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for index in range(self._workers):
+            thread = threading.Thread(
+                target=self._work, name=f"notion-formatter-worker-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def shutdown(self, *, wait: bool = True) -> None:
+        """Stop the workers after the jobs already queued have run."""
+
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads.clear()
+
+    def submit(self, page_id: str, template_page_id: Optional[str] = None) -> Job:
+        key = page_key(page_id)
+        with self._condition:
+            job = self._queued.get(key)
+            if job is not None:
+                job.triggers += 1
+                job.run_after = time.monotonic() + self._debounce_seconds
+                if template_page_id:
+                    job.template_page_id = template_page_id
+                return job
+            if len(self._queued) >= self._max_pending:
+                raise QueueFullError(f"{self._max_pending} jobs are already waiting.")
+            job = Job(
+                page_id=page_id,
+                template_page_id=template_page_id,
+                run_after=time.monotonic() + self._debounce_seconds,
+            )
+            self._queued[key] = job
+            self._jobs.pop(key, None)
+            self._jobs[key] = job
+            self._trim_history()
+            self._condition.notify()
+        return job
+
+    def job_for(self, page_id: str) -> Optional[Job]:
+        with self._condition:
+            return self._jobs.get(page_key(page_id))
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            # History keeps only the latest job per page, so a running job
+            # with a queued follow-up is counted from the live state.
+            counts = {
+                "queued": len(self._queued),
+                "running": len(self._running),
+                "succeeded": self._count("succeeded"),
+                "failed": self._count("failed"),
+            }
+        counts["workers"] = self._workers
+        return counts
+
+    def _work(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                result = run_pipeline(job.page_id, job.template_page_id, context=self._context)
+            except Exception as exc:
+                self._finish(job, status="failed", error=f"{exc.__class__.__name__}: {exc}")
+                print(f"[notion-formatter] job failed: page={job.page_id} {job.error}", file=sys.stderr)
+            else:
+                self._finish(job, status="succeeded", result=result)
+                print(
+                    f"[notion-formatter] job done: page={job.page_id} triggers={job.triggers} "
+                    f"blocks={result.block_count} complete={result.is_complete}",
+                    file=sys.stderr,
+                )
+
+    def _next_job(self) -> Optional[Job]:
+        """Block until a queued job is due and its page is idle; None once drained."""
+
+        with self._condition:
+            while True:
+                if self._stopping and not self._queued:
+                    return None
+                now = time.monotonic()
+                timeout: Optional[float] = None
+                # Dicts keep insertion order, so pages are served first come, first served.
+                for key, job in self._queued.items():
+                    if key in self._running:
+                        continue
+                    if self._stopping or job.run_after <= now:
+                        del self._queued[key]
+                        self._running.add(key)
+                        job.status = "running"
+                        job.started_at = time.time()
+                        return job
+                    wait = job.run_after - now
+                    timeout = wait if timeout is None else min(timeout, wait)
+                self._condition.wait(timeout)
+
+    def _finish(
+        self,
+        job: Job,
+        *,
+        status: str,
+        result: Optional[PipelineResult] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        with self._condition:
+            job.status = status
+            job.result = result
+            job.error = error
+            job.finished_at = time.time()
+            self._running.discard(page_key(job.page_id))
+            # A follow-up for this page may have been waiting on it.
+            self._condition.notify_all()
+
+    def _count(self, status: str) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == status)
+
+    def _trim_history(self) -> None:
+        # Dicts keep insertion order, so the first finished entries are the oldest.
+        excess = len(self._jobs) - self._history_limit
+        for key in [key for key, job in self._jobs.items() if job.finished_at is not None]:
+            if excess <= 0:
+                break
+            del self._jobs[key]
+            excess -= 1
+
+
+def extract_page_id(payload: Any) -> Optional[str]:
+    """Find the target page ID in a webhook body.
+
+    Accepts the Notion automation payload (``{"data": {"object": "page",
+    "id": ...}}``) as well as ``{"page_id": ...}`` and the
+    ``repository_dispatch`` style ``{"client_payload": {"page_id": ...}}``.
+    """
+
+    if not isinstance(payload, dict):
+        return None
+    candidates: List[Any] = [payload.get("page_id")]
+    data = payload.get("data")
+    if isinstance(data, dict) and data.get("object", "page") == "page":
+        candidates.append(data.get("id"))
+    client_payload = payload.get("client_payload")
+    if isinstance(client_payload, dict):
+        candidates.append(client_payload.get("page_id"))
+    for candidate in candidates:
+        if isinstance(candidate, str) and _PAGE_ID.fullmatch(candidate.strip()):
+            return candidate.strip()
+    return None
+
+
+def make_server(
+    jobs: JobQueue,
+    *,
+    host: str,
+    port: int,
+    secret: Optional[str] = None,
+) -> ThreadingHTTPServer:
+    """HTTP front end: ``POST /webhook``, ``GET /jobs/<page_id>`` and ``GET /healthz``.
+
+    With ``secret`` set, webhook and job requests must send
+    ``Authorization: Bearer <secret>``; the health check stays open.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        server_version = "notion-formatter"
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+            print(f"[notion-formatter] {self.address_string()} {format % args}", file=sys.stderr)
+
+        def do_GET(self) -> None:
+            path = self.path.split("?", 1)[0].rstrip("/")
+            if path == "/healthz":
+                self._send(200, {"status": "ok", **jobs.stats()})
+                return
+            if not self._authorized():
+                return
+            match = re.fullmatch(r"/jobs/([^/]+)", path)
+            if match is None:
+                self._send(404, {"error": "not found"})
+                return
+            job = jobs.job_for(match.group(1))
+            if job is None:
+                self._send(404, {"error": "no job for this page"})
+                return
+            self._send(200, job.to_payload())
+
+        def do_POST(self) -> None:
+            path = self.path.split("?", 1)[0].rstrip("/")
+            if path not in {"", "/webhook"}:
+                self._send(404, {"error": "not found"})
+                return
+            if not self._authorized():
+                return
+            payload, error = self._read_json()
+            if error:
+                self._send(400, {"error": error})
+                return
+            page_id = extract_page_id(payload)
+            if page_id is None:
+                self._send(400, {"error": "page ID not found in payload"})
+                return
+            template_page_id = payload.get("template_page_id")
+            try:
+                job = jobs.submit(
+                    page_id, template_page_id if isinstance(template_page_id, str) else None
+                )
+            except QueueFullError as exc:
+                self._send(503, {"error": str(exc)})
+                return
+            self._send(202, job.to_payload())
+
+        def _authorized(self) -> bool:
+            if not secret:
+                return True
+            supplied = self.headers.get("Authorization", "")
+            if hmac.compare_digest(supplied.encode("utf-8"), f"Bearer {secret}".encode("utf-8")):
+                return True
+            self._send(401, {"error": "unauthorized"})
+            return False
+
+        def _read_json(self) -> Tuple[Any, Optional[str]]:
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                return None, "invalid Content-Length"
+            if length > MAX_WEBHOOK_BODY_BYTES:
+                return None, "payload too large"
+            try:
+                return json.loads(self.rfile.read(length) or b"{}"), None
+            except ValueError:
+                return None, "body must be JSON"
+
+        def _send(self, status: int, payload: Dict[str, Any]) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(
+    context: PipelineContext,
+    *,
+    host: str,
+    port: int,
+    workers: int = DEFAULT_SERVE_WORKERS,
+    secret: Optional[str] = None,
+    max_pending: int = DEFAULT_MAX_PENDING_JOBS,
+    debounce_seconds: float = DEFAULT_DEBOUNCE_SECONDS,
+) -> None:
+    """Run the webhook server until interrupted, then drain the queue."""
+
+    jobs = JobQueue(
+        context, workers=workers, max_pending=max_pending, debounce_seconds=debounce_seconds
+    )
+    jobs.start()
+    server = make_server(jobs, host=host, port=port, secret=secret)
+    if not secret:
+        print(
+            "[notion-formatter] WARNING: NOTION_WEBHOOK_SECRET is not set; "
+            "the webhook accepts unauthenticated requests.",
+            file=sys.stderr,
+        )
+    print(f"[notion-formatter] listening on http://{host}:{server.server_port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        jobs.shutdown()
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
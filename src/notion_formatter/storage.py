@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """Write ``text`` to ``path`` so readers never see a partial file."""
+
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            handle.write(text)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+class DiskLRU:
+    """JSON entries in one directory, dropped least recently used first.
+
+    The entry file's mtime is the only timestamp: :meth:`put` sets it and
+    :meth:`get` refreshes it. An entry expires ``max_age_seconds`` after it
+    was last written or read, and once there are more than ``max_entries``
+    entries or ``max_bytes`` bytes, the least recently used go first.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str],
+        *,
+        max_age_seconds: float,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ) -> None:
+        self._directory = Path(directory)
+        self._max_age_seconds = max_age_seconds
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        path = self._entry_path(name)
+        with self._lock:
+            try:
+                if time.time() - path.stat().st_mtime > self._max_age_seconds:
+                    path.unlink(missing_ok=True)
+                    return None
+                entry = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                return None
+            if not isinstance(entry, dict):
+                return None
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return entry
+
+    def put(self, name: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._directory.mkdir(parents=True, exist_ok=True)
+            atomic_write_text(self._entry_path(name), json.dumps(entry, ensure_ascii=False))
+            self._evict()
+
+    def _entry_path(self, name: str) -> Path:
+        return self._directory / f"{name}.json"
+
+    def _evict(self) -> None:
+        now = time.time()
+        entries: List[Tuple[float, int, Path]] = []
+        for path in self._directory.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self._max_age_seconds:
+                path.unlink(missing_ok=True)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        count = len(entries)
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if (self._max_entries is None or count <= self._max_entries) and (
+                self._max_bytes is None or total <= self._max_bytes
+            ):
+                break
+            path.unlink(missing_ok=True)
+            count -= 1
+            total -= size
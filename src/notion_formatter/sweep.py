@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Dict, List, Optional, Tuple
+
+from .batch import DEFAULT_BATCH_WORKERS, BatchItemResult, run_batch
+from .page_snapshot import page_key
+from .runner import PipelineContext, PipelineError
+from .storage import atomic_write_text
+
+DEFAULT_SWEEP_STATUS = "レビュー中"
+
+
+@dataclass(frozen=True)
+class Watermark:
+    """How far a database has been swept.
+
+    Notion reports ``last_edited_time`` to the minute, so pages edited in
+    the watermark's minute after a sweep must still be picked up. The query
+    therefore uses ``on_or_after`` and ``seen_page_ids`` lists the pages
+    already handled at exactly ``last_edited_time``.
+    """
+
+    last_edited_time: Optional[str] = None
+    seen_page_ids: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class SweepResult:
+    database_id: str
+    previous: Watermark
+    watermark: Watermark
+    items: List[BatchItemResult]
+
+    @property
+    def failed(self) -> List[BatchItemResult]:
+        return [item for item in self.items if not item.ok]
+
+
+class WatermarkStore:
+    """The watermark of one database, kept in a small JSON file."""
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self._path = Path(path)
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def load(self) -> Watermark:
+        try:
+            data = json.loads(self._path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return Watermark()
+        if not isinstance(data, dict):
+            return Watermark()
+        return Watermark(
+            last_edited_time=data.get("last_edited_time") or None,
+            seen_page_ids=tuple(str(page_id) for page_id in data.get("seen_page_ids", [])),
+        )
+
+    def save(self, watermark: Watermark, *, database_id: str) -> None:
+        """Replace the stored watermark in one rename, so a crash keeps the old one."""
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "database_id": database_id,
+            "last_edited_time": watermark.last_edited_time,
+            "seen_page_ids": list(watermark.seen_page_ids),
+            "swept_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        atomic_write_text(self._path, json.dumps(payload, ensure_ascii=False))
+
+
+def default_watermark_path(context: PipelineContext, database_id: str) -> str:
+    cache_dir = context.settings.cache_dir
+    if not cache_dir:
+        raise PipelineError(
+            "Sweeping needs somewhere to keep its watermark; "
+            "set NOTION_FORMATTER_CACHE_DIR or pass --state."
+        )
+    return os.path.join(cache_dir, "sweep", f"{page_key(database_id)}.json")
+
+
+def sweep_filter(
+    status_property: str,
+    status_value: str,
+    watermark: Watermark,
+) -> Dict[str, object]:
+    """Database filter for pages awaiting review that changed since ``watermark``."""
+
+    status = {"property": status_property, "status": {"equals": status_value}}
+    if not watermark.last_edited_time:
+        return status
+    edited = {
+        "timestamp": "last_edited_time",
+        "last_edited_time": {"on_or_after": watermark.last_edited_time},
+    }
+    return {"and": [status, edited]}
+
+
+def run_sweep(
+    database_id: str,
+    *,
+    context: PipelineContext,
+    store: WatermarkStore,
+    status_value: str = DEFAULT_SWEEP_STATUS,
+    template_page_id: Optional[str] = None,
+    max_workers: int = DEFAULT_BATCH_WORKERS,
+    report: Optional[IO[str]] = None,
+    full: bool = False,
+) -> SweepResult:
+    """Format the pages awaiting review that changed since the last sweep.
+
+    The database is queried for pages whose review status is
+    ``status_value`` and whose ``last_edited_time`` is at or after the
+    stored watermark, and only those go through :func:`run_batch`. A
+    formatted page leaves ``status_value`` (it becomes complete or
+    rejected), so the edits the pipeline makes do not bring it back. The
+    watermark advances once the batch is done: to the newest page swept
+    when everything succeeded, otherwise to the oldest failed page, so
+    failures are retried by the next sweep. A page whose write was
+    interrupted (by this sweep or an earlier one) is finished from its
+    journal by :func:`run_pipeline`, so it cannot hold the watermark back.
+    ``full`` ignores the stored watermark for this sweep.
+    """
+
+    status_property = context.settings.review_status_property_name
+    if not status_property:
+        raise PipelineError(
+            "Sweeping needs the review status property (NOTION_REVIEW_STATUS_PROPERTY) "
+            "so formatted pages drop out of the next sweep."
+        )
+    previous = store.load()
+    watermark = Watermark() if full else previous
+    pages = context.notion.query_database(
+        database_id,
+        filter=sweep_filter(status_property, status_value, watermark),
+        sorts=[{"timestamp": "last_edited_time", "direction": "ascending"}],
+    )
+    edited_at: Dict[str, str] = {}
+    seen = {page_key(page_id) for page_id in watermark.seen_page_ids}
+    for page in pages:
+        page_id, last_edited = str(page.get("id") or ""), str(page.get("last_edited_time") or "")
+        if not (page_id and last_edited):
+            continue
+        if last_edited == watermark.last_edited_time and page_key(page_id) in seen:
+            continue
+        edited_at[page_id] = last_edited
+
+    items = run_batch(
+        list(edited_at),
+        context=context,
+        template_page_id=template_page_id,
+        max_workers=max_workers,
+        report=report,
+    )
+    advanced = _advance(previous, watermark, edited_at, items)
+    if advanced != previous:
+        store.save(advanced, database_id=database_id)
+    return SweepResult(database_id, previous, advanced, items)
+
+
+def _advance(
+    previous: Watermark,
+    watermark: Watermark,
+    edited_at: Dict[str, str],
+    items: List[BatchItemResult],
+) -> Watermark:
+    if not edited_at:
+        return previous
+    failed = [edited_at[item.page_id] for item in items if not item.ok]
+    target = min(failed, key=_parse_time) if failed else max(edited_at.values(), key=_parse_time)
+    if previous.last_edited_time and _parse_time(target) < _parse_time(previous.last_edited_time):
+        # A --full sweep that failed on an old page must not move the
+        # watermark backwards past pages the stored one already covers.
+        return previous
+    succeeded = {item.page_id for item in items if item.ok}
+    done = [page_id for page_id, edited in edited_at.items() if edited == target and page_id in succeeded]
+    if target == watermark.last_edited_time:
+        done = list(dict.fromkeys([*watermark.seen_page_ids, *done]))
+    return Watermark(last_edited_time=target, seen_page_ids=tuple(done))
+
+
+def _parse_time(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
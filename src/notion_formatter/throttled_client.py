@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import httpx
+from notion_client import AsyncClient, Client
+from notion_client.client import ClientOptions
+from notion_client.errors import HTTPResponseError, RequestTimeoutError
+
+from .rate_limiter import RateLimiter, RequestStats, recording_stats
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRY_DELAY_SECONDS = 60.0
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    headers = getattr(error, "headers", None)
+    if headers is None:
+        return None
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _without_builtin_retries(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    # notion-client 3.x retries on its own, which would bypass the shared
+    # limiter and the counters; 2.x has no such option.
+    if "retry" in getattr(ClientOptions, "__dataclass_fields__", {}):
+        kwargs.setdefault("retry", False)
+    return kwargs
+
+
+def _is_idempotent(method: str, path: str) -> bool:
+    # Appending children and creating pages are the only writes this package
+    # issues that would duplicate content if a request that actually
+    # succeeded were sent again.
+    method = method.upper()
+    path = path.strip("/")
+    if method == "PATCH" and path.endswith("/children"):
+        return False
+    if method == "POST" and path == "pages":
+        return False
+    return True
+
+
+def retry_delay(error: Exception, attempt: int, method: str, path: str) -> Optional[float]:
+    """Return how long to wait before retrying, or None if ``error`` is final.
+
+    429 responses are always retried and honour ``Retry-After``; 5xx responses,
+    timeouts and connection errors are retried only for idempotent requests.
+    """
+
+    status = error.status if isinstance(error, HTTPResponseError) else None
+    if status == 429:
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after, MAX_RETRY_DELAY_SECONDS)
+    elif status in RETRYABLE_STATUS_CODES or isinstance(
+        error, (RequestTimeoutError, httpx.TransportError)
+    ):
+        if not _is_idempotent(method, path):
+            return None
+    else:
+        return None
+
+    base = min(MAX_RETRY_DELAY_SECONDS, 2.0**attempt)
+    return base / 2 + random.random() * base / 2
+
+
+def _is_throttled(error: Exception) -> bool:
+    return isinstance(error, HTTPResponseError) and error.status == 429
+
+
+class ThrottledClient(Client):
+    """Notion client that paces every request and retries transient failures."""
+
+    def __init__(
+        self,
+        *,
+        rate_limiter: RateLimiter,
+        stats: RequestStats,
+        retry_limit: int = 3,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**_without_builtin_retries(kwargs))
+        self._rate_limiter = rate_limiter
+        self._stats = stats
+        self._retry_limit = max(1, retry_limit)
+
+    @property
+    def stats(self) -> RequestStats:
+        return self._stats
+
+    def request(self, path: str, method: str, *args: Any, **kwargs: Any) -> Any:
+        attempt = 0
+        counters = recording_stats(self._stats)
+        while True:
+            self._rate_limiter.acquire()
+            for stats in counters:
+                stats.record_request(method, path)
+            try:
+                return super().request(path, method, *args, **kwargs)
+            except Exception as exc:
+                delay = retry_delay(exc, attempt, method, path)
+                attempt += 1
+                if delay is None or attempt >= self._retry_limit:
+                    for stats in counters:
+                        stats.record_failure()
+                    raise
+                throttled = _is_throttled(exc)
+                for stats in counters:
+                    stats.record_retry(throttled=throttled)
+                if throttled:
+                    self._rate_limiter.pause(delay)
+                time.sleep(delay)
+
+
+class ThrottledAsyncClient(AsyncClient):
+    """Async counterpart of :class:`ThrottledClient` sharing the same limiter."""
+
+    def __init__(
+        self,
+        *,
+        rate_limiter: RateLimiter,
+        stats: RequestStats,
+        retry_limit: int = 3,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**_without_builtin_retries(kwargs))
+        self._rate_limiter = rate_limiter
+        self._stats = stats
+        self._retry_limit = max(1, retry_limit)
+
+    @property
+    def stats(self) -> RequestStats:
+        return self._stats
+
+    async def request(self, path: str, method: str, *args: Any, **kwargs: Any) -> Any:
+        attempt = 0
+        counters = recording_stats(self._stats)
+        while True:
+            await self._rate_limiter.acquire_async()
+            for stats in counters:
+                stats.record_request(method, path)
+            try:
+                return await super().request(path, method, *args, **kwargs)
+            except Exception as exc:
+                delay = retry_delay(exc, attempt, method, path)
+                attempt += 1
+                if delay is None or attempt >= self._retry_limit:
+                    for stats in counters:
+                        stats.record_failure()
+                    raise
+                throttled = _is_throttled(exc)
+                for stats in counters:
+                    stats.record_retry(throttled=throttled)
+                if throttled:
+                    self._rate_limiter.pause(delay)
+                await asyncio.sleep(delay)
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .ai_client import AIResult
+from .page_snapshot import Block, page_key
+from .storage import atomic_write_text
+
+# Bump when the plan file layout changes; older journals are then ignored.
+JOURNAL_VERSION = 2
+
+
+class WriteJournal:
+    """Crash-safe record of one replace-mode page write.
+
+    ``plan.json`` is written before anything on the page changes and holds
+    the AI result, the converted blocks and the IDs of the blocks to archive
+    and to keep. ``progress.jsonl`` then gets one fsynced line per append
+    request Notion confirmed, with the IDs it created and how many of the
+    planned top-level blocks it covered. A resumed write appends the blocks
+    after ``appended_blocks`` without calling OpenAI or reading the sources
+    again.
+
+    A streamed write starts its journal before the AI result exists
+    (``generated`` is False) and records appends as they happen; the result
+    and blocks are filled in by :meth:`complete_generation` once the
+    stream ends. An interrupted write without them cannot be finished, only
+    undone.
+    """
+
+    def __init__(self, directory: Path, plan: Dict[str, Any]) -> None:
+        self._directory = directory
+        self._plan = plan
+        self._created: List[List[str]] = []
+        self._held: List[str] = []
+        self._appended = 0
+
+    @classmethod
+    def begin(
+        cls,
+        root: str | os.PathLike[str],
+        *,
+        page_id: str,
+        template_page_id: str,
+        ai_result: Optional[AIResult],
+        blocks: Optional[List[Block]],
+        archive_targets: List[str],
+        preserved: List[str],
+    ) -> "WriteJournal":
+        """Start a journal for ``page_id``, replacing any earlier one.
+
+        Pass ``None`` for ``ai_result`` and ``blocks`` when they are still
+        being generated.
+        """
+
+        directory = Path(root) / page_key(page_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        plan = {
+            "version": JOURNAL_VERSION,
+            "page_id": page_id,
+            "template_page_id": template_page_id,
+            "started_at": time.time(),
+            "ai_result": _result_payload(ai_result) if ai_result is not None else None,
+            "blocks": blocks,
+            "archive_targets": archive_targets,
+            "preserved": preserved,
+        }
+        (directory / "progress.jsonl").unlink(missing_ok=True)
+        atomic_write_text(directory / "plan.json", json.dumps(plan, ensure_ascii=False))
+        return cls(directory, plan)
+
+    @classmethod
+    def load(cls, root: str | os.PathLike[str], page_id: str) -> Optional["WriteJournal"]:
+        """The unfinished journal for ``page_id``, or None if there is none."""
+
+        directory = Path(root) / page_key(page_id)
+        try:
+            plan = json.loads((directory / "plan.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(plan, dict) or plan.get("version") != JOURNAL_VERSION:
+            return None
+        journal = cls(directory, plan)
+        try:
+            lines = (directory / "progress.jsonl").read_text(encoding="utf-8").splitlines()
+        except OSError:
+            lines = []
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A line torn by a crash was never confirmed.
+                break
+            if entry.get("request") != len(journal._created):
+                break
+            journal._created.append([str(block_id) for block_id in entry.get("created", [])])
+            journal._appended += int(entry.get("blocks", 0))
+        return journal
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    @property
+    def page_id(self) -> str:
+        return str(self._plan["page_id"])
+
+    @property
+    def template_page_id(self) -> str:
+        return str(self._plan.get("template_page_id", ""))
+
+    @property
+    def started_at(self) -> float:
+        return float(self._plan.get("started_at", 0.0))
+
+    @property
+    def generated(self) -> bool:
+        """Whether the AI result and blocks are recorded, so the write can be finished."""
+
+        return self._plan.get("ai_result") is not None and self._plan.get("blocks") is not None
+
+    @property
+    def ai_result(self) -> AIResult:
+        result = self._plan["ai_result"]
+        return AIResult(
+            formatted_markdown=result["formatted_markdown"],
+            is_complete=bool(result.get("is_complete")),
+            completion_message=str(result.get("completion_message", "")),
+        )
+
+    @property
+    def blocks(self) -> List[Block]:
+        return list(self._plan["blocks"])
+
+    @property
+    def archive_targets(self) -> List[str]:
+        return list(self._plan.get("archive_targets", []))
+
+    @property
+    def preserved(self) -> List[str]:
+        return list(self._plan.get("preserved", []))
+
+    @property
+    def completed_requests(self) -> int:
+        return len(self._created)
+
+    @property
+    def appended_blocks(self) -> int:
+        """How many of the planned top-level blocks are on the page."""
+
+        return self._appended
+
+    @property
+    def remaining_blocks(self) -> List[Block]:
+        return self.blocks[self._appended :]
+
+    @property
+    def created_ids(self) -> List[str]:
+        return [block_id for ids in self._created for block_id in ids]
+
+    def complete_generation(self, ai_result: AIResult, blocks: List[Block]) -> None:
+        """Record the finished AI result and blocks of a streamed write."""
+
+        self._plan = {**self._plan, "ai_result": _result_payload(ai_result), "blocks": blocks}
+        atomic_write_text(self._directory / "plan.json", json.dumps(self._plan, ensure_ascii=False))
+
+    def record_request(self, created_ids: List[str], block_count: int) -> None:
+        """Record the next confirmed append request, which completed ``block_count`` planned blocks.
+
+        A request that completed none (the first part of a block split over
+        several requests) is held back and written with the one that
+        completes the block, so after a crash in between its blocks count
+        as unconfirmed leftovers and the block is appended again whole.
+        """
+
+        self._held.extend(created_ids)
+        if not block_count:
+            return
+        created_ids, self._held = self._held, []
+        entry = {"request": len(self._created), "blocks": block_count, "created": created_ids}
+        with open(self._directory / "progress.jsonl", "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(entry) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        self._created.append(list(created_ids))
+        self._appended += block_count
+
+    def discard(self) -> None:
+        """Delete the journal once the write and the status update are done."""
+
+        for name in ("progress.jsonl", "plan.json"):
+            (self._directory / name).unlink(missing_ok=True)
+        try:
+            self._directory.rmdir()
+        except OSError:
+            pass
+
+
+def _result_payload(ai_result: AIResult) -> Dict[str, Any]:
+    return {
+        "formatted_markdown": ai_result.formatted_markdown,
+        "is_complete": ai_result.is_complete,
+        "completion_message": ai_result.completion_message,
+    }
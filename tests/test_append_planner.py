@@ -0,0 +1,265 @@
+from notion_formatter.append_planner import (
+    MAX_CHILDREN_PER_REQUEST,
+    MAX_RICH_TEXT_LENGTH,
+    MAX_REQUEST_BYTES,
+    MAX_RICH_TEXT_ELEMENTS,
+    fit_block,
+    fit_rich_text,
+    plan_append_requests,
+    split_rich_text,
+)
+
+
+def text(content, **annotations):
+    fragment = {"type": "text", "text": {"content": content}}
+    if annotations:
+        fragment["annotations"] = annotations
+    return fragment
+
+
+def paragraph(content, children=None):
+    data = {"rich_text": [text(content)]}
+    if children is not None:
+        data["children"] = children
+    return {"type": "paragraph", "paragraph": data}
+
+
+def toggle(content, children):
+    return {"type": "toggle", "toggle": {"rich_text": [text(content)], "children": children}}
+
+
+def test_blocks_are_packed_up_to_one_hundred_per_request():
+    blocks = [paragraph(str(index)) for index in range(250)]
+
+    requests = plan_append_requests(blocks)
+
+    assert [len(request.children) for request in requests] == [100, 100, 50]
+    assert [request.source_blocks for request in requests] == [100, 100, 50]
+    assert [block for request in requests for block in request.children] == blocks
+    assert all(not request.deferred for request in requests)
+
+
+def test_two_levels_of_nesting_stay_inline():
+    block = toggle("outer", [toggle("inner", [paragraph("leaf")])])
+
+    requests = plan_append_requests([block])
+
+    assert len(requests) == 1
+    assert requests[0].children == [block]
+    assert requests[0].deferred == {}
+
+
+def test_deeper_nesting_is_deferred_under_the_created_parent():
+    inner = toggle("inner", [toggle("deeper", [paragraph("leaf")])])
+    block = toggle("outer", [inner])
+
+    (request,) = plan_append_requests([paragraph("before"), block])
+
+    assert request.children[0] == paragraph("before")
+    assert "children" not in request.children[1]["toggle"]
+    assert request.deferred == {1: [inner]}
+
+
+def test_more_than_one_hundred_children_are_deferred():
+    children = [paragraph(str(index)) for index in range(MAX_CHILDREN_PER_REQUEST + 1)]
+
+    (request,) = plan_append_requests([toggle("parent", children)])
+
+    assert "children" not in request.children[0]["toggle"]
+    assert request.deferred == {0: children}
+
+
+def test_table_keeps_its_first_rows_inline():
+    rows = [
+        {"type": "table_row", "table_row": {"cells": [[text(str(index))]]}}
+        for index in range(MAX_CHILDREN_PER_REQUEST + 20)
+    ]
+    table = {"type": "table", "table": {"table_width": 1, "children": rows}}
+
+    (request,) = plan_append_requests([table])
+
+    assert request.children[0]["table"]["children"] == rows[:MAX_CHILDREN_PER_REQUEST]
+    assert request.deferred == {0: rows[MAX_CHILDREN_PER_REQUEST:]}
+
+
+def test_requests_are_cut_by_block_elements():
+    # A toggle with 10 nested paragraphs is 11 elements, so 90 of them
+    # (990 elements) fill a request before the 100-block limit does.
+    blocks = [toggle(str(index), [paragraph("x")] * 10) for index in range(150)]
+
+    requests = plan_append_requests(blocks)
+
+    assert [len(request.children) for request in requests] == [90, 60]
+
+
+def test_requests_are_cut_by_payload_size():
+    # Each paragraph carries 40 fragments of 2000 characters (~240KB as UTF-8).
+    big = {
+        "type": "paragraph",
+        "paragraph": {"rich_text": [text("あ" * MAX_RICH_TEXT_LENGTH) for _ in range(40)]},
+    }
+
+    requests = plan_append_requests([big, big, big])
+
+    assert [len(request.children) for request in requests] == [1, 1, 1]
+
+
+def test_payload_size_cut_leaves_room_under_the_limit():
+    fragment_count = 30
+    big = {
+        "type": "paragraph",
+        "paragraph": {
+            "rich_text": [text("a" * MAX_RICH_TEXT_LENGTH) for _ in range(fragment_count)]
+        },
+    }
+    per_block = fragment_count * MAX_RICH_TEXT_LENGTH
+
+    requests = plan_append_requests([big] * 10)
+
+    assert len(requests) > 1
+    assert all(len(request.children) * per_block <= MAX_REQUEST_BYTES for request in requests)
+    assert sum(len(request.children) for request in requests) == 10
+
+
+def test_long_text_is_split_keeping_annotations():
+    fragment = text("a" * (MAX_RICH_TEXT_LENGTH * 2 + 5), bold=True)
+
+    pieces = split_rich_text([fragment])
+
+    assert [len(piece["text"]["content"]) for piece in pieces] == [2000, 2000, 5]
+    assert all(piece["annotations"] == {"bold": True} for piece in pieces)
+
+
+def test_split_counts_utf16_code_units_and_keeps_surrogate_pairs_whole():
+    # "😀" is two UTF-16 code units, so 1000 of them fill one fragment.
+    content = "😀" * 1001
+
+    pieces = split_rich_text([text(content)])
+
+    assert [piece["text"]["content"] for piece in pieces] == ["😀" * 1000, "😀"]
+
+
+def test_short_text_is_returned_unchanged():
+    rich_text = [text("short"), {"type": "mention", "mention": {"type": "date"}}]
+    block = paragraph("short")
+
+    assert split_rich_text(rich_text) is rich_text
+    assert fit_rich_text(block) is block
+
+
+def test_fit_rich_text_splits_captions_cells_and_nested_children():
+    long = "a" * (MAX_RICH_TEXT_LENGTH + 1)
+    code = {"type": "code", "code": {"rich_text": [text("x")], "caption": [text(long)]}}
+    row = {"type": "table_row", "table_row": {"cells": [[text(long)], [text("ok")]]}}
+    nested = toggle("outer", [paragraph(long)])
+
+    assert len(fit_rich_text(code)["code"]["caption"]) == 2
+    assert [len(cell) for cell in fit_rich_text(row)["table_row"]["cells"]] == [2, 1]
+    assert len(fit_rich_text(nested)["toggle"]["children"][0]["paragraph"]["rich_text"]) == 2
+    assert nested["toggle"]["children"][0]["paragraph"]["rich_text"] == [text(long)]
+
+
+def fragments(count):
+    return [text(str(index)) for index in range(count)]
+
+
+def test_block_within_the_element_limit_is_its_own_only_piece():
+    block = {"type": "paragraph", "paragraph": {"rich_text": fragments(MAX_RICH_TEXT_ELEMENTS)}}
+
+    assert fit_block(block) == [block]
+
+
+def test_paragraph_overflow_continues_in_sibling_paragraphs():
+    rich_text = fragments(250)
+    child = paragraph("child")
+    block = {"type": "paragraph", "paragraph": {"rich_text": rich_text, "children": [child]}}
+
+    pieces = fit_block(block)
+
+    assert [piece["type"] for piece in pieces] == ["paragraph"] * 3
+    assert [piece["paragraph"]["rich_text"] for piece in pieces] == [
+        rich_text[:100],
+        rich_text[100:200],
+        rich_text[200:],
+    ]
+    # Only the last piece keeps the nested children.
+    assert [piece["paragraph"].get("children") for piece in pieces] == [None, None, [child]]
+
+
+def test_code_overflow_keeps_language_and_puts_the_caption_last():
+    caption = [text("caption")]
+    block = {
+        "type": "code",
+        "code": {"rich_text": fragments(150), "language": "python", "caption": caption},
+    }
+
+    pieces = fit_block(block)
+
+    assert [piece["code"]["language"] for piece in pieces] == ["python", "python"]
+    assert [piece["code"].get("caption") for piece in pieces] == [None, caption]
+
+
+def test_list_item_overflow_continues_in_nested_first_paragraphs():
+    rich_text = fragments(150)
+    child = paragraph("child")
+    block = {
+        "type": "bulleted_list_item",
+        "bulleted_list_item": {"rich_text": rich_text, "children": [child]},
+    }
+
+    (piece,) = fit_block(block)
+
+    data = piece["bulleted_list_item"]
+    assert data["rich_text"] == rich_text[:100]
+    assert data["children"] == [
+        {"type": "paragraph", "paragraph": {"rich_text": rich_text[100:]}},
+        child,
+    ]
+
+
+def test_heading_overflow_continues_in_following_paragraphs():
+    rich_text = fragments(150)
+    block = {"type": "heading_2", "heading_2": {"rich_text": rich_text}}
+
+    pieces = fit_block(block)
+
+    assert pieces == [
+        {"type": "heading_2", "heading_2": {"rich_text": rich_text[:100]}},
+        {"type": "paragraph", "paragraph": {"rich_text": rich_text[100:]}},
+    ]
+
+
+def test_overflow_from_long_fragments_and_in_nested_children():
+    # 60 fragments of 4000 characters split into 120 of 2000.
+    long_child = {
+        "type": "paragraph",
+        "paragraph": {"rich_text": [text("a" * 4000) for _ in range(60)]},
+    }
+    block = toggle("outer", [long_child])
+
+    (piece,) = fit_block(block)
+
+    children = piece["toggle"]["children"]
+    assert [len(child["paragraph"]["rich_text"]) for child in children] == [100, 20]
+
+
+def test_pieces_of_one_block_stay_in_one_request_when_they_fit():
+    blocks = [paragraph(str(index)) for index in range(99)]
+    blocks.append({"type": "paragraph", "paragraph": {"rich_text": fragments(150)}})
+
+    requests = plan_append_requests(blocks)
+
+    # The last block's two pieces do not fit after 99 blocks, so they move
+    # to the next request together and count as one completed block there.
+    assert [len(request.children) for request in requests] == [99, 2]
+    assert [request.source_blocks for request in requests] == [99, 1]
+
+
+def test_block_split_over_several_requests_completes_in_the_last_one():
+    rich_text = fragments(MAX_RICH_TEXT_ELEMENTS * 150)
+    block = {"type": "paragraph", "paragraph": {"rich_text": rich_text}}
+
+    requests = plan_append_requests([paragraph("before"), block])
+
+    assert [request.source_blocks for request in requests] == [1, 0, 1]
+    assert sum(len(request.children) for request in requests[1:]) == 150
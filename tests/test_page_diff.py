@@ -0,0 +1,255 @@
+import json
+import re
+
+import httpx
+
+from notion_formatter.notion_service import NotionService, insert_anchor
+from notion_formatter.page_diff import (
+    BlockInsert,
+    block_signature,
+    blocks_match,
+    plan_page_diff,
+    update_payload,
+)
+from notion_formatter.page_snapshot import PageSnapshot
+from notion_formatter.rate_limiter import RateLimiter
+
+PAGE_ID = "page"
+
+
+def text(content, color="default"):
+    return {"type": "text", "text": {"content": content}, "annotations": {"color": color}}
+
+
+def block(block_type, content, block_id=None, **data):
+    result = {"type": block_type, block_type: {"rich_text": [text(content)], **data}}
+    if block_id is not None:
+        result["id"] = block_id
+    return result
+
+
+def table(rows):
+    return {
+        "type": "table",
+        "table": {
+            "table_width": len(rows[0]),
+            "has_column_header": True,
+            "has_row_header": False,
+            "children": [
+                {"type": "table_row", "table_row": {"cells": [[text(cell)] for cell in row]}}
+                for row in rows
+            ],
+        },
+    }
+
+
+def snapshot_of(existing, children=None):
+    return PageSnapshot.from_tree(PAGE_ID, {PAGE_ID: existing, **(children or {})})
+
+
+def plan_for(existing, new, *, children=None, initial_anchor="before"):
+    snapshot = snapshot_of(existing, children)
+    return plan_page_diff(existing, new, snapshot=snapshot, initial_anchor=initial_anchor)
+
+
+def test_identical_blocks_plan_nothing():
+    existing = [block("heading_2", "概要", "h"), block("paragraph", "本文", "p")]
+    new = [block("heading_2", "概要"), block("paragraph", "本文")]
+
+    assert plan_for(existing, new).is_empty
+    assert blocks_match(existing, new, snapshot=snapshot_of(existing))
+
+
+def test_changed_text_of_the_same_type_is_updated_in_place():
+    existing = [block("heading_2", "概要", "h"), block("paragraph", "古い本文", "p")]
+    new = [block("heading_2", "概要"), block("paragraph", "新しい本文")]
+
+    plan = plan_for(existing, new)
+
+    assert [(update.block_id, update.block) for update in plan.updates] == [("p", new[1])]
+    assert plan.inserts == []
+    assert plan.archives == []
+
+
+def test_changed_type_is_archived_and_inserted_after_the_previous_block():
+    existing = [block("heading_2", "概要", "h"), block("paragraph", "項目", "p")]
+    new = [block("heading_2", "概要"), block("bulleted_list_item", "項目")]
+
+    plan = plan_for(existing, new)
+
+    assert plan.updates == []
+    assert plan.archives == ["p"]
+    assert plan.inserts == [BlockInsert(blocks=[new[1]], after_block_id="h")]
+
+
+def test_block_with_children_on_the_page_is_replaced_not_updated():
+    existing = [block("heading_2", "a", "a"), block("toggle", "t", "t")]
+    existing[1]["has_children"] = True
+    new = [block("heading_2", "a"), block("toggle", "t2")]
+
+    plan = plan_for(existing, new, children={"t": [block("paragraph", "child", "c")]})
+
+    assert plan.updates == []
+    assert plan.archives == ["t"]
+    assert plan.inserts == [BlockInsert(blocks=[new[1]], after_block_id="a")]
+
+
+def test_only_removed_blocks_are_archived():
+    existing = [block("paragraph", name, name) for name in ("a", "b", "c")]
+    new = [block("paragraph", "a"), block("paragraph", "c")]
+
+    plan = plan_for(existing, new)
+
+    assert plan.archives == ["b"]
+    assert plan.updates == []
+    assert plan.inserts == []
+
+
+def test_leading_insert_goes_after_the_initial_anchor():
+    existing = [block("paragraph", "b", "b")]
+    new = [block("divider", ""), block("paragraph", "b")]
+
+    plan = plan_for(existing, new)
+
+    assert plan.inserts == [BlockInsert(blocks=[new[0]], after_block_id="before")]
+
+
+def test_each_run_of_new_blocks_is_anchored_on_the_kept_block_before_it():
+    existing = [block("paragraph", "a", "a"), block("paragraph", "b", "b")]
+    new = [
+        block("heading_2", "first"),
+        block("paragraph", "a"),
+        block("divider", ""),
+        block("quote", "second"),
+        block("paragraph", "b"),
+        block("paragraph", "last"),
+    ]
+
+    plan = plan_for(existing, new)
+
+    assert plan.updates == []
+    assert plan.archives == []
+    assert plan.inserts == [
+        BlockInsert(blocks=[new[0]], after_block_id="before"),
+        BlockInsert(blocks=new[2:4], after_block_id="a"),
+        BlockInsert(blocks=[new[5]], after_block_id="b"),
+    ]
+
+
+def test_updated_block_anchors_the_insert_after_it():
+    existing = [block("paragraph", "a", "a"), block("heading_3", "gone", "g")]
+    new = [block("paragraph", "a changed"), block("divider", "")]
+
+    plan = plan_for(existing, new)
+
+    assert [update.block_id for update in plan.updates] == ["a"]
+    assert plan.archives == ["g"]
+    assert plan.inserts == [BlockInsert(blocks=[new[1]], after_block_id="a")]
+
+
+def test_insert_anchor_resolves_inserts_chained_to_earlier_ones():
+    first = BlockInsert(blocks=[block("paragraph", "x")], after_block_id="a")
+    chained = BlockInsert(blocks=[block("paragraph", "y")], after_insert=0)
+
+    assert insert_anchor(first, []) == "a"
+    assert insert_anchor(chained, ["created-x"]) == "created-x"
+
+
+def test_tables_compare_cells_and_width():
+    header = ["名前", "値"]
+    existing = [{"id": "t", "has_children": True, **table([header, ["a", "1"]])}]
+    rows = existing[0]["table"].pop("children")
+    for index, row in enumerate(rows):
+        row["id"] = f"row-{index}"
+    snapshot = snapshot_of(existing, {"t": rows})
+
+    wider = table([[*header, "備考"], ["a", "1", ""]])
+    assert blocks_match(existing, [table([header, ["a", "1"]])], snapshot=snapshot)
+    assert not blocks_match(existing, [table([header, ["a", "2"]])], snapshot=snapshot)
+    assert not blocks_match(existing, [wider], snapshot=snapshot)
+
+
+def test_signature_includes_colour_and_checked_state():
+    red = {"type": "paragraph", "paragraph": {"rich_text": [text("x", "red")]}}
+
+    assert block_signature(block("to_do", "task", checked=False)) != block_signature(
+        block("to_do", "task", checked=True)
+    )
+    assert block_signature(red) != block_signature(block("paragraph", "x"))
+
+
+def test_update_payload_drops_children_and_splits_long_text():
+    long_block = block("paragraph", "あ" * 2500, children=[block("paragraph", "child")])
+
+    payload = update_payload(long_block)
+
+    assert list(payload) == ["paragraph"]
+    assert "children" not in payload["paragraph"]
+    contents = [fragment["text"]["content"] for fragment in payload["paragraph"]["rich_text"]]
+    assert [len(content) for content in contents] == [2000, 500]
+
+
+def test_blocks_overflowing_rich_text_are_compared_as_written():
+    fragments = [text(str(index)) for index in range(150)]
+    new = [{"type": "paragraph", "paragraph": {"rich_text": fragments}}]
+    existing = [
+        {"id": "p1", "type": "paragraph", "paragraph": {"rich_text": fragments[:100]}},
+        {"id": "p2", "type": "paragraph", "paragraph": {"rich_text": fragments[100:]}},
+    ]
+
+    assert blocks_match(existing, new, snapshot=snapshot_of(existing))
+    assert plan_for(existing, new).is_empty
+
+
+class FakeNotion:
+    """Answers block appends and updates, numbering the created blocks."""
+
+    def __init__(self):
+        self.appends = []
+        self.updates = []
+        self._created = 0
+
+    def __call__(self, request):
+        body = json.loads(request.content or b"{}")
+        appended = re.fullmatch(r"/v1/blocks/([^/]+)/children", request.url.path)
+        if request.method == "PATCH" and appended:
+            self.appends.append((appended.group(1), body.get("after"), len(body["children"])))
+            results = []
+            for _ in body["children"]:
+                self._created += 1
+                results.append({"object": "block", "id": f"new-{self._created}"})
+            return httpx.Response(200, json={"object": "list", "results": results})
+        if request.method == "PATCH":
+            self.updates.append((request.url.path.rsplit("/", 1)[-1], body))
+            return httpx.Response(200, json={"object": "block"})
+        error = {"object": "error", "status": 404, "code": "object_not_found", "message": "?"}
+        return httpx.Response(404, json=error)
+
+
+def test_diff_write_chains_split_inserts_after_the_last_created_block():
+    notion = FakeNotion()
+    service = NotionService(
+        "secret",
+        rate_limiter=RateLimiter(1000.0, burst=1000),
+        base_url="https://notion.test",
+        transport=httpx.MockTransport(notion),
+    )
+    existing = [
+        block("callout", "解決したい課題", "lead"),
+        block("paragraph", "a", "a"),
+        block("paragraph", "old", "old"),
+    ]
+    existing[2]["has_children"] = True
+    snapshot = snapshot_of(existing, {"old": [block("paragraph", "child", "c")]})
+    inserted = [block("bulleted_list_item", str(index)) for index in range(150)]
+
+    report = service.update_page_content(
+        PAGE_ID, [block("paragraph", "a"), *inserted], snapshot=snapshot
+    )
+
+    # 150 new blocks take two append requests; the second goes after the
+    # last block the first one created, not after the original anchor.
+    assert notion.appends == [(PAGE_ID, "a", 100), (PAGE_ID, "new-100", 50)]
+    assert notion.updates == [("old", {"archived": True})]
+    assert report.inserted == 150
+    assert report.ok
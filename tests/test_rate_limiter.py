@@ -0,0 +1,205 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from notion_client.errors import HTTPResponseError
+
+from notion_formatter import rate_limiter, throttled_client
+from notion_formatter.rate_limiter import (
+    RateLimiter,
+    RequestStats,
+    bind_request_tracking,
+    endpoint_key,
+    shared_rate_limiter,
+    track_requests,
+)
+from notion_formatter.throttled_client import ThrottledClient, retry_delay
+
+BLOCK_ID = "1234abcd-0000-0000-0000-00000000abcd"
+
+
+class FakeClock:
+    """Monotonic time that only moves when something sleeps."""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    module = SimpleNamespace(monotonic=fake.monotonic, sleep=fake.sleep, time=fake.time)
+    monkeypatch.setattr(rate_limiter, "time", module)
+    monkeypatch.setattr(throttled_client, "time", module)
+    return fake
+
+
+def test_rate_must_be_positive():
+    with pytest.raises(ValueError):
+        RateLimiter(0)
+
+
+def test_burst_is_served_at_once_then_paced_at_the_rate(clock):
+    limiter = RateLimiter(2.0, burst=3)
+
+    for _ in range(3):
+        limiter.acquire()
+    assert clock.sleeps == []
+
+    limiter.acquire()
+    limiter.acquire()
+
+    assert clock.sleeps == [0.5, 0.5]
+
+
+def test_idle_time_refills_up_to_the_burst(clock):
+    limiter = RateLimiter(4.0)
+    for _ in range(4):
+        limiter.acquire()
+
+    clock.now += 60
+    for _ in range(4):
+        limiter.acquire()
+    assert clock.sleeps == []
+
+    limiter.acquire()
+    assert clock.sleeps == [0.25]
+
+
+def test_pause_holds_back_every_caller(clock):
+    limiter = RateLimiter(4.0)
+
+    limiter.pause(2.0)
+    limiter.acquire()
+
+    # The bucket is empty after the pause, so one token's refill follows it.
+    assert clock.sleeps == [2.0, 0.25]
+
+
+def test_async_acquire_waits_like_the_sync_one(clock, monkeypatch):
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", fake_sleep)
+    limiter = RateLimiter(4.0, burst=1)
+
+    async def acquire_twice():
+        await limiter.acquire_async()
+        await limiter.acquire_async()
+
+    asyncio.run(acquire_twice())
+
+    assert slept == [0.25]
+
+
+def test_endpoint_key_collapses_ids():
+    assert endpoint_key("patch", f"/blocks/{BLOCK_ID}/children") == "PATCH blocks/{id}/children"
+    assert endpoint_key("GET", f"pages/{BLOCK_ID.replace('-', '')}") == "GET pages/{id}"
+    assert endpoint_key("POST", "search") == "POST search"
+
+
+def test_stats_count_requests_retries_and_failures():
+    stats = RequestStats()
+    stats.record_request("GET", f"blocks/{BLOCK_ID}/children")
+    stats.record_request("GET", f"blocks/{BLOCK_ID}/children")
+    stats.record_retry(throttled=True)
+    stats.record_retry(throttled=False)
+    stats.record_failure()
+
+    assert stats.snapshot() == {
+        "requests": 2,
+        "by_endpoint": {"GET blocks/{id}/children": 2},
+        "throttled": 1,
+        "retried": 2,
+        "failed": 1,
+    }
+
+
+def test_shared_limiter_is_one_per_rate():
+    assert shared_rate_limiter(7.0) is shared_rate_limiter(7.0)
+    assert shared_rate_limiter(7.0) is not shared_rate_limiter(8.0)
+
+
+def test_tracking_counts_only_the_current_context_and_bound_threads():
+    service_stats = RequestStats()
+
+    def request():
+        for stats in rate_limiter.recording_stats(service_stats):
+            stats.record_request("GET", "users")
+
+    with track_requests() as tracked:
+        request()
+        worker = threading.Thread(target=bind_request_tracking(request))
+        worker.start()
+        worker.join()
+        unbound = threading.Thread(target=request)
+        unbound.start()
+        unbound.join()
+    request()
+
+    assert tracked.snapshot()["requests"] == 2
+    assert service_stats.snapshot()["requests"] == 4
+
+
+def response_error(status, headers=None):
+    # The constructor differs between notion-client releases; retry_delay
+    # only reads ``status`` and ``headers``.
+    error = HTTPResponseError.__new__(HTTPResponseError)
+    error.status = status
+    error.headers = httpx.Headers(headers or {})
+    return error
+
+
+def test_retry_delay_honours_retry_after_and_idempotency():
+    throttled = response_error(429, {"retry-after": "7"})
+    assert retry_delay(throttled, 0, "PATCH", "blocks/x/children") == 7.0
+    assert retry_delay(response_error(429, {"retry-after": "600"}), 0, "GET", "pages/x") == 60.0
+    assert retry_delay(response_error(503), 0, "GET", "pages/x") is not None
+    # Appends and page creation are not retried after a server error,
+    # since the first attempt may have gone through.
+    assert retry_delay(response_error(503), 0, "PATCH", "blocks/x/children") is None
+    assert retry_delay(response_error(503), 0, "POST", "pages") is None
+    assert retry_delay(response_error(400), 0, "GET", "pages/x") is None
+
+
+def test_throttled_client_retries_a_429_after_pausing_the_limiter(clock):
+    responses = [
+        httpx.Response(
+            429,
+            headers={"retry-after": "2"},
+            json={"object": "error", "status": 429, "code": "rate_limited", "message": "slow"},
+        ),
+        httpx.Response(200, json={"object": "page", "id": BLOCK_ID}),
+    ]
+    limiter = RateLimiter(4.0)
+    stats = RequestStats()
+    client = ThrottledClient(
+        auth="secret",
+        rate_limiter=limiter,
+        stats=stats,
+        client=httpx.Client(transport=httpx.MockTransport(lambda request: responses.pop(0))),
+    )
+
+    page = client.pages.retrieve(page_id=BLOCK_ID)
+
+    assert page["id"] == BLOCK_ID
+    assert stats.snapshot()["requests"] == 2
+    assert stats.snapshot()["throttled"] == 1
+    # The retry waits out Retry-After, then the limiter's emptied bucket.
+    assert clock.sleeps == [2.0, 0.25]
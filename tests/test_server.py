@@ -0,0 +1,167 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from notion_formatter import server
+from notion_formatter.server import JobQueue, QueueFullError
+
+PAGE_ID = "1234abcd-0000-0000-0000-00000000abcd"
+OTHER_PAGE_ID = "5678abcd-0000-0000-0000-00000000abcd"
+
+
+class FakePipeline:
+    """Stands in for ``run_pipeline``; runs block until ``release`` is set."""
+
+    def __init__(self, *, fail=False):
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self._fail = fail
+        self._lock = threading.Lock()
+
+    def __call__(self, page_id, template_page_id=None, *, context=None):
+        with self._lock:
+            self.calls.append((page_id, template_page_id))
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        self.started.set()
+        try:
+            self.release.wait(5)
+            if self._fail:
+                raise RuntimeError("boom")
+            return SimpleNamespace(block_count=1, is_complete=True)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    fake = FakePipeline()
+    monkeypatch.setattr(server, "run_pipeline", fake)
+    return fake
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_triggers_for_a_queued_page_are_merged_into_one_job(pipeline):
+    jobs = JobQueue(object(), debounce_seconds=0.0)
+
+    first = jobs.submit(PAGE_ID)
+    second = jobs.submit(PAGE_ID.replace("-", "").upper(), "template")
+    third = jobs.submit(PAGE_ID)
+
+    assert first is second is third
+    assert first.triggers == 3
+    assert first.template_page_id == "template"
+    assert jobs.stats()["queued"] == 1
+    assert jobs.job_for(PAGE_ID) is first
+
+
+def test_each_trigger_pushes_the_start_back(pipeline):
+    jobs = JobQueue(object(), debounce_seconds=30.0)
+
+    job = jobs.submit(PAGE_ID)
+    first_run_after = job.run_after
+    time.sleep(0.01)
+    jobs.submit(PAGE_ID)
+
+    assert job.run_after > first_run_after
+    assert job.run_after >= time.monotonic() + 29.0
+
+
+def test_queue_full_rejects_new_pages_but_still_merges(pipeline):
+    jobs = JobQueue(object(), max_pending=1)
+    job = jobs.submit(PAGE_ID)
+
+    with pytest.raises(QueueFullError):
+        jobs.submit(OTHER_PAGE_ID)
+    assert jobs.submit(PAGE_ID) is job
+
+
+def test_coalesced_job_runs_once(pipeline):
+    pipeline.release.set()
+    jobs = JobQueue(object(), workers=2, debounce_seconds=0.05)
+    for _ in range(5):
+        jobs.submit(PAGE_ID)
+    jobs.start()
+
+    wait_for(lambda: jobs.job_for(PAGE_ID).status == "succeeded")
+    jobs.shutdown()
+
+    assert pipeline.calls == [(PAGE_ID, None)]
+    assert jobs.job_for(PAGE_ID).triggers == 5
+
+
+def test_trigger_during_a_run_queues_one_follow_up_after_it(pipeline):
+    jobs = JobQueue(object(), workers=2, debounce_seconds=0.0)
+    jobs.start()
+    running = jobs.submit(PAGE_ID)
+    assert pipeline.started.wait(5)
+
+    follow_up = jobs.submit(PAGE_ID)
+    assert jobs.submit(PAGE_ID) is follow_up
+    time.sleep(0.1)
+
+    # The idle second worker must not start the follow-up yet.
+    assert follow_up is not running
+    assert follow_up.status == "queued"
+    assert jobs.stats() == {"queued": 1, "running": 1, "succeeded": 0, "failed": 0, "workers": 2}
+
+    pipeline.release.set()
+    wait_for(lambda: follow_up.status == "succeeded")
+    jobs.shutdown()
+
+    assert running.status == "succeeded"
+    assert follow_up.triggers == 2
+    assert len(pipeline.calls) == 2
+    assert pipeline.max_running == 1
+
+
+def test_different_pages_run_concurrently(pipeline):
+    jobs = JobQueue(object(), workers=2, debounce_seconds=0.0)
+    jobs.start()
+    jobs.submit(PAGE_ID)
+    jobs.submit(OTHER_PAGE_ID)
+
+    wait_for(lambda: pipeline.running == 2)
+    pipeline.release.set()
+    jobs.shutdown()
+
+    assert jobs.stats()["succeeded"] == 2
+
+
+def test_failed_run_is_recorded(monkeypatch):
+    pipeline = FakePipeline(fail=True)
+    pipeline.release.set()
+    monkeypatch.setattr(server, "run_pipeline", pipeline)
+    jobs = JobQueue(object(), debounce_seconds=0.0)
+    jobs.start()
+
+    job = jobs.submit(PAGE_ID)
+    wait_for(lambda: job.status == "failed")
+    jobs.shutdown()
+
+    assert job.error == "RuntimeError: boom"
+    assert jobs.stats()["failed"] == 1
+
+
+def test_shutdown_runs_debounced_jobs_without_waiting(pipeline):
+    pipeline.release.set()
+    jobs = JobQueue(object(), debounce_seconds=60.0)
+    jobs.start()
+    job = jobs.submit(PAGE_ID)
+
+    jobs.shutdown()
+
+    assert job.status == "succeeded"
+    assert pipeline.calls == [(PAGE_ID, None)]
@@ -0,0 +1,183 @@
+from types import SimpleNamespace
+
+import pytest
+
+from notion_formatter import sweep
+from notion_formatter.batch import BatchItemResult
+from notion_formatter.runner import PipelineError
+from notion_formatter.sweep import Watermark, WatermarkStore, _advance, run_sweep, sweep_filter
+
+DATABASE_ID = "database"
+
+
+def item(page_id, ok=True):
+    return BatchItemResult(page_id, None, None if ok else "failed", 0.0)
+
+
+def test_advances_to_the_newest_page_and_remembers_the_pages_in_its_minute():
+    previous = Watermark("2024-05-01T10:00:00.000Z", ("old",))
+    edited_at = {
+        "a": "2024-05-01T10:05:00.000Z",
+        "b": "2024-05-01T10:07:00.000Z",
+        "c": "2024-05-01T10:07:00.000Z",
+    }
+
+    advanced = _advance(previous, previous, edited_at, [item("a"), item("b"), item("c")])
+
+    assert advanced == Watermark("2024-05-01T10:07:00.000Z", ("b", "c"))
+
+
+def test_pages_in_the_same_minute_add_to_the_seen_ids():
+    previous = Watermark("2024-05-01T10:07:00.000Z", ("b",))
+    edited_at = {"c": "2024-05-01T10:07:00.000Z"}
+
+    advanced = _advance(previous, previous, edited_at, [item("c")])
+
+    assert advanced == Watermark("2024-05-01T10:07:00.000Z", ("b", "c"))
+
+
+def test_nothing_swept_keeps_the_watermark():
+    previous = Watermark("2024-05-01T10:07:00.000Z", ("b",))
+
+    assert _advance(previous, previous, {}, []) is previous
+
+
+def test_failure_holds_the_watermark_at_the_oldest_failed_page():
+    previous = Watermark("2024-05-01T10:00:00.000Z")
+    edited_at = {
+        "a": "2024-05-01T10:05:00.000Z",
+        "b": "2024-05-01T10:06:00.000Z",
+        "c": "2024-05-01T10:06:00.000Z",
+        "d": "2024-05-01T10:09:00.000Z",
+    }
+    items = [item("a"), item("b"), item("c", ok=False), item("d", ok=False)]
+
+    advanced = _advance(previous, previous, edited_at, items)
+
+    # "b" shares the failed page's minute and succeeded, so only "c" and
+    # the pages after it are picked up again.
+    assert advanced == Watermark("2024-05-01T10:06:00.000Z", ("b",))
+
+
+def test_timestamps_compare_as_times_not_strings():
+    previous = Watermark()
+    edited_at = {"a": "2024-05-01T10:05:00.000+09:00", "b": "2024-05-01T02:00:00.000Z"}
+
+    advanced = _advance(previous, previous, edited_at, [item("a"), item("b")])
+
+    assert advanced.last_edited_time == "2024-05-01T02:00:00.000Z"
+
+
+def test_full_sweep_failing_on_an_old_page_does_not_move_the_watermark_back():
+    previous = Watermark("2024-05-01T10:00:00.000Z", ("x",))
+    edited_at = {"old": "2024-04-01T09:00:00.000Z", "new": "2024-05-01T11:00:00.000Z"}
+
+    advanced = _advance(previous, Watermark(), edited_at, [item("old", ok=False), item("new")])
+
+    assert advanced is previous
+
+
+def test_full_sweep_that_succeeds_moves_the_watermark_forward():
+    previous = Watermark("2024-05-01T10:00:00.000Z", ("x",))
+    edited_at = {"old": "2024-04-01T09:00:00.000Z", "new": "2024-05-01T11:00:00.000Z"}
+
+    advanced = _advance(previous, Watermark(), edited_at, [item("old"), item("new")])
+
+    assert advanced == Watermark("2024-05-01T11:00:00.000Z", ("new",))
+
+
+def test_filter_without_a_watermark_only_matches_the_status():
+    assert sweep_filter("レビュー状況", "レビュー中", Watermark()) == {
+        "property": "レビュー状況",
+        "status": {"equals": "レビュー中"},
+    }
+
+
+def test_filter_includes_the_watermark_minute():
+    watermark = Watermark("2024-05-01T10:07:00.000Z", ("b",))
+
+    filter = sweep_filter("レビュー状況", "レビュー中", watermark)
+
+    assert filter["and"][1] == {
+        "timestamp": "last_edited_time",
+        "last_edited_time": {"on_or_after": "2024-05-01T10:07:00.000Z"},
+    }
+
+
+def test_store_round_trips_and_tolerates_a_missing_file(tmp_path):
+    store = WatermarkStore(tmp_path / "sweep" / "state.json")
+
+    assert store.load() == Watermark()
+
+    store.save(Watermark("2024-05-01T10:07:00.000Z", ("b", "c")), database_id=DATABASE_ID)
+
+    assert store.load() == Watermark("2024-05-01T10:07:00.000Z", ("b", "c"))
+
+
+def sweep_context(pages, queries):
+    def query_database(database_id, *, filter=None, sorts=None):
+        queries.append(filter)
+        return pages
+
+    return SimpleNamespace(
+        settings=SimpleNamespace(review_status_property_name="レビュー状況"),
+        notion=SimpleNamespace(query_database=query_database),
+    )
+
+
+def fake_batch(failing=()):
+    swept = []
+
+    def run_batch(page_ids, **kwargs):
+        swept.append(list(page_ids))
+        return [item(page_id, ok=page_id not in failing) for page_id in page_ids]
+
+    return run_batch, swept
+
+
+def test_sweep_skips_pages_already_seen_in_the_watermark_minute(tmp_path, monkeypatch):
+    store = WatermarkStore(tmp_path / "state.json")
+    store.save(Watermark("2024-05-01T10:07:00.000Z", ("b",)), database_id=DATABASE_ID)
+    pages = [
+        {"id": "b", "last_edited_time": "2024-05-01T10:07:00.000Z"},
+        {"id": "c", "last_edited_time": "2024-05-01T10:07:00.000Z"},
+        {"id": "d", "last_edited_time": "2024-05-01T10:08:00.000Z"},
+    ]
+    queries = []
+    run_batch, swept = fake_batch()
+    monkeypatch.setattr(sweep, "run_batch", run_batch)
+
+    result = run_sweep(DATABASE_ID, context=sweep_context(pages, queries), store=store)
+
+    assert swept == [["c", "d"]]
+    assert queries[0]["and"][1]["last_edited_time"] == {"on_or_after": "2024-05-01T10:07:00.000Z"}
+    assert result.watermark == Watermark("2024-05-01T10:08:00.000Z", ("d",))
+    assert store.load() == result.watermark
+
+
+def test_full_sweep_ignores_the_watermark_but_never_rewinds_it(tmp_path, monkeypatch):
+    store = WatermarkStore(tmp_path / "state.json")
+    stored = Watermark("2024-05-01T10:07:00.000Z", ("b",))
+    store.save(stored, database_id=DATABASE_ID)
+    pages = [
+        {"id": "old", "last_edited_time": "2024-04-01T09:00:00.000Z"},
+        {"id": "b", "last_edited_time": "2024-05-01T10:07:00.000Z"},
+    ]
+    queries = []
+    run_batch, swept = fake_batch(failing={"old"})
+    monkeypatch.setattr(sweep, "run_batch", run_batch)
+
+    result = run_sweep(DATABASE_ID, context=sweep_context(pages, queries), store=store, full=True)
+
+    assert "and" not in queries[0]
+    assert swept == [["old", "b"]]
+    assert [failed.page_id for failed in result.failed] == ["old"]
+    assert result.watermark == stored
+    assert store.load() == stored
+
+
+def test_sweep_needs_the_review_status_property(tmp_path):
+    context = SimpleNamespace(settings=SimpleNamespace(review_status_property_name=""))
+
+    with pytest.raises(PipelineError):
+        run_sweep(DATABASE_ID, context=context, store=WatermarkStore(tmp_path / "state.json"))
@@ -0,0 +1,163 @@
+import json
+
+from notion_formatter.ai_client import AIResult
+from notion_formatter.notion_service import resume_archive_targets, restore_updates
+from notion_formatter.write_journal import WriteJournal
+
+PAGE_ID = "1234abcd-0000-0000-0000-00000000abcd"
+RESULT = AIResult(formatted_markdown="# 整形済み", is_complete=True, completion_message="完了")
+
+
+def paragraph(content):
+    fragment = {"type": "text", "text": {"content": content}}
+    return {"type": "paragraph", "paragraph": {"rich_text": [fragment]}}
+
+
+BLOCKS = [paragraph(str(index)) for index in range(4)]
+
+
+def begin(root, *, streamed=False):
+    return WriteJournal.begin(
+        root,
+        page_id=PAGE_ID,
+        template_page_id="template",
+        ai_result=None if streamed else RESULT,
+        blocks=None if streamed else BLOCKS,
+        archive_targets=["old-1", "old-2"],
+        preserved=["lead"],
+    )
+
+
+def live(*block_ids):
+    return [{"id": block_id} for block_id in block_ids]
+
+
+def test_journal_round_trips_the_plan_and_progress(tmp_path):
+    journal = begin(tmp_path)
+    journal.record_request(["new-1", "new-2"], 2)
+
+    loaded = WriteJournal.load(tmp_path, PAGE_ID.replace("-", "").upper())
+
+    assert loaded is not None
+    assert loaded.page_id == PAGE_ID
+    assert loaded.template_page_id == "template"
+    assert loaded.generated
+    assert loaded.ai_result == RESULT
+    assert loaded.blocks == BLOCKS
+    assert loaded.archive_targets == ["old-1", "old-2"]
+    assert loaded.preserved == ["lead"]
+    assert loaded.completed_requests == 1
+    assert loaded.appended_blocks == 2
+    assert loaded.remaining_blocks == BLOCKS[2:]
+    assert loaded.created_ids == ["new-1", "new-2"]
+
+
+def test_missing_journal_loads_as_none(tmp_path):
+    assert WriteJournal.load(tmp_path, PAGE_ID) is None
+
+
+def test_journal_of_another_version_is_ignored(tmp_path):
+    journal = begin(tmp_path)
+    plan_path = journal.directory / "plan.json"
+    plan = json.loads(plan_path.read_text(encoding="utf-8"))
+    plan_path.write_text(json.dumps({**plan, "version": 1}), encoding="utf-8")
+
+    assert WriteJournal.load(tmp_path, PAGE_ID) is None
+
+
+def test_torn_progress_line_counts_as_unconfirmed(tmp_path):
+    journal = begin(tmp_path)
+    journal.record_request(["new-1"], 1)
+    with open(journal.directory / "progress.jsonl", "a", encoding="utf-8") as handle:
+        handle.write('{"request": 1, "blocks": 2, "crea')
+
+    loaded = WriteJournal.load(tmp_path, PAGE_ID)
+
+    assert loaded.completed_requests == 1
+    assert loaded.created_ids == ["new-1"]
+    assert loaded.remaining_blocks == BLOCKS[1:]
+
+
+def test_partial_requests_are_recorded_with_the_one_completing_the_block(tmp_path):
+    journal = begin(tmp_path)
+    journal.record_request(["part-1"], 0)
+
+    assert WriteJournal.load(tmp_path, PAGE_ID).created_ids == []
+
+    journal.record_request(["part-2", "new-2"], 2)
+
+    loaded = WriteJournal.load(tmp_path, PAGE_ID)
+    assert loaded.completed_requests == 1
+    assert loaded.created_ids == ["part-1", "part-2", "new-2"]
+    assert loaded.appended_blocks == 2
+
+
+def test_beginning_again_replaces_the_earlier_journal(tmp_path):
+    begin(tmp_path).record_request(["new-1"], 1)
+
+    begin(tmp_path)
+
+    assert WriteJournal.load(tmp_path, PAGE_ID).created_ids == []
+
+
+def test_streamed_journal_is_generated_once_completed(tmp_path):
+    journal = begin(tmp_path, streamed=True)
+    journal.record_request(["new-1"], 1)
+
+    assert not WriteJournal.load(tmp_path, PAGE_ID).generated
+
+    journal.complete_generation(RESULT, BLOCKS)
+
+    loaded = WriteJournal.load(tmp_path, PAGE_ID)
+    assert loaded.generated
+    assert loaded.ai_result == RESULT
+    assert loaded.remaining_blocks == BLOCKS[1:]
+
+
+def test_discard_removes_the_journal(tmp_path):
+    journal = begin(tmp_path)
+    journal.record_request(["new-1"], 1)
+
+    journal.discard()
+
+    assert not journal.directory.exists()
+    assert WriteJournal.load(tmp_path, PAGE_ID) is None
+
+
+def test_resume_retries_archives_and_removes_unconfirmed_blocks(tmp_path):
+    journal = begin(tmp_path)
+    journal.record_request(["new-1", "new-2"], 2)
+    # "old-1" was archived already; "stray" came from an append request
+    # that reached Notion but was never confirmed.
+    children = live("lead", "old-2", "new-1", "new-2", "stray")
+
+    assert resume_archive_targets(journal, children) == ["old-2", "stray"]
+
+
+def test_resume_keeps_blocks_added_before_the_last_known_one(tmp_path):
+    journal = begin(tmp_path)
+    journal.record_request(["new-1"], 1)
+    children = live("lead", "someone-else", "new-1", "stray")
+
+    assert resume_archive_targets(journal, children) == ["stray"]
+
+
+def test_resume_ignores_archived_children(tmp_path):
+    journal = begin(tmp_path)
+    children = live("lead", "old-1")
+    children += [{"id": "gone", "archived": True}, {"id": "bin", "in_trash": True}]
+
+    assert resume_archive_targets(journal, children) == ["old-1"]
+
+
+def test_restore_archives_appended_blocks_and_unarchives_the_originals(tmp_path):
+    journal = begin(tmp_path, streamed=True)
+    journal.record_request(["new-1"], 1)
+    children = live("lead", "old-2", "new-1", "stray")
+
+    assert restore_updates(journal, children) == [
+        ("new-1", {"archived": True}),
+        ("stray", {"archived": True}),
+        ("old-1", {"archived": False}),
+        ("old-2", {"archived": False}),
+    ]